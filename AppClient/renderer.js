@@ -6,6 +6,8 @@ const APP_API_URL = `${DJANGO_BASE_URL}/api/v1/applications/`;
 const NAV_API_URL = `${DJANGO_BASE_URL}/api/v1/navigation/`; 
 // 服务器路径下载的 API 路由
 const DOWNLOAD_SERVER_URL = `${DJANGO_BASE_URL}/download/server-file/?path=`; 
+// 外部链接下载经服务器跳转 (用于下载统计)
+const DOWNLOAD_EXTERNAL_URL = `${DJANGO_BASE_URL}/download/external/`;
 
 const $appCardsContainer = document.getElementById('app-cards-container');
 const $categoryList = document.getElementById('category-list');
@@ -128,7 +130,7 @@ function getAppDownloadInfo(app) {
 
     // 1. 外部链接
     if (downloadType === '外部链接' && app.external_link) { 
-        downloadUrl = app.external_link;
+        downloadUrl = `${DOWNLOAD_EXTERNAL_URL}${app.id}/`;
         filename = app.external_link.split('/').pop().split('?')[0]; 
         
     // 2. 本机上传 (使用 serializers.py 中返回的绝对 URL)
@@ -201,8 +203,9 @@ function createAppCard(app) {
     const buttonText = isSilent ? '安装' : '下载';
     const buttonClass = isSilent ? 'install-button' : 'download-button';
     
-    // 💥 关键修复点：使用 logo_url 字段，如果缺失则使用占位符
-    const logoUrl = app.logo_url || './static/placeholder.svg'; 
+    // 💥 关键修复点：优先使用 64px 缩略图 (logo_variants)，其次 logo_url，如果缺失则使用占位符
+    const logoVariant = app.logo_variants && app.logo_variants['64'];
+    const logoUrl = (logoVariant && logoVariant.webp) || app.logo_url || './static/placeholder.svg'; 
 
     const card = document.createElement('div');
     card.className = 'app-card';
@@ -2,6 +2,9 @@
 ASGI config for AppManager project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+生产环境使用 gunicorn + uvicorn worker 运行 (见项目根目录的 gunicorn.conf.py):
+
+    gunicorn -c gunicorn.conf.py AppManager.asgi:application
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -9,8 +12,19 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
+from core.asgi import ClientDisconnectMiddleware
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AppManager.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+# 由 Django 提供 STATIC_URL 下的文件 (Admin 的 CSS/JS、文件选择器和分片上传脚本)，
+# 不依赖 DEBUG；前面有 nginx 等静态文件服务器时可用 APPMANAGER_SERVE_STATIC=0 关闭
+if settings.SERVE_STATIC:
+    django_application = ASGIStaticFilesHandler(django_application)
+
+# 流式下载期间监听客户端断开 (见 core/asgi.py)
+application = ClientDisconnectMiddleware(django_application)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,7 +43,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # 请求耗时 / SQL 查询数等运行指标 (/metrics，见 core/metrics.py)，放在第一位以包含其他中间件的耗时
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # 按 Accept-Encoding 压缩 JSON/HTML 响应 (目录快照的压缩版本已预先生成，见 core/compression.py)
+    'core.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -70,19 +75,106 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'AppManager.wsgi.application'
+# 生产环境通过 ASGI 运行 (gunicorn -c gunicorn.conf.py AppManager.asgi:application)
+ASGI_APPLICATION = 'AppManager.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# 默认使用 SQLite (APPMANAGER_DB_PATH 指定文件位置)；设置 APPMANAGER_DB_ENGINE=postgresql 时使用 PostgreSQL
+# (需要安装 psycopg2-binary，连接参数见下方 APPMANAGER_DB_* 环境变量)。
+# CONN_MAX_AGE: 每个线程复用数据库连接的秒数 (0 为每个请求结束时关闭，None 为永久复用)，
+# 复用前由 CONN_HEALTH_CHECKS 检查连接是否仍然可用。默认 0：ASGI 部署 (gunicorn.conf.py) 中
+# 每个请求的同步代码在新的线程中执行，持久连接不会被后续请求复用，只会随线程不断累积 (Django #33497)。
+# 只有以 WSGI / runserver 运行时才适合设置为正数。PostgreSQL 需要连接池时可在前面部署 PgBouncer。
+
+DB_ENGINE = os.environ.get('APPMANAGER_DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('APPMANAGER_DB_CONN_MAX_AGE', 0))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('APPMANAGER_DB_NAME', 'appmanager'),
+            'USER': os.environ.get('APPMANAGER_DB_USER', 'appmanager'),
+            'PASSWORD': os.environ.get('APPMANAGER_DB_PASSWORD', ''),
+            'HOST': os.environ.get('APPMANAGER_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('APPMANAGER_DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 10,
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('APPMANAGER_DB_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # 等待其他连接释放写锁的秒数 (sqlite3 模块的 busy handler)
+                'timeout': 20,
+            },
+        }
     }
+
+# 每个 SQLite 连接建立时执行的 PRAGMA (见 core/database.py)。
+# WAL 模式下读写互不阻塞；mmap_size 为内存映射读取的字节数 (映射的页由操作系统在连接间共享)；
+# cache_size 为负数时单位是 KiB，是每个连接私有的页缓存，连接数随并发请求增长，因此保持较小。
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -8 * 1024,
+    'temp_store': 'MEMORY',
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# 默认使用进程内 LocMem 缓存；设置 APPMANAGER_CACHE=file 时改用文件缓存 (同一主机的多个进程共享)，
+# APPMANAGER_CACHE=redis 时使用 Redis (多台主机共享，需要安装 redis 包，地址见 APPMANAGER_REDIS_URL)
+
+CACHE_BACKEND = os.environ.get('APPMANAGER_CACHE', 'locmem')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('APPMANAGER_REDIS_URL', 'redis://127.0.0.1:6379/0'),
+            'KEY_PREFIX': 'appmanager',
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('APPMANAGER_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'appmanager',
+        }
+    }
+
+
+# 两级缓存 (core/cache.py): 进程内 LRU (L1) 在前，上面配置的共享缓存 (L2) 在后。
+# CACHE_L1_ENABLED 为 None 时自动判断：L2 是进程内的 LocMem 缓存时不启用 L1
+CACHE_L2_ALIAS = 'default'
+CACHE_L1_ENABLED = None
+CACHE_L1_TTL = 60                       # L1 中条目的默认保留时间 (秒)
+CACHE_L1_MAX_ENTRIES = 256
+CACHE_L1_MAX_BYTES = 64 * 1024 * 1024   # 按估算大小淘汰，超过此大小的单个对象只存 L2
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -131,11 +223,96 @@ MEDIA_URL = '/media/'
 # 这定义了文件在您的文件系统上的存储绝对路径
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# 设置更大的上传限制 (用于支持大文件上传)
-# 如果服务器端配置允许，可以适当调高
-# 例如设置为 100MB (100 * 1024 * 1024)
-FILE_UPLOAD_MAX_MEMORY_SIZE = 524288000  # 50MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 524288000  # 50MB
+# 上传文件超过此大小时写入磁盘临时文件，而不是缓存在内存中 (2.5MB，Django 默认值)。
+# 大安装包请使用分片上传 (core/files.py 的 chunked_upload_*)，内存占用与文件大小无关。
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440
+# 非文件表单数据的大小上限 (粘贴的 Base64 Logo 截图也计入其中)
+DATA_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024
+
+# 分片上传: 临时文件目录、建议的分片大小，以及多久未更新的会话视为过期并清理。
+# 临时目录不能位于 MEDIA_ROOT 中 (否则未完成的文件可以通过 /media/ 访问)，
+# 最好与 MEDIA_ROOT 在同一文件系统上，完成时直接重命名而不是复制。
+CHUNKED_UPLOAD_TEMP_DIR = os.environ.get('APPMANAGER_CHUNKED_UPLOAD_DIR', os.path.join(BASE_DIR, 'chunked_uploads'))
+CHUNKED_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRE_SECONDS = 24 * 60 * 60
+# 写入数据块的请求异常中断 (进程被杀) 后，会话最多这么久 (秒) 之后才能被其他请求继续写入
+CHUNKED_UPLOAD_WRITE_TIMEOUT = 10 * 60
+
+# 下载统计 (core/analytics.py): 事件先进入进程内缓冲区，后台线程每隔 FLUSH_INTERVAL 秒
+# 或攒够 BATCH_SIZE 条时批量写入；缓冲区最多保留 MAX_BUFFER 条。
+DOWNLOAD_EVENTS_FLUSH_INTERVAL = 5
+DOWNLOAD_EVENTS_BATCH_SIZE = 500
+DOWNLOAD_EVENTS_MAX_BUFFER = 10000
+
+# 运行指标 (/metrics): 每个进程每隔 FLUSH_INTERVAL 秒把数据写入 METRICS_DIR/<pid>.json，
+# /metrics 汇总目录中所有进程的数据 (gunicorn 多 worker 时必须配置，gunicorn.conf.py 默认使用
+# BASE_DIR/metrics 并在启动时清空)；默认为空，只输出当前进程的数据 (runserver、测试和管理命令
+# 不写文件)。ALLOWED_IPS 为空列表时不限制访问来源。
+METRICS_DIR = os.environ.get('APPMANAGER_METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.environ.get('APPMANAGER_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()
+]
+
+# 响应压缩: 小于该字节数的响应不压缩；这些路径下的页面不压缩 (含 CSRF 令牌)。
+# 安装 brotli 后优先使用 br 编码，否则使用 gzip。
+COMPRESSION_MIN_SIZE = 200
+COMPRESSION_EXCLUDE_PATHS = ['/admin/']
+
+# 应用搜索索引 (core/search.py): 'auto' 在 SQLite 支持 FTS5 时使用 FTS5 虚拟表，否则使用进程内存索引；
+# 指定 'memory' 则始终使用内存索引。安装 pypinyin 后名称额外支持拼音全拼和首字母搜索。
+SEARCH_BACKEND = os.environ.get('APPMANAGER_SEARCH_BACKEND', 'auto')
+
+# 后台应用列表的搜索最多返回的结果数 (按相关度)
+SEARCH_ADMIN_MAX_RESULTS = 500
+
+# 服务器文件索引 (core/fileindex.py): 文件选择器打开时最多每隔这么多秒增量刷新一次，以及默认每页数量
+FILE_INDEX_REFRESH_INTERVAL = 30
+FILE_INDEX_PAGE_SIZE = 100
+
+# 上传处理器在接收数据时同时计算 SHA-256 (见 core/uploadhandlers.py)
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandlers.HashingMemoryFileUploadHandler',
+    'core.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
+# 安装包下载的交付方式 (见 core/files.py 的 deliver_file):
+#   'stream'           - Django 进程内流式传输 (默认，无需前端服务器配合)
+#   'x-accel-redirect' - 交给 nginx 通过 internal location 以 sendfile 发送
+#   'x-sendfile'       - 交给 Apache (mod_xsendfile) / lighttpd 发送
+FILE_DELIVERY_BACKEND = os.environ.get('APPMANAGER_FILE_DELIVERY', 'stream')
+
+# X-Accel-Redirect 模式下，文件系统目录 -> nginx internal location 的映射。
+# 对应的 nginx 配置示例:
+#   location /protected/media/ { internal; alias /app/media/; }
+FILE_DELIVERY_ACCEL_LOCATIONS = [
+    (MEDIA_ROOT, '/protected/media/'),
+]
+
+# 目录版本号在 cache 中的缓存时间 (秒)。多进程部署且未配置共享缓存时，
+# 其他进程最多延迟这么久才能看到新版本。
+CATALOG_REVISION_TTL = 5
+
+# 目录版本号在 L1 中的保留时间 (秒)：启用 L1 时，其他进程写入的新版本号最多延迟这么久可见
+CATALOG_REVISION_LOCAL_TTL = 1
+
+# 按版本号预计算的 API 快照的缓存时间 (秒)
+CATALOG_SNAPSHOT_TTL = 60 * 60
+
+# 变更日志保留的版本数 (manage.py prune_catalog_changes 的默认值)。
+# 客户端的 since 早于保留范围时，增量同步接口返回 full_resync，要求重新拉取完整目录。
+CATALOG_CHANGES_KEEP_REVISIONS = 10000
+
+# Logo / Favicon 缩略图尺寸 (像素)，每个尺寸生成 WebP 和 PNG 两种格式
+THUMBNAIL_SIZES = (32, 64, 128)
+
+# Favicon 后台抓取 (manage.py run_favicon_worker)
+FAVICON_FETCH_TIMEOUT = 10          # 单次 HTTP 请求超时 (秒)
+FAVICON_HTTP_POOL_SIZE = 16         # 共享会话每个主机的连接池大小
+FAVICON_WORKER_CONCURRENCY = 8      # 并发抓取的线程数
+FAVICON_WORKER_BATCH_SIZE = 50      # 每批领取的任务数
+FAVICON_TASK_MAX_ATTEMPTS = 5       # 每个任务最多尝试次数，用完后标记为失败
+FAVICON_TASK_RETRY_DELAY = 60       # 第一次失败后的重试间隔 (秒)，之后每次翻倍
 
 
 STATIC_URL = '/static/'
@@ -146,6 +323,10 @@ import os
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles') 
 # 推荐使用 'staticfiles' 或 'static_root' 这样的名称，将其与应用内部的 'static' 文件夹区分开。
 
+# ASGI 部署 (AppManager/asgi.py) 时由 Django 自己提供 STATIC_URL 下的文件 (与 DEBUG 无关)。
+# 前面有 nginx 等服务器提供 STATIC_ROOT (collectstatic) 时设置 APPMANAGER_SERVE_STATIC=0 关闭。
+SERVE_STATIC = os.environ.get('APPMANAGER_SERVE_STATIC', '1') != '0'
+
 # (可选) 如果你有一些全局的静态文件不属于任何应用，可以定义这个列表
 # STATICFILES_DIRS = [
 #     os.path.join(BASE_DIR, "global_static"),
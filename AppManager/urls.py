@@ -1,18 +1,43 @@
 # 文件路径: AppManager/urls.py
 
+import re
 from django.contrib import admin
-from django.urls import path, include 
+from django.urls import path, re_path, include 
 from django.conf import settings
 from django.conf.urls.static import static
+from core import files
+from core.urls import admin_urlpatterns
 
 urlpatterns = [
+    # Admin 文件选择器 / 分片上传 URL (用于 admin.py 中的 Media 配置)，必须在 admin.site.urls 之前
+    path('admin/core/', include(admin_urlpatterns)),
+
     path('admin/', admin.site.urls),
     
-    # Admin 文件选择器 URL (用于 admin.py 中的 Media 配置)
-    path('admin/core/', include('core.urls')), 
     
     # 💥 关键：将根 URL (/) 指向 core 应用的 urls，包含 API 和前端页面
     path('', include('core.urls')), 
+
+    # 上传的安装包使用支持 Range 断点续传的视图提供 (优先于下方 static() 的默认处理)
+    re_path(
+        r'^%suploads/(?P<name>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+        files.serve_uploaded_file,
+        name='serve_uploaded_file',
+    ),
+
+    # 内容寻址的 Logo / Favicon，附带长期 immutable 缓存头
+    re_path(
+        r'^%sblobs/(?P<name>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+        files.serve_blob,
+        name='serve_blob',
+    ),
+
+    # Logo / Favicon 缩略图 (首次请求时生成)
+    re_path(
+        r'^%sthumbs/(?P<size>\d+)/(?P<name>.+)\.(?P<fmt>webp|png)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+        files.serve_thumbnail,
+        name='serve_thumbnail',
+    ),
 ]
 
 # 在开发模式下，提供媒体文件服务 (如 Logo)
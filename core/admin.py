@@ -1,8 +1,15 @@
+from django.conf import settings
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 from django import forms
 # 确保导入了正确的模型
-from .models import Category, Application, WebsiteNavigation
+from django.db.models import Count, Max, Q, Sum
+from .models import (
+    AppChoices, Category, Application, WebsiteNavigation, FaviconTask, UploadSession,
+    DownloadEvent, DownloadReport,
+)
+from .thumbnails import variant_url
+from . import search
 
 # 【新增导入】用于处理 Base64 文件和唯一命名
 from django.core.files.base import ContentFile
@@ -27,6 +34,12 @@ class ApplicationAdminForm(forms.ModelForm):
         required=False
     )
 
+    # 分片上传完成后由 chunked_upload.js 填入的上传会话 ID (隐藏字段)
+    chunked_upload_id = forms.UUIDField(
+        widget=forms.HiddenInput(),
+        required=False
+    )
+
     class Meta:
         model = Application
         fields = '__all__'
@@ -47,6 +60,14 @@ class ApplicationAdmin(admin.ModelAdmin):
     search_fields = ('name', 'short_description')
     list_editable = ('order', 'is_recommended')
 
+    def get_search_results(self, request, queryset, search_term):
+        # 使用预先建立的搜索索引 (支持中文片段和拼音)，不再对 name/short_description 做 LIKE 全表扫描
+        if not search_term.strip():
+            return queryset, False
+        # 只取相关度最高的一部分，避免宽泛的关键词生成很长的 IN (...) 列表
+        ids = search.search_ids(search_term, limit=settings.SEARCH_ADMIN_MAX_RESULTS)
+        return queryset.filter(pk__in=ids), False
+
     # 【核心修改点 2】fieldsets 调整：确保 logo_base64_data 包含在内
     fieldsets = (
         ('基本信息', {
@@ -57,7 +78,7 @@ class ApplicationAdmin(admin.ModelAdmin):
         }),
         ('下载地址配置 (文件来源)', { 
             'description': '请根据选择的下载类型填写对应的地址，其他地址输入框将通过前端JS隐藏。',
-            'fields': ('download_type', 'external_link', 'uploaded_file', 'server_file_path')
+            'fields': ('download_type', 'external_link', 'uploaded_file', 'chunked_upload_id', 'server_file_path')
         }),
     )
 
@@ -88,6 +109,18 @@ class ApplicationAdmin(admin.ModelAdmin):
                 print(f"ERROR: Failed to process Base64 logo data. Details: {e}")
                 pass 
 
+        # 分片上传：文件已在磁盘上组装并算好哈希，这里只需关联路径和清单
+        upload_id = form.cleaned_data.get('chunked_upload_id')
+        if upload_id:
+            # 只能关联自己上传的文件，与上传接口按 created_by 限定会话的规则一致
+            session = UploadSession.objects.filter(
+                pk=upload_id, created_by=request.user, status=UploadSession.STATUS_COMPLETE,
+            ).first()
+            if session is not None:
+                obj.download_type = AppChoices.UPLOADED_FILE
+                obj.uploaded_file.name = session.final_name
+                obj.set_file_manifest(session.sha256, session.size)
+
         # 调用父类方法完成模型的保存
         super().save_model(request, obj, form, change)
 
@@ -105,6 +138,8 @@ class ApplicationAdmin(admin.ModelAdmin):
             'admin/js/install_params_logic.js', 
             # JS 4: 文件选择器
             'admin/js/file_picker.js', 
+            # JS 5: 大文件分片上传 (断点续传)
+            'admin/js/chunked_upload.js',
         )
 
 
@@ -134,13 +169,14 @@ class WebsiteNavigationAdmin(admin.ModelAdmin):
     search_fields = ('name', 'url')
     list_editable = ('order',)
     fields = ('name', 'url', 'favicon', 'order') # fields 中不需要 display_favicon
+    actions = ('refresh_favicons',)
 
     # 💥 修正点 2：添加 display_favicon 方法
     def display_favicon(self, obj):
         if obj.favicon:
             # 返回一个安全的 HTML 字符串
             return mark_safe(
-                f'<img src="{obj.favicon.url}" style="width: 20px; height: 20px; object-fit: contain;" />'
+                f'<img src="{variant_url(obj.favicon.name, 32, "webp")}" style="width: 20px; height: 20px; object-fit: contain;" />'
             )
         # 如果没有图标，返回一个空的 HTML 字符串，而不是 None 或 False
         return mark_safe('<span style="color:#adb5bd;">无图标</span>')
@@ -148,4 +184,100 @@ class WebsiteNavigationAdmin(admin.ModelAdmin):
     # 💥 修正点 3：设置 short_description 和 allow_tags 属性
     display_favicon.short_description = '图标'
     # 告诉 Django Admin 这是一个包含 HTML 的安全字符串
-    display_favicon.allow_tags = True
\ No newline at end of file
+    display_favicon.allow_tags = True
+
+    @admin.action(description='重新抓取所选网站的图标')
+    def refresh_favicons(self, request, queryset):
+        # 只入队，由 run_favicon_worker 在后台并发抓取
+        for navigation in queryset:
+            FaviconTask.enqueue(navigation)
+        self.message_user(request, f'已为 {queryset.count()} 个网站加入图标抓取任务。')
+
+
+# ===================
+# 4. 图标抓取任务 Admin 配置 (FaviconTaskAdmin)
+# ===================
+@admin.register(FaviconTask)
+class FaviconTaskAdmin(admin.ModelAdmin):
+    list_display = ('navigation', 'url', 'status', 'attempts', 'next_attempt_at', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('url', 'navigation__name')
+    readonly_fields = (
+        'navigation', 'url', 'status', 'attempts', 'next_attempt_at', 'error', 'created_at', 'updated_at',
+    )
+
+
+# ===================
+# 5. 下载记录 Admin 配置 (DownloadEventAdmin)
+# ===================
+@admin.register(DownloadEvent)
+class DownloadEventAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'application', 'source', 'status', 'partial', 'bytes_sent', 'duration_ms', 'client_ip')
+    list_filter = ('source', 'status', 'partial', 'created_at')
+    search_fields = ('path', 'application__name', 'client_ip')
+    list_select_related = ('application',)
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# ===================
+# 6. 下载统计报表 (DownloadReportAdmin)：按应用汇总
+# ===================
+@admin.register(DownloadReport)
+class DownloadReportAdmin(admin.ModelAdmin):
+    list_display = ('name', 'category', 'download_type', 'total', 'completed', 'aborted', 'redirects', 'traffic', 'last_download')
+    list_filter = ('category', 'download_type')
+    search_fields = ('name',)
+    list_select_related = ('category',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            total_downloads=Count('download_events'),
+            completed_downloads=Count('download_events', filter=Q(download_events__status=DownloadEvent.STATUS_COMPLETE)),
+            aborted_downloads=Count('download_events', filter=Q(download_events__status=DownloadEvent.STATUS_ABORTED)),
+            redirect_downloads=Count('download_events', filter=Q(download_events__status=DownloadEvent.STATUS_REDIRECT)),
+            bytes_sent=Sum('download_events__bytes_sent'),
+            last_download_at=Max('download_events__created_at'),
+        )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='下载次数', ordering='total_downloads')
+    def total(self, obj):
+        return obj.total_downloads
+
+    @admin.display(description='完成', ordering='completed_downloads')
+    def completed(self, obj):
+        return obj.completed_downloads
+
+    @admin.display(description='中断', ordering='aborted_downloads')
+    def aborted(self, obj):
+        return obj.aborted_downloads
+
+    @admin.display(description='外部跳转', ordering='redirect_downloads')
+    def redirects(self, obj):
+        return obj.redirect_downloads
+
+    @admin.display(description='流量', ordering='bytes_sent')
+    def traffic(self, obj):
+        size = obj.bytes_sent or 0
+        for unit in ('B', 'KB', 'MB', 'GB'):
+            if size < 1024 or unit == 'GB':
+                return f'{size:.1f} {unit}' if unit != 'B' else f'{size} B'
+            size /= 1024
+
+    @admin.display(description='最近下载', ordering='last_download_at')
+    def last_download(self, obj):
+        return obj.last_download_at
@@ -0,0 +1,190 @@
+# 文件: core/analytics.py
+# 下载统计：下载视图只把事件追加到进程内的缓冲区，后台线程定期用 bulk_create 批量写入数据库，
+# 下载路径上没有任何同步的数据库写入。
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from . import metrics
+from .models import DownloadEvent
+
+logger = logging.getLogger(__name__)
+
+
+class EventBuffer:
+    """
+    线程安全的事件缓冲区 + 后台刷新线程。
+    - 每隔 DOWNLOAD_EVENTS_FLUSH_INTERVAL 秒，或缓冲区达到 DOWNLOAD_EVENTS_BATCH_SIZE 条时写入一次；
+    - 缓冲区超过 DOWNLOAD_EVENTS_MAX_BUFFER 条 (例如数据库长时间不可用) 时丢弃最旧的事件；
+    - DOWNLOAD_EVENTS_FLUSH_INTERVAL 为 0 时不启动后台线程，只在显式调用 flush() 时写入 (用于测试)。
+    刷新线程在每个进程中首次记录事件时启动 (兼容 fork 出来的 worker 进程)。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.dropped = 0
+
+    def add(self, event):
+        with self.lock:
+            self.events.append(event)
+            overflow = len(self.events) - settings.DOWNLOAD_EVENTS_MAX_BUFFER
+            if overflow > 0:
+                del self.events[:overflow]
+                self.dropped += overflow
+            full = len(self.events) >= settings.DOWNLOAD_EVENTS_BATCH_SIZE
+        self.ensure_flusher()
+        if full:
+            self.wakeup.set()
+
+    def ensure_flusher(self):
+        if settings.DOWNLOAD_EVENTS_FLUSH_INTERVAL <= 0:
+            return
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.run, name='download-events-flusher', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(settings.DOWNLOAD_EVENTS_FLUSH_INTERVAL)
+            self.wakeup.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception('写入下载记录失败')
+            finally:
+                # 刷新线程大部分时间在等待，不长期占用数据库连接
+                connection.close()
+
+    def flush(self):
+        """把缓冲区中的事件批量写入数据库，返回写入条数。写入失败时事件放回缓冲区等待下次重试。"""
+        with self.lock:
+            events, self.events = self.events, []
+        if not events:
+            return 0
+        try:
+            DownloadEvent.objects.bulk_create(events, batch_size=settings.DOWNLOAD_EVENTS_BATCH_SIZE)
+        except Exception:
+            with self.lock:
+                self.events[:0] = events
+            raise
+        return len(events)
+
+
+buffer = EventBuffer()
+
+
+def _flush_at_exit():
+    try:
+        buffer.flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def _client_ip(request):
+    return request.META.get('REMOTE_ADDR') or None
+
+
+def record(request, application_id, source, path, status, bytes_sent=0, bytes_expected=None,
+           duration_ms=0, partial=False):
+    metrics.inc('appmanager_downloads_total', source=source, status=status)
+    if bytes_sent:
+        metrics.inc('appmanager_download_bytes_total', bytes_sent, source=source)
+    buffer.add(DownloadEvent(
+        application_id=application_id,
+        source=source,
+        path=path[:500],
+        status=status,
+        partial=partial,
+        bytes_sent=bytes_sent,
+        bytes_expected=bytes_expected,
+        duration_ms=duration_ms,
+        client_ip=_client_ip(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', '')[:255],
+    ))
+
+
+class CountingStream:
+    """
+    包装 StreamingHttpResponse 的内容迭代器，统计实际发送的字节数。
+    服务器在响应结束 (或客户端断开) 时调用 close()，此时记录下载事件：
+    发送字节数达到 Content-Length 为完成，否则为中断。
+    """
+
+    def __init__(self, iterable, on_close):
+        self.iterable = iterable
+        self.on_close = on_close
+        self.bytes_sent = 0
+        self.started = time.monotonic()
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.iterable:
+            self.bytes_sent += len(chunk)
+            yield chunk
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        close = getattr(self.iterable, 'close', None)
+        if close is not None:
+            close()
+        self.on_close(self.bytes_sent, int((time.monotonic() - self.started) * 1000))
+
+
+class AsyncCountingStream(CountingStream):
+    """CountingStream 的异步版本，用于 ASGI 下的异步文件流 (不提供 __iter__，响应保持 is_async)。"""
+
+    __iter__ = None
+
+    async def __aiter__(self):
+        async for chunk in self.iterable:
+            self.bytes_sent += len(chunk)
+            yield chunk
+
+
+def track_download(request, response, application_id, source, path):
+    """
+    为下载响应记录统计事件。只统计 GET 的 200/206 响应 (304、416、HEAD 请求不计)。
+    流式响应在传输结束后记录；交给前端 Web 服务器传输的响应立即记录。
+    """
+    if request.method != 'GET' or response.status_code not in (200, 206):
+        return response
+    partial = response.status_code == 206
+    expected = response.get('Content-Length')
+    expected = int(expected) if expected and expected.isdigit() else None
+
+    if not response.streaming:
+        record(request, application_id, source, path, DownloadEvent.STATUS_OFFLOADED, partial=partial)
+        return response
+
+    def on_close(bytes_sent, duration_ms):
+        complete = expected is None or bytes_sent >= expected
+        record(
+            request, application_id, source, path,
+            DownloadEvent.STATUS_COMPLETE if complete else DownloadEvent.STATUS_ABORTED,
+            bytes_sent=bytes_sent, bytes_expected=expected, duration_ms=duration_ms, partial=partial,
+        )
+
+    stream_class = AsyncCountingStream if response.is_async else CountingStream
+    response.streaming_content = stream_class(response.streaming_content, on_close)
+    return response
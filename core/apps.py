@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # 注册目录变更信号 (递增目录版本号)
+        from . import signals  # noqa: F401
+        # 注册数据库连接调优 (SQLite PRAGMA)
+        from . import database  # noqa: F401
+        # 在数据库连接上安装请求的 SQL 查询计数 (/metrics)，须在建立第一个连接之前注册
+        from . import metrics  # noqa: F401
+        # 目录变更提交后增量更新搜索索引；migrate 之后建立 (或补齐) FTS5 索引
+        from . import search
+        post_migrate.connect(search.sync_after_migrate, sender=self, dispatch_uid='searchsync_after_migrate')
@@ -0,0 +1,54 @@
+# 文件: core/asgi.py
+# ASGI 部署的辅助组件 (由 AppManager/asgi.py 使用)。
+
+import asyncio
+
+# scope 中保存"客户端已断开"事件的键，异步文件流 (core/files.py) 据此提前停止读取
+DISCONNECT_SCOPE_KEY = 'appmanager.disconnected'
+
+
+class ClientDisconnectMiddleware:
+    """
+    ASGI 中间件：响应开始发送后继续监听 http.disconnect，客户端断开时设置 scope 中的事件。
+    Django 4.2 的 ASGIHandler 在读完请求体后不再调用 receive()，流式响应期间无法得知客户端已断开，
+    服务器会把后续数据静默丢弃，文件仍被读到末尾，下载统计也会误记为完成。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        disconnected = asyncio.Event()
+        scope = dict(scope, **{DISCONNECT_SCOPE_KEY: disconnected})
+        watcher = None
+
+        async def watch():
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    disconnected.set()
+                    return
+
+        async def receive_wrapper():
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+            return message
+
+        async def send_wrapper(message):
+            nonlocal watcher
+            # 开始发送响应时 Django 已读完请求体，此后由 watcher 独占 receive()
+            if message['type'] == 'http.response.start' and watcher is None:
+                watcher = asyncio.ensure_future(watch())
+            if disconnected.is_set() and message['type'] == 'http.response.body':
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
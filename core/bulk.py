@@ -0,0 +1,355 @@
+# 文件: core/bulk.py
+# 应用目录的批量导入 / 导出 (manage.py import_catalog / export_catalog_data)，格式为 CSV、JSON 或 JSONL。
+#
+# 每条记录对应一个应用，列见 FIELDS：分类用 category_slug 表示 (不存在时按 category_name / category_order 新建)，
+# 应用按 (分类, 名称) 识别，已存在的更新、不存在的新建；记录中没有的列保持原值 (新建时使用默认值)。
+# 导入时可用 logo_url 列给出图片地址，指定 fetch_logos 时并发下载并存入内容寻址存储。
+#
+# 导入按批处理，每批一个事务，用 bulk_create / bulk_update 写入，不逐条调用 save()：
+#   - 不触发 post_save 信号，目录版本号和变更日志由 catalog.record_changes() 每批记录一次；
+#   - 安装包清单 (大小 / SHA-256) 在下载来源变化时清空，由 manage.py rehash_installers 重新计算；
+#   - 被替换的 Logo 不会立即删除，由 manage.py gc_blobs 回收。
+
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_slug
+from django.db import transaction
+from django.utils import timezone
+
+from . import catalog
+from .models import FILE_SOURCE_FIELDS, Application, Category
+from .storage import blob_storage
+from .utils import FaviconError, download_icon, get_http_session
+
+FORMATS = ('csv', 'json', 'jsonl')
+
+# 直接对应 Application 字段的列
+APP_FIELDS = (
+    'version', 'short_description', 'is_recommended', 'order', 'install_method', 'install_params',
+    'download_type', 'external_link', 'server_file_path', 'logo', 'uploaded_file',
+)
+FIELDS = ('name', 'category_slug', 'category_name', 'category_order') + APP_FIELDS
+
+# 空字符串按 NULL 处理的列
+NULLABLE_FIELDS = {
+    'version', 'short_description', 'install_params', 'external_link', 'server_file_path', 'logo', 'uploaded_file',
+}
+# 下载来源变化时清空的安装包清单字段
+MANIFEST_FIELDS = ('file_size', 'file_sha256', 'file_mtime', 'file_hashed_at')
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', '是'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n', '否'}
+
+
+class CatalogImportError(Exception):
+    """导入数据格式错误 (消息中带记录序号)。"""
+
+
+def detect_format(path, fmt=None):
+    """显式指定的格式优先，否则按文件扩展名判断。"""
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext in FORMATS:
+        return ext
+    raise CatalogImportError(f'无法从文件名判断格式，请指定 --format ({"/".join(FORMATS)})')
+
+
+# ---------------- 读写记录 ----------------
+def read_records(stream, fmt):
+    """从文本流中逐条读取记录，返回 (序号, dict) 的迭代器。CSV 的序号为行号。"""
+    if fmt == 'csv':
+        for line, record in enumerate(csv.DictReader(stream), start=2):
+            yield line, record
+    elif fmt == 'json':
+        try:
+            records = json.load(stream)
+        except ValueError as e:
+            raise CatalogImportError(f'JSON 格式错误: {e}')
+        if not isinstance(records, list):
+            raise CatalogImportError('JSON 文件的顶层必须是数组')
+        yield from enumerate(records, start=1)
+    else:
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError as e:
+                raise CatalogImportError(f'第 {line} 行: JSON 格式错误: {e}')
+
+
+def export_records():
+    """按目录顺序逐条生成应用记录 (分块查询，不一次性加载全部应用)。"""
+    rows = Application.objects.order_by(*catalog.APPLICATION_ORDERING).values(
+        'name', 'category__slug', 'category__name', 'category__order', *APP_FIELDS,
+    )
+    for row in rows.iterator(chunk_size=2000):
+        record = {
+            'name': row['name'],
+            'category_slug': row['category__slug'],
+            'category_name': row['category__name'],
+            'category_order': row['category__order'],
+        }
+        for field in APP_FIELDS:
+            value = row[field]
+            record[field] = None if field in NULLABLE_FIELDS and value == '' else value
+        yield record
+
+
+def write_records(records, stream, fmt):
+    """把记录写入文本流，返回写入的条数。"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow({
+                key: ('true' if value else 'false') if isinstance(value, bool) else ('' if value is None else value)
+                for key, value in record.items()
+            })
+            count += 1
+    elif fmt == 'json':
+        stream.write('[')
+        for record in records:
+            stream.write(',\n' if count else '\n')
+            stream.write(json.dumps(record, ensure_ascii=False))
+            count += 1
+        stream.write('\n]\n')
+    else:
+        for record in records:
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+# ---------------- 导入 ----------------
+def _choice_values(field_name):
+    """选项的值和显示名都可以使用：{值或显示名: 值}。"""
+    choices = Application._meta.get_field(field_name).flatchoices
+    mapping = {str(label): value for value, label in choices}
+    mapping.update({value: value for value, label in choices})
+    return mapping
+
+
+def _same(old, new):
+    # 可为空的文本字段在数据库中可能是 NULL 或空字符串
+    if isinstance(old, str) or isinstance(new, str):
+        return (old or None) == (new or None)
+    return old == new
+
+
+def _field_values(instance):
+    values = {field: getattr(instance, field) for field in APP_FIELDS + MANIFEST_FIELDS}
+    values['logo'], values['uploaded_file'] = instance.logo.name, instance.uploaded_file.name
+    return values
+
+
+class CatalogImporter:
+    """
+    按批导入应用记录。分类和已有应用在开始时一次性载入内存 (slug -> 分类，(分类 ID, 名称) -> 应用的字段值)，
+    之后每批只执行批量写入，不再逐条查询；与现有数据相同的记录不写入、不产生变更记录。
+    """
+
+    def __init__(self, batch_size=1000, fetch_logos=False, concurrency=None, stdout=None, stderr=None):
+        self.batch_size = batch_size
+        self.fetch_logos = fetch_logos
+        self.concurrency = concurrency or settings.FAVICON_WORKER_CONCURRENCY
+        self.stdout = stdout
+        self.stderr = stderr
+        self.choices = {name: _choice_values(name) for name in ('install_method', 'download_type')}
+        self.fetched_logos = {}  # 图片地址 -> 保存后的文件名 (同一地址只下载一次)
+        self.stats = dict.fromkeys(
+            ('created', 'updated', 'unchanged', 'categories_created', 'categories_updated',
+             'logos_fetched', 'logo_failures'), 0,
+        )
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def warn(self, message):
+        if self.stderr is not None:
+            self.stderr.write(message)
+
+    def run(self, records):
+        """导入 (序号, dict) 记录，返回统计字典。某一批出错时之前的批次已经提交。"""
+        self.categories = {category.slug: category for category in Category.objects.all()}
+        self.applications = {
+            (row['category_id'], row['name']): row
+            for row in Application.objects.values('id', 'category_id', 'name', *APP_FIELDS, *MANIFEST_FIELDS)
+        }
+        records = iter(records)
+        while True:
+            chunk = [self.clean(line, record) for line, record in islice(records, self.batch_size)]
+            if not chunk:
+                break
+            if self.fetch_logos:
+                self.pull_logos(chunk)
+            with transaction.atomic():
+                changed = self.save_categories(chunk) + self.save_applications(chunk)
+                revision = catalog.record_changes(changed)
+            self.log(f'已处理 {len(chunk)} 条' + (f'，目录版本 {revision}' if revision else '，无变化'))
+        return self.stats
+
+    # ---------------- 校验 ----------------
+    def clean(self, line, record):
+        if not isinstance(record, dict):
+            raise CatalogImportError(f'第 {line} 条: 记录必须是对象')
+        name = str(record.get('name') or '').strip()
+        slug = str(record.get('category_slug') or '').strip()
+        if not name or not slug:
+            raise CatalogImportError(f'第 {line} 条: name 和 category_slug 不能为空')
+        try:
+            validate_slug(slug)
+        except ValidationError:
+            raise CatalogImportError(f'第 {line} 条: 非法的 category_slug: {slug}')
+
+        item = {'line': line, 'name': name, 'category_slug': slug, 'values': {}}
+        if record.get('category_name'):
+            item['category_name'] = str(record['category_name']).strip()
+        if record.get('category_order') not in (None, ''):
+            item['category_order'] = self.clean_int(line, 'category_order', record['category_order'])
+        for field in APP_FIELDS:
+            if field in record:
+                item['values'][field] = self.clean_value(line, field, record[field])
+        logo_url = str(record.get('logo_url') or '').strip()
+        if logo_url:
+            if urlsplit(logo_url).scheme not in ('http', 'https'):
+                raise CatalogImportError(f'第 {line} 条: logo_url 必须是 http(s) 地址')
+            item['logo_url'] = logo_url
+        return item
+
+    @staticmethod
+    def clean_int(line, field, value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise CatalogImportError(f'第 {line} 条: {field} 必须是整数: {value!r}')
+
+    def clean_value(self, line, field, value):
+        if field == 'is_recommended':
+            if isinstance(value, bool):
+                return value
+            text = str(value if value is not None else '').strip().lower()
+            if text not in TRUE_VALUES | FALSE_VALUES:
+                raise CatalogImportError(f'第 {line} 条: is_recommended 无法识别: {value!r}')
+            return text in TRUE_VALUES
+        if field == 'order':
+            return self.clean_int(line, field, value if value not in (None, '') else 0)
+        if field in self.choices:
+            choice = self.choices[field].get(str(value if value is not None else '').strip())
+            if choice is None:
+                raise CatalogImportError(f'第 {line} 条: {field} 不是有效选项: {value!r}')
+            return choice
+
+        value = str(value).strip() if value is not None else ''
+        max_length = Application._meta.get_field(field).max_length
+        if max_length and len(value) > max_length:
+            raise CatalogImportError(f'第 {line} 条: {field} 超过 {max_length} 个字符')
+        return (value or None) if field in NULLABLE_FIELDS else value
+
+    # ---------------- Logo ----------------
+    def fetch_logo(self, url):
+        """下载图片并存入内容寻址存储，返回文件名；失败时返回异常对象。"""
+        name = os.path.basename(urlsplit(url).path) or 'logo.png'
+        try:
+            result = download_icon(url, get_http_session(), settings.FAVICON_FETCH_TIMEOUT, name)
+            return blob_storage.save(f'logos/{name}', result.content)
+        except (requests.RequestException, FaviconError, OSError) as e:
+            return e
+
+    def pull_logos(self, chunk):
+        """并发下载本批记录的 logo_url (在事务之外执行，网络请求期间不持有数据库锁)。"""
+        urls = list({item['logo_url'] for item in chunk if 'logo_url' in item} - set(self.fetched_logos))
+        if urls:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                for url, result in zip(urls, executor.map(self.fetch_logo, urls)):
+                    if isinstance(result, Exception):
+                        self.stats['logo_failures'] += 1
+                        self.warn(f'Logo 下载失败: {url} - {result}')
+                        result = None
+                    else:
+                        self.stats['logos_fetched'] += 1
+                    self.fetched_logos[url] = result
+        for item in chunk:
+            logo = self.fetched_logos.get(item.get('logo_url'))
+            if logo:
+                item['values']['logo'] = logo
+
+    # ---------------- 写入 ----------------
+    def save_categories(self, chunk):
+        """新建缺少的分类、更新名称/排序有变化的分类，返回写入的分类列表。"""
+        created, updated = {}, {}
+        for item in chunk:
+            slug = item['category_slug']
+            category = self.categories.get(slug) or created.get(slug)
+            if category is None:
+                created[slug] = Category(
+                    slug=slug, name=item.get('category_name') or slug, order=item.get('category_order', 0),
+                )
+                continue
+            for field in ('name', 'order'):
+                value = item.get(f'category_{field}')
+                if value is not None and getattr(category, field) != value:
+                    setattr(category, field, value)
+                    if category.pk:
+                        updated[slug] = category
+
+        Category.objects.bulk_create(created.values())
+        if updated:
+            now = timezone.now()
+            for category in updated.values():
+                category.updated_at = now
+            Category.objects.bulk_update(updated.values(), ['name', 'order', 'updated_at'])
+        self.categories.update(created)
+        self.stats['categories_created'] += len(created)
+        self.stats['categories_updated'] += len(updated)
+        return list(created.values()) + list(updated.values())
+
+    def save_applications(self, chunk):
+        """新建或更新本批的应用 (同一应用在本批中出现多次时以最后一次为准)，返回写入的应用列表。"""
+        rows, seen = {}, set()  # rows: (分类 ID, 名称) -> 写入后的字段值，新建的应用 id 为 None
+        for item in chunk:
+            key = (self.categories[item['category_slug']].pk, item['name'])
+            seen.add(key)
+            current = rows.get(key) or self.applications.get(key)
+            if current is None:
+                rows[key] = dict(item['values'], id=None)
+                continue
+            changes = {field: value for field, value in item['values'].items() if not _same(current.get(field), value)}
+            if not changes:
+                continue
+            row = rows[key] = dict(current, **changes)
+            if row['id'] is not None and FILE_SOURCE_FIELDS & changes.keys():
+                # 下载来源变化，旧的安装包清单失效
+                row.update(file_size=None, file_sha256='', file_mtime=None, file_hashed_at=None)
+
+        now = timezone.now()
+        created, updated = {}, {}
+        for (category_id, name), row in rows.items():
+            if row['id'] is None:
+                fields = {field: row[field] for field in APP_FIELDS if field in row}
+                created[category_id, name] = Application(category_id=category_id, name=name, **fields)
+            else:
+                fields = {field: row[field] for field in APP_FIELDS + MANIFEST_FIELDS}
+                updated[category_id, name] = Application(
+                    pk=row['id'], category_id=category_id, name=name, updated_at=now, **fields,
+                )
+        Application.objects.bulk_create(created.values())
+        Application.objects.bulk_update(updated.values(), list(APP_FIELDS + MANIFEST_FIELDS) + ['updated_at'])
+
+        for key, instance in list(created.items()) + list(updated.items()):
+            self.applications[key] = dict(_field_values(instance), id=instance.pk, category_id=key[0], name=key[1])
+        self.stats['created'] += len(created)
+        self.stats['updated'] += len(updated)
+        self.stats['unchanged'] += len(seen) - len(rows)
+        return list(created.values()) + list(updated.values())
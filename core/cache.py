@@ -0,0 +1,171 @@
+# 文件: core/cache.py
+# 两级缓存：进程内的 LRU (L1) + settings.CACHES 中配置的共享缓存 (L2，Redis 或文件缓存)。
+#
+# 目录快照等大对象每次从 Redis 读取都要经过网络传输和反序列化，L1 把最近用过的对象留在进程内存中，
+# 命中时不访问 L2；L2 让多个 worker 进程共享同一份快照，每个版本只需构建一次。
+# L1 不会收到其他进程的失效通知，只缓存两类数据:
+#   - 按版本号寻址、内容不再变化的对象 (快照键中包含目录版本号)；
+#   - 版本号本身，L1 中只保留很短的时间 (local_timeout)，过期后从 L2 读取最新值。
+# 目录数据变化时 (core/signals.py) 新的版本号写入 L2，各进程最多在 local_timeout 秒后看到，
+# 之后按新版本号查找快照，旧版本的对象在 L1 中不再被访问，随 LRU 淘汰。
+#
+# L2 本身就在进程内 (LocMem) 时 L1 没有意义，默认自动关闭 (CACHE_L1_ENABLED = None)。
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import setting_changed
+
+from . import metrics
+
+_MISSING = object()
+
+
+def _sizeof(value):
+    """估算对象占用的字节数 (快照主要由 bytes 组成，只需要对容器递归)。"""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_sizeof(key) + _sizeof(item) for key, item in value.items()) + 64
+    if isinstance(value, (list, tuple)):
+        return sum(_sizeof(item) for item in value) + 64
+    return sys.getsizeof(value)
+
+
+class LocalCache:
+    """
+    线程安全的 LRU 缓存，条目带过期时间，总条目数和估算总字节数都有上限。
+    超过上限时从最久未使用的条目开始淘汰；单个超过字节上限的对象不缓存。
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (过期时间, 值, 字节数)
+        self.size = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return default
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, timeout):
+        size = _sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            if timeout <= 0 or size > self.max_bytes:
+                return
+            self.entries[key] = (time.monotonic() + timeout, value, size)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        self.size -= self.entries.pop(key)[2]
+
+
+class TieredCache:
+    """
+    L1 (LocalCache) + L2 (caches[settings.CACHE_L2_ALIAS])。
+    get() 先查 L1，未命中再查 L2 并回填 L1；set() 同时写入两级。
+    local_timeout 为 L1 中的保留时间 (默认 CACHE_L1_TTL)，不超过 L2 的 timeout。
+    """
+
+    def __init__(self):
+        self.local = LocalCache(settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_MAX_BYTES)
+
+    @property
+    def shared(self):
+        return caches[settings.CACHE_L2_ALIAS]
+
+    @property
+    def local_enabled(self):
+        enabled = settings.CACHE_L1_ENABLED
+        if enabled is None:
+            return not isinstance(self.shared, (LocMemCache, DummyCache))
+        return enabled
+
+    def get(self, key, default=None, local_timeout=None):
+        if self.local_enabled:
+            value = self.local.get(key, _MISSING)
+            metrics.record_cache_tier('l1', value is not _MISSING)
+            if value is not _MISSING:
+                return value
+        value = self.shared.get(key, _MISSING)
+        metrics.record_cache_tier('l2', value is not _MISSING)
+        if value is _MISSING:
+            return default
+        if self.local_enabled:
+            self.local.set(key, value, self._local_timeout(local_timeout))
+        return value
+
+    def peek(self, key, default=None):
+        """
+        只查不会阻塞的缓存层：启用 L1 时只查 L1，否则只在 L2 位于进程内时查 L2。
+        供异步视图在事件循环中调用，Redis 等需要网络访问的 L2 由调用方在线程中通过 get() 查询。
+        """
+        if self.local_enabled:
+            value = self.local.get(key, _MISSING)
+            if value is not _MISSING:
+                metrics.record_cache_tier('l1', True)
+                return value
+            return default
+        if isinstance(self.shared, LocMemCache):
+            return self.shared.get(key, default)
+        return default
+
+    def set(self, key, value, timeout, local_timeout=None):
+        self.shared.set(key, value, timeout)
+        if self.local_enabled:
+            local_timeout = self._local_timeout(local_timeout)
+            if timeout is not None:
+                local_timeout = min(timeout, local_timeout)
+            self.local.set(key, value, local_timeout)
+
+    def delete(self, key):
+        self.shared.delete(key)
+        self.local.delete(key)
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+
+    @staticmethod
+    def _local_timeout(local_timeout):
+        return settings.CACHE_L1_TTL if local_timeout is None else local_timeout
+
+
+tiered = TieredCache()
+
+
+def _reset_local_cache(setting, **kwargs):
+    # 测试中切换缓存配置时，丢弃 L1 中来自旧配置的数据
+    if setting in ('CACHES', 'CACHE_L2_ALIAS', 'CACHE_L1_ENABLED', 'CACHE_L1_MAX_ENTRIES', 'CACHE_L1_MAX_BYTES'):
+        tiered.local = LocalCache(settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_MAX_BYTES)
+
+
+setting_changed.connect(_reset_local_cache, dispatch_uid='core_reset_local_cache')
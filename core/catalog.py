@@ -0,0 +1,243 @@
+# 文件: core/catalog.py
+# 应用目录的版本号与预计算快照。
+
+import hashlib
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import metrics
+from .cache import tiered
+from .compression import compress_snapshot
+from .models import Application, CatalogChange, CatalogRevision, Category, WebsiteNavigation
+
+REVISION_CACHE_KEY = 'catalog:revision'
+
+# 目录变更 (及变更日志) 提交后发送，参数 revision 为新版本号。
+# 搜索索引等派生数据在这里增量更新，读路径上不再重建。
+catalog_changed = Signal()
+
+# 应用列表的排序 (分类排序, 分类 ID, 应用排序, 应用 ID)：每个应用的位置唯一确定，
+# 完整列表、游标分页 (pagination.CatalogCursorPagination) 和静态导出使用同一顺序。
+APPLICATION_ORDERING = ('category__order', 'category_id', 'order', 'id')
+
+# 变更日志中使用的数据类型名称
+CHANGE_MODELS = {
+    Application: 'application',
+    Category: 'category',
+    WebsiteNavigation: 'navigation',
+}
+
+
+def get_revision():
+    """
+    返回当前目录版本号。
+    版本号缓存在两级缓存中 (L2 中 CATALOG_REVISION_TTL 秒，L1 中 CATALOG_REVISION_LOCAL_TTL 秒)，
+    热路径上不访问数据库。
+    """
+    revision = tiered.get(REVISION_CACHE_KEY, local_timeout=settings.CATALOG_REVISION_LOCAL_TTL)
+    metrics.record_cache('revision', revision is not None)
+    if revision is None:
+        revision = CatalogRevision.objects.filter(pk=1).values_list('value', flat=True).first() or 0
+        _cache_revision(revision)
+    return revision
+
+
+def _cache_revision(revision):
+    tiered.set(
+        REVISION_CACHE_KEY, revision, settings.CATALOG_REVISION_TTL,
+        local_timeout=settings.CATALOG_REVISION_LOCAL_TTL,
+    )
+
+
+def bump_revision():
+    """
+    目录版本号加一并返回新值。
+    缓存中的版本号在事务提交后才更新，避免其他请求用未提交的数据生成新版本的快照。
+    新版本号写入共享缓存 (L2) 后，其他进程在 L1 中的旧版本号过期时即可看到。
+    """
+    updated = CatalogRevision.objects.filter(pk=1).update(
+        value=F('value') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        CatalogRevision.objects.get_or_create(pk=1, defaults={'value': 1})
+    revision = CatalogRevision.objects.filter(pk=1).values_list('value', flat=True).get()
+
+    transaction.on_commit(lambda: _cache_revision(revision))
+    return revision
+
+
+def record_change(instance, deleted=False):
+    """递增版本号，并在变更日志中记录该对象的新增/修改或删除。"""
+    # 未处于事务中时 on_commit 会立即执行，包一层事务保证变更日志写入之后才发送 catalog_changed
+    with transaction.atomic():
+        revision = bump_revision()
+        CatalogChange.objects.create(
+            revision=revision,
+            model=CHANGE_MODELS[type(instance)],
+            object_id=instance.pk,
+            action=CatalogChange.ACTION_DELETE if deleted else CatalogChange.ACTION_UPSERT,
+        )
+        _notify_on_commit(revision)
+    return revision
+
+
+def record_changes(instances):
+    """
+    批量写入 (bulk_create / bulk_update 不触发 post_save 信号) 后调用：
+    版本号只递增一次，每个对象记录一条新增/修改。没有对象时不递增，返回 None。
+    """
+    if not instances:
+        return None
+    with transaction.atomic():
+        revision = bump_revision()
+        CatalogChange.objects.bulk_create([
+            CatalogChange(
+                revision=revision,
+                model=CHANGE_MODELS[type(instance)],
+                object_id=instance.pk,
+                action=CatalogChange.ACTION_UPSERT,
+            )
+            for instance in instances
+        ])
+        _notify_on_commit(revision)
+    return revision
+
+
+def _notify_on_commit(revision):
+    transaction.on_commit(lambda: catalog_changed.send(sender=CatalogChange, revision=revision))
+
+
+def get_changes(since_revision=None, since_time=None):
+    """
+    返回指定版本号 (或时间点) 之后发生变化的对象:
+    {'application': (changed_ids, deleted_ids), 'category': ..., 'navigation': ...}
+    同一对象多次变化时以最后一次为准。
+    """
+    result = {name: (set(), set()) for name in CHANGE_MODELS.values()}
+
+    if since_revision is not None:
+        changes = CatalogChange.objects.filter(revision__gt=since_revision)
+    else:
+        changes = CatalogChange.objects.filter(created_at__gt=since_time)
+
+    for model, object_id, action in changes.order_by('revision', 'pk').values_list('model', 'object_id', 'action'):
+        if model not in result:
+            continue
+        changed, deleted = result[model]
+        if action == CatalogChange.ACTION_DELETE:
+            changed.discard(object_id)
+            deleted.add(object_id)
+        else:
+            deleted.discard(object_id)
+            changed.add(object_id)
+
+    if since_time is not None:
+        # 按时间同步时，以各表的 updated_at 为准补全修改过的对象
+        for model_class, name in CHANGE_MODELS.items():
+            changed, deleted = result[name]
+            changed.update(model_class.objects.filter(updated_at__gt=since_time).values_list('pk', flat=True))
+            changed.difference_update(deleted)
+    return result
+
+
+def get_change_log_start():
+    """返回 (pruned_revision, pruned_at)：早于此位置的变更记录已被清理。"""
+    state = CatalogRevision.objects.filter(pk=1).values_list('pruned_revision', 'pruned_at').first()
+    return state or (0, None)
+
+
+def requires_full_resync(since_revision=None, since_time=None):
+    """客户端的同步位置早于变更日志的保留范围时，增量结果会漏掉删除，需要重新拉取完整目录。"""
+    pruned_revision, pruned_at = get_change_log_start()
+    if since_revision is not None:
+        return since_revision < pruned_revision
+    return pruned_at is not None and since_time < pruned_at
+
+
+def prune_changes(keep_revisions):
+    """
+    删除最近 keep_revisions 个版本之前的变更记录，返回删除的行数。
+    清理位置记录在 CatalogRevision 中，供 requires_full_resync() 判断。
+    """
+    with transaction.atomic():
+        revision = CatalogRevision.objects.select_for_update().filter(pk=1).first()
+        if revision is None:
+            return 0
+        cutoff = revision.value - keep_revisions
+        if cutoff <= revision.pruned_revision:
+            return 0
+        pruned = CatalogChange.objects.filter(revision__lte=cutoff)
+        last_time = pruned.order_by('-revision', '-pk').values_list('created_at', flat=True).first()
+        deleted, _ = pruned.delete()
+        CatalogRevision.objects.filter(pk=1).update(
+            pruned_revision=cutoff,
+            pruned_at=max(filter(None, (last_time, revision.pruned_at)), default=None),
+        )
+    return deleted
+
+
+def application_queryset():
+    """目录中应用的基础查询集，关联查询分类以避免序列化/渲染时的 N+1 查询。"""
+    return Application.objects.select_related('category')
+
+
+def build_grouped_catalog():
+    """
+    构建按分类分组的目录 [(category, [app, ...]), ...]。
+    只执行一次按 APPLICATION_ORDERING 排序的查询 (与 API 列表和导出顺序一致)，
+    然后线性分组，不再单独扫描 Category 表；没有应用的分类不出现。
+    """
+    applications = application_queryset().order_by(*APPLICATION_ORDERING)
+    return [
+        (category, list(apps))
+        for category, apps in groupby(applications, key=attrgetter('category'))
+    ]
+
+
+def _snapshot_key(name, request, revision):
+    base_url = request.build_absolute_uri('/')
+    base_key = hashlib.sha1(base_url.encode('utf-8')).hexdigest()[:12]
+    return f'catalog:snapshot:{name}:{revision}:{base_key}'
+
+
+def get_snapshot(name, request, build):
+    """
+    返回名为 name 的目录快照 {'etag': ..., 'body': bytes, 'encodings': {'gzip': bytes, 'br': bytes}}。
+    快照按 (版本号, 站点根 URL) 缓存，build() 只在该版本第一次被请求时调用一次，
+    各压缩版本也在此时一并生成。序列化结果中包含绝对 URL，因此不同 Host 访问时分别缓存。
+    快照存入两级缓存：多个 worker 进程共享 L2 中的同一份快照，各进程再在 L1 中保留常用的快照。
+    """
+    key = _snapshot_key(name, request, get_revision())
+    snapshot = tiered.get(key)
+    metrics.record_cache('snapshot', snapshot is not None)
+    if snapshot is None:
+        body = build()
+        snapshot = {
+            'etag': '"%s"' % hashlib.sha256(body).hexdigest()[:32],
+            'body': body,
+            'encodings': compress_snapshot(body),
+        }
+        tiered.set(key, snapshot, settings.CATALOG_SNAPSHOT_TTL)
+    return snapshot
+
+
+def peek_snapshot(name, request):
+    """
+    只查不会阻塞的缓存层 (见 TieredCache.peek)、不访问数据库地返回快照，
+    版本号或快照不在其中时返回 None。
+    供异步视图在事件循环中直接调用，未命中时再在线程中调用 get_snapshot()。
+    """
+    revision = tiered.peek(REVISION_CACHE_KEY)
+    if revision is None:
+        return None
+    snapshot = tiered.peek(_snapshot_key(name, request, revision))
+    if snapshot is not None:
+        metrics.record_cache('revision', True)
+        metrics.record_cache('snapshot', True)
+    return snapshot
@@ -0,0 +1,160 @@
+# 文件: core/compression.py
+# 响应压缩：按 Accept-Encoding 协商 brotli / gzip。
+# 目录快照在生成时一次性压缩好各编码版本并与原文一起缓存，请求时直接取用；
+# 其他 JSON/HTML 响应由 CompressionMiddleware 即时压缩。
+
+import gzip
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只提供 gzip
+    brotli = None
+
+# 按优先级排列 (客户端同时接受时优先使用 brotli)
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# 可压缩的响应类型
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+_ACCEPT_ENCODING_RE = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+def accepted_encodings(request):
+    """解析 Accept-Encoding，返回客户端接受 (q > 0) 的编码集合。"""
+    accepted, rejected, wildcard = set(), set(), False
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        match = _ACCEPT_ENCODING_RE.fullmatch(item)
+        if not match:
+            continue
+        coding, q = match.group(1).lower(), match.group(2)
+        try:
+            acceptable = q is None or float(q) > 0
+        except ValueError:
+            acceptable = False
+        if coding == '*':
+            wildcard = acceptable
+        elif acceptable:
+            accepted.add(coding)
+        else:
+            rejected.add(coding)
+    if wildcard:
+        accepted.update(set(ENCODINGS) - rejected)
+    return accepted
+
+
+def choose_encoding(request, available=ENCODINGS):
+    """从 available 中选出客户端接受的最优编码，都不接受时返回 None。"""
+    accepted = accepted_encodings(request)
+    for encoding in available:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def compress(body, encoding, level='max'):
+    """
+    压缩 body。level='max' 用于快照 (每个目录版本只压缩一次，取最高压缩率)，
+    'fast' 用于即时压缩的响应。gzip 头中的时间戳固定为 0，相同内容的压缩结果相同。
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if level == 'max' else 5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9 if level == 'max' else 6, mtime=0)
+    raise ValueError(f'不支持的编码: {encoding}')
+
+
+def compress_snapshot(body):
+    """为快照预先生成各编码版本: {'gzip': bytes, 'br': bytes}。太小或压缩后不变小的内容不压缩。"""
+    variants = {}
+    if len(body) >= settings.COMPRESSION_MIN_SIZE:
+        for encoding in ENCODINGS:
+            compressed = compress(body, encoding)
+            if len(compressed) < len(body):
+                variants[encoding] = compressed
+    return variants
+
+
+def snapshot_response(request, snapshot, content_type):
+    """
+    用目录快照生成响应：处理 If-None-Match (304)，按 Accept-Encoding 返回预先压缩好的内容。
+    不同编码的内容使用不同的强 ETag (原 ETag 加编码后缀)。
+    """
+    variants = snapshot.get('encodings', {})
+    encoding = choose_encoding(request, [e for e in ENCODINGS if e in variants])
+    etag = snapshot['etag'] if encoding is None else '%s-%s"' % (snapshot['etag'][:-1], encoding)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if encoding is None:
+            response = HttpResponse(snapshot['body'], content_type=content_type)
+        else:
+            response = HttpResponse(variants[encoding], content_type=content_type)
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+class CompressionMiddleware:
+    """
+    即时压缩未经快照的 JSON/HTML 等文本响应 (过滤、分页、搜索等接口)。
+    跳过: 流式响应 (文件下载)、已编码的响应、部分内容 (206)、过小的响应，
+    以及 COMPRESSION_EXCLUDE_PATHS 下的页面 (Admin 页面含 CSRF 令牌，不压缩以避免 BREACH 类攻击)。
+    同时支持 WSGI 和 ASGI；异步模式下压缩在线程池中进行，不阻塞事件循环。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        encoding = self.select_encoding(request, response)
+        if encoding is not None:
+            self.apply(response, encoding, compress(response.content, encoding, level='fast'))
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        encoding = self.select_encoding(request, response)
+        if encoding is not None:
+            compressed = await sync_to_async(compress, thread_sensitive=False)(response.content, encoding, 'fast')
+            self.apply(response, encoding, compressed)
+        return response
+
+    def select_encoding(self, request, response):
+        """返回应使用的编码，不需要压缩时返回 None。"""
+        if response.streaming or response.has_header('Content-Encoding') or response.status_code != 200:
+            return None
+        if request.path.startswith(tuple(settings.COMPRESSION_EXCLUDE_PATHS)):
+            return None
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return None
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return None
+        return choose_encoding(request)
+
+    def apply(self, response, encoding, compressed):
+        if len(compressed) >= len(response.content):
+            return
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # 与 Django GZipMiddleware 一致：压缩后的表示不再与原强 ETag 对应，改为弱 ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
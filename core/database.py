@@ -0,0 +1,21 @@
+# 文件: core/database.py
+# 数据库连接建立时的调优：SQLite 连接按 settings.SQLITE_PRAGMAS 设置 WAL 日志模式、同步级别、
+# 内存映射和页缓存等 (PRAGMA 大多只对当前连接有效，所以每个新连接都要设置)。
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    WAL 模式下读操作不再被写事务阻塞 (只有写与写互斥)，synchronous=NORMAL 在 WAL 下仍保证数据库一致，
+    只是断电时可能丢失最后几个已提交的事务；busy_timeout 让并发写入等待锁而不是立即报 "database is locked"。
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+connection_created.connect(configure_sqlite, dispatch_uid='core_configure_sqlite')
@@ -0,0 +1,268 @@
+# 文件: core/export.py
+# 静态目录导出 (manage.py export_catalog)：把应用/导航 JSON、Logo 和图标的缩略图写成带内容哈希文件名的静态文件，
+# 任何静态 Web 服务器或 CDN 都可以直接托管，Django 服务不可用时客户端仍能读取目录。
+#
+# 目录结构:
+#   manifest.json                  入口文件 (不带哈希，应设置短缓存)，记录版本号和其他文件的路径
+#   applications.<hash>.json       应用列表 (与 /api/v1/applications/ 相同，媒体 URL 指向导出的文件)
+#   navigation.<hash>.json         网站导航 (与 /api/v1/navigation/ 相同，媒体 URL 指向导出的文件)
+#   assets/<hash>.<ext>            Logo、图标及其缩略图
+#   installers/<sha256>.<ext>      (可选) 本机上传的安装包
+#   .export_state.json             增量导出状态
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.encoding import iri_to_uri
+
+from . import catalog, thumbnails
+from .models import AppChoices, Application, WebsiteNavigation
+from .serializers import ApplicationSerializer, WebsiteNavigationSerializer
+from .utils import hash_file
+
+STATE_FILE = '.export_state.json'
+MANIFEST_FILE = 'manifest.json'
+ASSET_DIR = 'assets'
+INSTALLER_DIR = 'installers'
+
+
+class ExportRequest:
+    """
+    序列化器只用 request.build_absolute_uri 生成绝对 URL。
+    导出时没有真实请求，用 server_url (Django 服务的公开地址) 拼接，仍指向服务器的链接 (如安装包) 由此生成。
+    """
+
+    def __init__(self, server_url):
+        self.server_url = server_url.rstrip('/') + '/'
+
+    def build_absolute_uri(self, location=None):
+        return iri_to_uri(urljoin(self.server_url, location or ''))
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _dump_json(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class CatalogExporter:
+    """
+    增量导出：记录上次导出的目录版本号，之后只重新序列化变更日志中出现的对象，
+    其余对象沿用状态文件中保存的结果；资源文件按内容命名，已存在的不再重复生成。
+    """
+
+    def __init__(self, output_dir, base_url='', server_url='http://localhost/', with_installers=False, stdout=None):
+        self.output_dir = os.path.abspath(output_dir)
+        # 导出目录的公开地址；为空时 JSON 中的资源使用相对于导出目录的路径
+        self.base_url = base_url.rstrip('/') + '/' if base_url else ''
+        self.request = ExportRequest(server_url)
+        self.with_installers = with_installers
+        self.stdout = stdout
+        self.written = 0
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    # ---------------- 状态 ----------------
+    def load_state(self):
+        try:
+            with open(os.path.join(self.output_dir, STATE_FILE), 'rb') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def state_is_compatible(self, state):
+        return bool(state) and state.get('base_url') == self.base_url \
+            and state.get('server_url') == self.request.server_url \
+            and state.get('with_installers') == self.with_installers
+
+    # ---------------- 资源文件 ----------------
+    def asset_url(self, relative_path):
+        return self.base_url + relative_path
+
+    def add_file(self, directory, source_path, digest=None):
+        """按内容哈希把文件复制到导出目录，返回相对路径。同名文件已存在时直接复用。"""
+        if digest is None:
+            digest, size = hash_file(source_path)
+        ext = os.path.splitext(source_path)[1].lower()[:10]
+        relative_path = f'{directory}/{digest}{ext}'
+        target_path = os.path.join(self.output_dir, relative_path)
+        if not os.path.exists(target_path):
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix='.tmp')
+            os.close(fd)
+            try:
+                shutil.copyfile(source_path, temp_path)
+                os.replace(temp_path, target_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self.written += 1
+        return relative_path
+
+    def export_image(self, name):
+        """导出原图及各尺寸缩略图，返回 (原图相对路径, {尺寸: {格式: 相对路径}}, 全部相对路径)。"""
+        source_path = os.path.join(settings.MEDIA_ROOT, name)
+        if not os.path.isfile(source_path):
+            return None, None, []
+        original = self.add_file(ASSET_DIR, source_path)
+        variants, files = {}, [original]
+        for size in settings.THUMBNAIL_SIZES:
+            for fmt in thumbnails.THUMBNAIL_FORMATS:
+                try:
+                    variant_path = thumbnails.get_variant_path(name, size, fmt)
+                except thumbnails.ThumbnailError:
+                    continue
+                relative_path = self.add_file(ASSET_DIR, variant_path)
+                variants.setdefault(str(size), {})[fmt] = self.asset_url(relative_path)
+                files.append(relative_path)
+        return original, variants or None, files
+
+    # ---------------- 序列化 ----------------
+    def export_application(self, app):
+        data = dict(ApplicationSerializer(app, context={'request': self.request}).data)
+        files = []
+        if app.logo:
+            original, variants, files = self.export_image(app.logo.name)
+            data['logo_url'] = self.asset_url(original) if original else None
+            data['logo_variants'] = variants
+        if self.with_installers and app.download_type == AppChoices.UPLOADED_FILE and app.uploaded_file:
+            path = app.installer_path()
+            if path:
+                installer = self.add_file(INSTALLER_DIR, path, digest=app.file_sha256 or None)
+                data['uploaded_file_url'] = self.asset_url(installer)
+                files.append(installer)
+        return {'data': data, 'files': files}
+
+    def export_navigation(self, navigation):
+        data = dict(WebsiteNavigationSerializer(navigation, context={'request': self.request}).data)
+        files = []
+        if navigation.favicon:
+            original, variants, files = self.export_image(navigation.favicon.name)
+            data['favicon_url'] = self.asset_url(original) if original else None
+            data['favicon_variants'] = variants
+        return {'data': data, 'files': files}
+
+    def changed_ids(self, state, revision):
+        """
+        返回需要重新导出的 (应用 ID 集合, 导航 ID 集合)，None 表示全部重新导出。
+        分类变化 (如改名) 会影响该分类下所有应用的 JSON。
+        上次导出早于变更日志的清理位置时，增量结果不完整，同样全部重新导出。
+        """
+        if not self.state_is_compatible(state) or state.get('revision', 0) > revision:
+            return None, None
+        if catalog.requires_full_resync(since_revision=state['revision']):
+            return None, None
+        changes = catalog.get_changes(since_revision=state['revision'])
+        app_ids = set().union(*changes['application'])
+        category_ids = set().union(*changes['category'])
+        if category_ids:
+            app_ids |= set(Application.objects.filter(category_id__in=category_ids).values_list('id', flat=True))
+        navigation_ids = set().union(*changes['navigation'])
+        return app_ids, navigation_ids
+
+    def export_section(self, queryset, previous, changed, export):
+        """按 queryset 的顺序组装条目，未变化的沿用上次的结果 (上次没有导出过的对象也会导出)。"""
+        order = [str(pk) for pk in queryset.values_list('pk', flat=True)]
+        if changed is not None:
+            changed = {str(pk) for pk in changed} | (set(order) - set(previous))
+        objects = queryset if changed is None else queryset.filter(pk__in=[int(pk) for pk in changed])
+        entries = {str(obj.pk): export(obj) for obj in objects}
+        return {pk: entries.get(pk) or previous[pk] for pk in order if pk in entries or pk in previous}, order
+
+    def write_json(self, name, data):
+        body = _dump_json(data)
+        relative_path = f'{name}.{hashlib.sha256(body).hexdigest()[:16]}.json'
+        path = os.path.join(self.output_dir, relative_path)
+        if not os.path.exists(path):
+            _write_atomic(path, body)
+            self.written += 1
+        return relative_path
+
+    def run(self, full=False):
+        """执行导出，返回 manifest 字典。目录版本未变化且不是 full 时直接返回上次的 manifest。"""
+        revision = catalog.get_revision()
+        state = None if full else self.load_state()
+        if self.state_is_compatible(state) and state['revision'] == revision:
+            self.log(f'目录版本 {revision} 未变化，无需导出。')
+            return state['manifest']
+
+        app_ids, navigation_ids = self.changed_ids(state, revision)
+        previous_apps = state['applications'] if app_ids is not None else {}
+        previous_navigation = state['navigation'] if navigation_ids is not None else {}
+
+        applications, app_order = self.export_section(
+            catalog.application_queryset().order_by(*catalog.APPLICATION_ORDERING),
+            previous_apps, app_ids, self.export_application,
+        )
+        navigation, navigation_order = self.export_section(
+            WebsiteNavigation.objects.all().order_by('order'),
+            previous_navigation, navigation_ids, self.export_navigation,
+        )
+
+        files = {
+            'applications': self.write_json('applications', [applications[pk]['data'] for pk in app_order]),
+            'navigation': self.write_json('navigation', [navigation[pk]['data'] for pk in navigation_order]),
+        }
+        manifest = {
+            'revision': revision,
+            'generated_at': timezone.now().isoformat(),
+            'base_url': self.base_url,
+            'files': {key: self.asset_url(path) for key, path in files.items()},
+        }
+        referenced = set(files.values())
+        for entry in list(applications.values()) + list(navigation.values()):
+            referenced.update(entry['files'])
+
+        _write_atomic(os.path.join(self.output_dir, MANIFEST_FILE), _dump_json(manifest))
+        previous_referenced = set(state.get('referenced', [])) if state else set()
+        _write_atomic(os.path.join(self.output_dir, STATE_FILE), _dump_json({
+            'revision': revision,
+            'base_url': self.base_url,
+            'server_url': self.request.server_url,
+            'with_installers': self.with_installers,
+            'manifest': manifest,
+            'applications': applications,
+            'navigation': navigation,
+            'referenced': sorted(referenced),
+        }))
+        # 上一版引用的文件保留一轮，正在按旧 manifest 下载的客户端不会失败
+        removed = self.remove_unreferenced(referenced | previous_referenced)
+        self.log(f'已导出版本 {revision}: 应用 {len(app_order)} 个，导航 {len(navigation_order)} 个，'
+                 f'新写入文件 {self.written} 个，清理旧文件 {removed} 个。')
+        return manifest
+
+    def remove_unreferenced(self, keep):
+        removed = 0
+        for directory in ('', ASSET_DIR, INSTALLER_DIR):
+            root = os.path.join(self.output_dir, directory)
+            try:
+                names = os.listdir(root)
+            except OSError:
+                continue
+            for name in names:
+                relative_path = f'{directory}/{name}' if directory else name
+                if name in (MANIFEST_FILE, STATE_FILE) or relative_path in keep:
+                    continue
+                if directory == '' and not name.endswith('.json'):
+                    continue
+                os.remove(os.path.join(root, name))
+                removed += 1
+        return removed
@@ -0,0 +1,130 @@
+# 文件: core/fileindex.py
+# 服务器文件索引：用 os.scandir 扫描目录，按大小和 mtime 对比数据库中的记录，只写入有变化的文件。
+
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import AppChoices, Application, ServerFile
+from .utils import hash_file, locate_server_file
+
+REFRESH_CACHE_KEY = 'core:fileindex:refreshed:{}'
+# 上次完整刷新时计算出的索引目录列表，与各目录的刷新标记同时过期
+ROOTS_CACHE_KEY = 'core:fileindex:roots'
+
+
+def upload_root():
+    return os.path.abspath(os.path.join(settings.MEDIA_ROOT, 'uploads'))
+
+
+def index_roots():
+    """需要索引的目录：media/uploads 加上所有 SERVER_PATH 应用的文件所在目录。"""
+    roots = [upload_root()]
+    paths = Application.objects.filter(download_type=AppChoices.SERVER_PATH) \
+        .exclude(server_file_path='').values_list('server_file_path', flat=True)
+    for file_path in paths:
+        located = locate_server_file(file_path)
+        if located:
+            root = os.path.dirname(located)
+            if root not in roots:
+                roots.append(root)
+    return roots
+
+
+def scan_root(root):
+    """
+    增量刷新一个目录 (不递归，跳过隐藏文件)，返回 (新增, 更新, 删除) 数量。
+    目录不存在时删除该目录的全部索引记录。
+    """
+    existing = {f.name: f for f in ServerFile.objects.filter(root=root)}
+    created, updated, seen = [], [], set()
+
+    try:
+        entries = os.scandir(root)
+    except OSError:
+        entries = None
+    if entries is not None:
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat_result = entry.stat()
+                except OSError:
+                    continue
+                seen.add(entry.name)
+                record = existing.get(entry.name)
+                if record is None:
+                    created.append(ServerFile(
+                        root=root, name=entry.name, size=stat_result.st_size, mtime=stat_result.st_mtime,
+                    ))
+                elif record.size != stat_result.st_size or record.mtime != stat_result.st_mtime:
+                    record.size = stat_result.st_size
+                    record.mtime = stat_result.st_mtime
+                    record.sha256 = ''
+                    updated.append(record)
+
+    removed = [f.pk for name, f in existing.items() if name not in seen]
+    with transaction.atomic():
+        ServerFile.objects.bulk_create(created, batch_size=500, ignore_conflicts=True)
+        ServerFile.objects.bulk_update(updated, ['size', 'mtime', 'sha256'], batch_size=500)
+        ServerFile.objects.filter(pk__in=removed).delete()
+    return len(created), len(updated), len(removed)
+
+
+def record_file(absolute_path, sha256=''):
+    """直接登记一个刚写入的文件 (例如分片上传完成时，哈希已经算好)。"""
+    stat_result = os.stat(absolute_path)
+    ServerFile.objects.update_or_create(
+        root=os.path.dirname(absolute_path),
+        name=os.path.basename(absolute_path),
+        defaults={'size': stat_result.st_size, 'mtime': stat_result.st_mtime, 'sha256': sha256},
+    )
+
+
+def refresh_index(max_age=0):
+    """
+    刷新所有索引目录，并删除已不再需要索引的目录的记录。
+    max_age > 0 时，距上次刷新不足 max_age 秒的目录直接跳过 (文件选择器每次打开都会调用)。
+    上次刷新后不足 max_age 秒时直接返回 {}，不再查询 SERVER_PATH 应用和清理旧目录。
+    返回 {目录: (新增, 更新, 删除)}。
+    """
+    if max_age and cache.get(ROOTS_CACHE_KEY) is not None:
+        return {}
+    roots = index_roots()
+    report = {}
+    for root in roots:
+        key = REFRESH_CACHE_KEY.format(hashlib.sha1(root.encode()).hexdigest())
+        if max_age and cache.get(key):
+            continue
+        report[root] = scan_root(root)
+        cache.set(key, time.time(), max_age or settings.FILE_INDEX_REFRESH_INTERVAL)
+    ServerFile.objects.exclude(root__in=roots).delete()
+    cache.set(ROOTS_CACHE_KEY, roots, max_age or settings.FILE_INDEX_REFRESH_INTERVAL)
+    return report
+
+
+def hash_pending(limit=None):
+    """为尚未计算 SHA-256 的文件流式计算哈希，返回处理数量。"""
+    pending = ServerFile.objects.filter(sha256='').order_by('pk')
+    if limit:
+        pending = pending[:limit]
+    count = 0
+    for record in pending:
+        try:
+            stat_result = os.stat(record.absolute_path)
+            digest, size = hash_file(record.absolute_path)
+        except OSError:
+            continue
+        # 计算期间文件被改写时放弃本次结果，留待下次刷新
+        if size != record.size or stat_result.st_mtime != record.mtime:
+            continue
+        ServerFile.objects.filter(pk=record.pk, size=record.size, mtime=record.mtime).update(sha256=digest)
+        count += 1
+    return count
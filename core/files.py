@@ -1,67 +1,635 @@
 # 文件: core/files.py (更新)
 
+import asyncio
+import functools
 import os
+import re
+import shutil
+import uuid
+from datetime import timedelta
 from django.conf import settings
-from django.http import JsonResponse, FileResponse, Http404, HttpResponse
-from django.views.decorators.http import require_GET
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from django.db.models import Q
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    JsonResponse, Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseRedirect, StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_GET, require_POST, require_http_methods, require_safe
 from django.contrib.admin.views.decorators import staff_member_required
 import mimetypes # 新增导入
+from urllib.parse import quote
+from .models import Application, AppChoices, DownloadEvent, ServerFile, UploadSession
+from . import analytics, fileindex
+from .asgi import DISCONNECT_SCOPE_KEY
+from .storage import BLOB_PREFIX, blob_storage
+from . import thumbnails
+from .utils import hash_file, locate_server_file
+
+# 文件流式传输时每次读取的块大小
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 单个请求允许的最大 Range 段数，超过则忽略 Range 直接返回完整文件 (防止滥用)
+MAX_RANGES = 16
+
+# 文件选择器 API 可排序的字段和每页数量上限
+FILE_SORT_FIELDS = ('name', 'size', 'mtime')
+MAX_FILE_PAGE_SIZE = 500
+
+_RANGE_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+_CONTENT_RANGE_RE = re.compile(r'^bytes\s+(\d+)-(\d+)/(\d+|\*)$')
+
 
 @staff_member_required
 @require_GET
 def get_uploaded_files(request):
     """
-    返回 MEDIA_ROOT/uploads 目录下的文件列表。
+    分页返回服务器文件索引 (media/uploads 以及 SERVER_PATH 应用所在目录)。
+    参数: q 文件名前缀, sort 排序字段 name/size/mtime (加 - 前缀倒序), page 页码, page_size 每页数量。
+    索引按 mtime 增量刷新，两次刷新间隔至少 FILE_INDEX_REFRESH_INTERVAL 秒。
+    """
+    fileindex.refresh_index(max_age=settings.FILE_INDEX_REFRESH_INTERVAL)
+
+    queryset = ServerFile.objects.all()
+    prefix = request.GET.get('q', '').strip()
+    if prefix:
+        queryset = queryset.filter(name__istartswith=prefix)
+
+    sort = request.GET.get('sort', 'name')
+    if sort.lstrip('-') not in FILE_SORT_FIELDS:
+        return JsonResponse({'files': [], 'error': f"不支持的排序字段: {sort}"}, status=400)
+    queryset = queryset.order_by(sort, 'name', 'pk')
+
+    try:
+        page_size = int(request.GET.get('page_size', settings.FILE_INDEX_PAGE_SIZE))
+    except ValueError:
+        page_size = settings.FILE_INDEX_PAGE_SIZE
+    page_size = max(1, min(page_size, MAX_FILE_PAGE_SIZE))
+    page = Paginator(queryset, page_size).get_page(request.GET.get('page'))
+
+    return JsonResponse({
+        'files': [
+            {'name': f.name, 'path': f.path, 'size': f.size, 'mtime': f.mtime, 'sha256': f.sha256}
+            for f in page
+        ],
+        'count': page.paginator.count,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'has_next': page.has_next(),
+    })
+
+
+# =========================================================
+# 断点续传支持：Range / If-Range / ETag / Last-Modified
+# =========================================================
+def file_etag(stat_result):
+    """根据文件的修改时间和大小生成强 ETag。"""
+    return '"%x-%x"' % (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def parse_range_header(header, size):
+    """
+    解析 Range 请求头，返回 [(start, end), ...] (end 为包含端点)。
+    - 返回 None 表示应忽略 Range (格式不合法或段数过多)，直接返回完整文件；
+    - 返回 [] 表示所有段都无法满足 (应返回 416)。
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+
+    parts = spec.split(',')
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        match = _RANGE_RE.match(part)
+        if not match:
+            return None
+        first, last = match.groups()
+        if not first:
+            # 后缀形式: bytes=-500 表示最后 500 个字节
+            if not last:
+                return None
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                return None
+            if start >= size:
+                continue
+            end = min(end, size - 1)
+        if size > 0:
+            ranges.append((start, end))
+    return ranges
+
+
+def _if_range_matches(request, etag, last_modified):
+    """If-Range 校验：只有资源未变化时才允许返回部分内容。"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        # If-Range 只能使用强比较
+        return if_range == etag
+    parsed = parse_http_date_safe(if_range)
+    return parsed is not None and parsed == last_modified
+
+
+def _iter_file_range(path, start, length):
+    """从 start 开始读取 length 个字节，分块产出。"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _iter_multipart(path, parts, boundary):
+    """按 multipart/byteranges 格式依次产出各段内容。"""
+    for header, (start, end) in parts:
+        yield header
+        yield from _iter_file_range(path, start, end - start + 1)
+        yield b'\r\n'
+    yield f'--{boundary}--\r\n'.encode('ascii')
+
+
+async def _aiter_file_range(path, start, length, disconnected=None):
+    """
+    _iter_file_range 的异步版本 (ASGI)：每次读取在线程池中完成，等待客户端接收数据时不占用线程，
+    一个进程可以同时服务大量慢速下载。客户端断开 (disconnected 被设置) 后停止读取。
+    """
+    f = await asyncio.to_thread(open, path, 'rb')
+    try:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            if disconnected is not None and disconnected.is_set():
+                return
+            chunk = await asyncio.to_thread(f.read, min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+async def _aiter_multipart(path, parts, boundary, disconnected=None):
+    """_iter_multipart 的异步版本。"""
+    for header, (start, end) in parts:
+        yield header
+        async for chunk in _aiter_file_range(path, start, end - start + 1, disconnected):
+            yield chunk
+        yield b'\r\n'
+    yield f'--{boundary}--\r\n'.encode('ascii')
+
+
+def _file_streams(request):
+    """
+    按请求所在的服务器类型选择文件迭代器：ASGI 下使用异步迭代器 (由事件循环直接消费)，
+    WSGI 下使用普通迭代器。返回 (单段迭代器, 多段迭代器)，均接受与同步版本相同的参数。
+    """
+    if not isinstance(request, ASGIRequest):
+        return _iter_file_range, _iter_multipart
+    disconnected = request.scope.get(DISCONNECT_SCOPE_KEY)
+    return (
+        functools.partial(_aiter_file_range, disconnected=disconnected),
+        functools.partial(_aiter_multipart, disconnected=disconnected),
+    )
+
+
+def serve_file(request, absolute_path, content_type=None, filename=None, as_attachment=True):
+    """
+    以支持断点续传的方式返回文件：
+    - 总是发送 Accept-Ranges / Content-Length / ETag / Last-Modified；
+    - 支持 If-None-Match / If-Modified-Since 条件请求 (304)；
+    - 支持单段和多段 Range 请求 (206 Partial Content)，以及 If-Range 校验。
     """
-    # 构造上传目录的绝对路径，默认您的文件应该放在 media/uploads/ 目录下
-    upload_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
-    
-    # 确保目录存在
-    if not os.path.exists(upload_dir):
-        return JsonResponse({'files': []})
-    
     try:
-        # 遍历目录，只列出文件，排除文件夹和隐藏文件
-        file_list = [
-            f for f in os.listdir(upload_dir) 
-            if os.path.isfile(os.path.join(upload_dir, f)) and not f.startswith('.')
-        ]
-        
-        # 返回 JSON 格式的文件名列表
-        return JsonResponse({'files': file_list})
-        
-    except Exception as e:
-        # print(f"Error reading upload directory: {e}") # 移除 print
-        return JsonResponse({'files': [], 'error': str(e)}, status=500)
+        stat_result = os.stat(absolute_path)
+    except OSError:
+        raise Http404(f"文件未找到: {absolute_path}")
+
+    size = stat_result.st_size
+    last_modified = int(stat_result.st_mtime)
+    etag = file_etag(stat_result)
+
+    if content_type is None:
+        content_type, encoding = mimetypes.guess_type(absolute_path)
+        if content_type is None:
+            content_type = 'application/octet-stream' # 默认二进制流
+
+    def finalize(response):
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        if filename:
+            disposition = 'attachment' if as_attachment else 'inline'
+            response['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+        return response
+
+    # 1. 条件请求 (客户端缓存仍然有效时直接返回 304)
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return finalize(conditional)
+
+    is_head = request.method == 'HEAD'
+    iter_range, iter_multipart = _file_streams(request)
+
+    # 2. Range 请求
+    ranges = None
+    if _if_range_matches(request, etag, last_modified):
+        ranges = parse_range_header(request.META.get('HTTP_RANGE'), size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return finalize(response)
+
+    if ranges and len(ranges) == 1:
+        start, end = ranges[0]
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            [] if is_head else iter_range(absolute_path, start, length),
+            status=206, content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+        return finalize(response)
+
+    if ranges:
+        boundary = uuid.uuid4().hex
+        parts = []
+        total = 0
+        for start, end in ranges:
+            header = (
+                f'--{boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+            ).encode('ascii')
+            parts.append((header, (start, end)))
+            total += len(header) + (end - start + 1) + 2
+        total += len(f'--{boundary}--\r\n')
+        response = StreamingHttpResponse(
+            [] if is_head else iter_multipart(absolute_path, parts, boundary),
+            status=206, content_type=f'multipart/byteranges; boundary={boundary}',
+        )
+        response['Content-Length'] = str(total)
+        return finalize(response)
+
+    # 3. 完整文件
+    response = StreamingHttpResponse(
+        [] if is_head else iter_range(absolute_path, 0, size),
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(size)
+    return finalize(response)
+
+
+# =========================================================
+# 文件交付后端：进程内流式传输 / X-Accel-Redirect (nginx) / X-Sendfile (Apache、lighttpd)
+# =========================================================
+DELIVERY_STREAM = 'stream'
+DELIVERY_X_ACCEL_REDIRECT = 'x-accel-redirect'
+DELIVERY_X_SENDFILE = 'x-sendfile'
+
+
+def _accel_redirect_uri(absolute_path):
+    """
+    根据 FILE_DELIVERY_ACCEL_LOCATIONS 把文件系统路径映射为 nginx 的 internal location。
+    没有匹配的映射时返回 None。
+    """
+    real_path = os.path.realpath(absolute_path)
+    for fs_prefix, uri_prefix in getattr(settings, 'FILE_DELIVERY_ACCEL_LOCATIONS', []):
+        fs_prefix = os.path.join(os.path.realpath(fs_prefix), '')
+        if real_path.startswith(fs_prefix):
+            relative = real_path[len(fs_prefix):].replace(os.sep, '/')
+            return uri_prefix.rstrip('/') + '/' + quote(relative)
+    return None
+
+
+def deliver_file(request, absolute_path, filename=None):
+    """
+    按 settings.FILE_DELIVERY_BACKEND 交付文件。
+    使用 X-Accel-Redirect / X-Sendfile 时，视图只负责鉴权和解析路径，
+    实际的字节传输 (包括 Range 断点续传) 由前端 Web 服务器以零拷贝 sendfile 完成。
+    """
+    backend = getattr(settings, 'FILE_DELIVERY_BACKEND', DELIVERY_STREAM)
+
+    if backend == DELIVERY_STREAM:
+        return serve_file(request, absolute_path, filename=filename)
+
+    if backend == DELIVERY_X_ACCEL_REDIRECT:
+        header, value = 'X-Accel-Redirect', _accel_redirect_uri(absolute_path)
+        if value is None:
+            # 文件不在任何 internal location 之下，退回进程内传输
+            return serve_file(request, absolute_path, filename=filename)
+    elif backend == DELIVERY_X_SENDFILE:
+        header, value = 'X-Sendfile', os.path.realpath(absolute_path)
+    else:
+        raise ImproperlyConfigured(f"未知的 FILE_DELIVERY_BACKEND: {backend!r}")
+
+    if not os.path.isfile(absolute_path):
+        raise Http404(f"文件未找到: {absolute_path}")
+
+    content_type, encoding = mimetypes.guess_type(absolute_path)
+    response = HttpResponse(content_type=content_type or 'application/octet-stream')
+    response[header] = value
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def resolve_server_path(file_path):
+    """
+    解析 SERVER_PATH 下载路径，只允许下载已在应用中登记的服务器文件。
+    相对路径 (如文件选择器填入的 uploads/xxx) 优先相对于 MEDIA_ROOT 解析。
+    返回绝对路径，未登记或文件不存在时返回 None。
+    """
+    if registered_application_id(file_path) is None:
+        return None
+    return locate_server_file(file_path)
+
+
+def registered_application_id(file_path):
+    """返回登记了该服务器文件路径的应用 ID，没有时返回 None。"""
+    return Application.objects.filter(
+        download_type=AppChoices.SERVER_PATH, server_file_path=file_path
+    ).values_list('id', flat=True).first()
+
+
+def async_require_safe(view):
+    """require_safe 的异步版本 (Django 4.2 的 require_safe 不支持异步视图)。"""
+    @functools.wraps(view)
+    async def inner(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+    return inner
+
 
 # 【新增】处理服务器路径下载的 API 接口
-@require_GET
-def download_server_file(request):
+@async_require_safe
+async def download_server_file(request):
     """
     处理 download_type='SERVER_PATH' 的文件下载。
+    支持 Range 断点续传，传输方式由 FILE_DELIVERY_BACKEND 决定。
+    异步视图：ASGI 下文件内容由事件循环流式发送，传输期间不占用线程。
     """
     file_path = request.GET.get('path')
     if not file_path:
         return HttpResponse("参数缺失: 需要 'path' 参数。", status=400)
-    
-    absolute_path = file_path
-    
-    # 文件存在性检查
-    if not os.path.exists(absolute_path):
+
+    # 文件登记和存在性检查 (只允许下载已在应用中登记的服务器文件)
+    # 文件系统访问 (定位文件、stat) 在线程中执行，不阻塞事件循环
+    application_id = await sync_to_async(registered_application_id)(file_path)
+    absolute_path = None
+    if application_id is not None:
+        absolute_path = await asyncio.to_thread(locate_server_file, file_path)
+    if absolute_path is None:
          raise Http404(f"文件未找到: {file_path}")
 
-    # 准备 FileResponse
+    filename = os.path.basename(absolute_path)
+    response = await asyncio.to_thread(deliver_file, request, absolute_path, filename)
+    return analytics.track_download(request, response, application_id, DownloadEvent.SOURCE_SERVER_PATH, file_path)
+
+
+def uploaded_file_application_id(name):
+    return Application.objects.filter(uploaded_file=f'uploads/{name}').values_list('id', flat=True).first()
+
+
+@async_require_safe
+async def serve_uploaded_file(request, name):
+    """
+    提供 MEDIA_ROOT/uploads 下已上传安装包的下载 (download_type='UPLOADED_FILE')。
+    与 download_server_file 一样支持 Range 断点续传，也是异步视图。
+    """
+    upload_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
     try:
-        mime_type, encoding = mimetypes.guess_type(absolute_path)
-        if mime_type is None:
-            mime_type = 'application/octet-stream' # 默认二进制流
-
-        response = FileResponse(open(absolute_path, 'rb'), content_type=mime_type)
-        
-        # 设置文件名和下载头
-        filename = os.path.basename(absolute_path)
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
-    except Exception as e:
-        return HttpResponse(f"文件读取失败: {e}", status=500)
\ No newline at end of file
+        absolute_path = safe_join(upload_dir, name)
+    except Exception:
+        raise Http404("非法的文件路径")
+
+    if not await asyncio.to_thread(os.path.isfile, absolute_path):
+        raise Http404(f"文件未找到: {name}")
+
+    response = await asyncio.to_thread(deliver_file, request, absolute_path, os.path.basename(absolute_path))
+    if request.method == 'GET':
+        application_id = await sync_to_async(uploaded_file_application_id)(name)
+        analytics.track_download(request, response, application_id, DownloadEvent.SOURCE_UPLOADED_FILE, f'uploads/{name}')
+    return response
+
+
+@require_safe
+def download_external_link(request, application_id):
+    """
+    外部链接下载：记录一次跳转后重定向到应用登记的外部地址。
+    客户端通过这个地址下载外部链接类型的应用，下载统计才能覆盖外部链接。
+    """
+    application = get_object_or_404(
+        Application.objects.only('id', 'external_link'),
+        pk=application_id, download_type=AppChoices.EXTERNAL_LINK,
+    )
+    if not application.external_link:
+        raise Http404("该应用没有登记外部链接")
+    if request.method == 'GET':
+        analytics.record(
+            request, application.pk, DownloadEvent.SOURCE_EXTERNAL_LINK, application.external_link,
+            DownloadEvent.STATUS_REDIRECT,
+        )
+    return HttpResponseRedirect(application.external_link)
+
+
+@require_safe
+def serve_blob(request, name):
+    """
+    提供内容寻址的图片 (Logo / Favicon)。
+    文件名就是内容的哈希，内容永不改变，因此可以使用长期的 immutable 缓存。
+    """
+    try:
+        absolute_path = safe_join(blob_storage.path(BLOB_PREFIX), name)
+    except Exception:
+        raise Http404("非法的文件路径")
+
+    response = serve_file(request, absolute_path, as_attachment=False)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@require_safe
+def serve_thumbnail(request, size, name, fmt):
+    """
+    提供 Logo / Favicon 的固定尺寸缩略图 (thumbs/<size>/<原图路径>.<webp|png>)，
+    首次请求时生成并缓存在磁盘上。
+    """
+    try:
+        absolute_path = thumbnails.get_variant_path(name, int(size), fmt)
+    except thumbnails.ThumbnailError as e:
+        raise Http404(str(e))
+
+    response = serve_file(request, absolute_path, as_attachment=False)
+    if thumbnails.is_immutable(name):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+
+# =========================================================
+# 分片上传 (大安装包)：按块写入磁盘临时文件，可按偏移量续传，完成后组装并计算哈希。
+# 协议:
+#   POST /admin/core/uploads/            filename, size -> 创建会话 (同名同大小的未完成会话直接续传)
+#   GET  /admin/core/uploads/<id>/       查询当前偏移量
+#   PUT  /admin/core/uploads/<id>/       请求体为从 Upload-Offset (或 Content-Range 起点) 开始的数据块
+# =========================================================
+def _upload_payload(session):
+    return {
+        'id': str(session.pk),
+        'filename': session.filename,
+        'size': session.size,
+        'offset': session.offset,
+        'status': session.status,
+        'name': session.final_name,
+        'sha256': session.sha256,
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+    }
+
+
+def purge_stale_uploads():
+    """删除长时间未更新的上传会话及其临时文件。"""
+    cutoff = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRE_SECONDS)
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff):
+        try:
+            os.remove(session.part_path)
+        except OSError:
+            pass
+        session.delete()
+
+
+def _request_offset(request):
+    """从 Upload-Offset 或 Content-Range 请求头读取本块数据的起始偏移量。"""
+    if 'HTTP_UPLOAD_OFFSET' in request.META:
+        return int(request.META['HTTP_UPLOAD_OFFSET'])
+    match = _CONTENT_RANGE_RE.match(request.META.get('HTTP_CONTENT_RANGE', '').strip())
+    if match:
+        return int(match.group(1))
+    raise ValueError('缺少 Upload-Offset 或 Content-Range 请求头')
+
+
+def _complete_upload(session):
+    """把接收完成的临时文件移动到 MEDIA_ROOT/uploads，并流式计算 SHA-256。"""
+    final_name = default_storage.get_available_name(f'uploads/{session.filename}')
+    final_path = default_storage.path(final_name)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    # 临时目录与 MEDIA_ROOT 不在同一文件系统时 shutil.move 改为复制后删除
+    shutil.move(session.part_path, final_path)
+
+    session.sha256, size = hash_file(final_path)
+    session.final_name = final_name
+    session.status = UploadSession.STATUS_COMPLETE
+    session.save(update_fields=['sha256', 'final_name', 'status', 'updated_at'])
+    # 哈希已经算好，直接写入文件索引
+    fileindex.record_file(final_path, session.sha256)
+
+
+@staff_member_required
+@require_POST
+def chunked_upload_create(request):
+    """创建 (或恢复) 分片上传会话。"""
+    filename = os.path.basename(request.POST.get('filename', '').replace('\\', '/')).strip()
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        size = -1
+    if not filename or filename.startswith('.') or size < 0:
+        return JsonResponse({'detail': "参数错误: 需要 'filename' 和 'size'。"}, status=400)
+
+    purge_stale_uploads()
+
+    # 同一用户上传同名同大小的文件时，从上次中断的位置继续
+    session = UploadSession.objects.filter(
+        created_by=request.user, filename=filename, size=size,
+        status__in=[UploadSession.STATUS_UPLOADING, UploadSession.STATUS_RECEIVING],
+    ).first()
+    if session is not None and os.path.exists(session.part_path):
+        return JsonResponse(_upload_payload(session))
+
+    session = UploadSession.objects.create(created_by=request.user, filename=filename, size=size)
+    os.makedirs(settings.CHUNKED_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(session.part_path, 'wb').close()
+    if size == 0:
+        _complete_upload(session)
+    return JsonResponse(_upload_payload(session), status=201)
+
+
+@staff_member_required
+@require_http_methods(['GET', 'HEAD', 'PUT'])
+def chunked_upload_detail(request, upload_id):
+    """
+    查询上传进度，或写入一个数据块。
+    写入前用条件 UPDATE (offset=起点且没有其他请求在写入) 占用会话，同一偏移量的并发请求只有一个能写入，
+    其余返回 409；写入结束 (包括客户端断开) 后记录新的偏移量并释放会话。
+    """
+    session = get_object_or_404(UploadSession, pk=upload_id, created_by=request.user)
+    if request.method != 'PUT' or session.status == UploadSession.STATUS_COMPLETE:
+        return JsonResponse(_upload_payload(session))
+
+    try:
+        start = _request_offset(request)
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError as e:
+        return JsonResponse({'detail': f'参数错误: {e}'}, status=400)
+
+    if start + length > session.size:
+        return JsonResponse({'detail': '数据超出文件大小'}, status=400)
+
+    # 写入中断 (进程被杀) 的会话超过 CHUNKED_UPLOAD_WRITE_TIMEOUT 后可以重新占用
+    stale = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_WRITE_TIMEOUT)
+    claimed = UploadSession.objects.filter(pk=session.pk, offset=start).filter(
+        Q(status=UploadSession.STATUS_UPLOADING) | Q(status=UploadSession.STATUS_RECEIVING, updated_at__lt=stale)
+    ).update(status=UploadSession.STATUS_RECEIVING, updated_at=timezone.now())
+    if not claimed:
+        # 偏移量不一致 (例如上一块的响应丢失) 或另一个请求正在写入，告知客户端服务器记录的位置
+        session.refresh_from_db()
+        detail = '偏移量不匹配' if session.offset != start else '另一个请求正在写入'
+        return JsonResponse(dict(_upload_payload(session), detail=detail), status=409)
+
+    # 直接从请求流读取并写入磁盘，不把请求体缓存在内存中
+    written = 0
+    try:
+        with open(session.part_path, 'r+b') as f:
+            f.seek(start)
+            f.truncate()
+            while written < length:
+                chunk = request.read(min(STREAM_CHUNK_SIZE, length - written))
+                if not chunk:
+                    break
+                f.write(chunk)
+                written += len(chunk)
+    finally:
+        session.offset = start + written
+        session.status = UploadSession.STATUS_UPLOADING
+        session.save(update_fields=['offset', 'status', 'updated_at'])
+    if session.offset == session.size:
+        _complete_upload(session)
+    return JsonResponse(_upload_payload(session))
@@ -0,0 +1,416 @@
+import json
+import multiprocessing
+import os
+import platform
+import queue as stdlib_queue
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.test import Client, override_settings
+
+from core import analytics, catalog
+from core.metrics import QueryCounter
+from core.models import AppChoices, Application, Category
+
+# 下载测试文件在 SERVER_PATH 应用中登记的名称
+DOWNLOAD_FILE_NAME = 'bench-download.bin'
+
+# 读并发测试的对照组: 调优前的 SQLite 默认设置 (回滚日志、synchronous=FULL)
+LEGACY_SQLITE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+def percentile(sorted_values, p):
+    """最近秩法百分位数 (sorted_values 已升序排列)。"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _concurrent_reader(index, readers, deadline, category_ids, queue):
+    """读并发测试的读进程: 持续查询分类下的应用列表 (类似列表接口缓存未命中时的查询)。"""
+    latencies, errors = [], 0
+    try:
+        n = index
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                list(Application.objects.filter(category_id=category_ids[n % len(category_ids)])
+                     .values('id', 'name', 'version', 'order')[:100])
+            except OperationalError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            n += readers
+    finally:
+        connection.close()
+        queue.put({'latencies': latencies, 'errors': errors, 'writes': 0})
+
+
+def _concurrent_writer(deadline, app_ids, queue):
+    """读并发测试的写进程: 不断提交更新事务 (类似后台编辑保存)。"""
+    writes, errors = 0, 0
+    try:
+        while time.time() < deadline:
+            try:
+                with transaction.atomic():
+                    Application.objects.filter(pk__in=app_ids).update(order=F('order') + 1)
+                writes += 1
+            except OperationalError:
+                errors += 1
+    finally:
+        connection.close()
+        queue.put({'latencies': [], 'errors': errors, 'writes': writes})
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        '在临时 SQLite 数据库中生成不同规模的模拟目录，进程内压测应用列表 API、首页、'
+        '文件选择器和服务器文件下载，输出吞吐量、p50/p99 延迟、SQL 查询数和峰值内存 (JSON)；'
+        '另外对比 SQLite 默认设置与 SQLITE_PRAGMAS (WAL) 下，有写入时的并发读性能'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,10000,100000', help='逗号分隔的应用数量 (每个规模单独生成一份目录)')
+        parser.add_argument('--requests', type=int, default=50, help='每个接口在缓存预热后的请求次数')
+        parser.add_argument('--max-files', type=int, default=10000, help='文件选择器测试的上传目录文件数上限 (不超过应用数量)')
+        parser.add_argument('--download-size', type=int, default=256, help='下载测试文件的大小 (MB)')
+        parser.add_argument('--download-requests', type=int, default=5, help='下载接口的请求次数')
+        parser.add_argument('--readers', type=int, default=8, help='读并发测试的读进程数 (0 表示跳过该测试)')
+        parser.add_argument('--concurrency-seconds', type=float, default=3, help='读并发测试每种设置的持续时间 (秒)')
+        parser.add_argument('--output', help='把 JSON 结果写入该文件 (默认输出到标准输出)')
+        parser.add_argument('--compare', help='与之前保存的 JSON 结果对比，输出各项指标的变化')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes 必须是逗号分隔的整数')
+        if not sizes or min(sizes) < 1:
+            raise CommandError('--sizes 至少包含一个正整数')
+        self.options = options
+
+        work_dir = tempfile.mkdtemp(prefix='appmanager-bench-')
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        original_test_name = test_settings.get('NAME')
+        old_name = connection.settings_dict['NAME']
+        results = []
+        try:
+            # 使用独立的数据库和缓存，不影响正在使用的数据
+            test_settings['NAME'] = os.path.join(work_dir, 'bench.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            with override_settings(
+                MEDIA_ROOT=os.path.join(work_dir, 'media'),
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'}},
+                METRICS_DIR='',
+                DOWNLOAD_EVENTS_FLUSH_INTERVAL=0,
+                FILE_DELIVERY_BACKEND='stream',
+                DEBUG=False,
+            ):
+                for size in sizes:
+                    results.append(self.run_scenario(size))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = original_test_name
+            analytics.buffer.events.clear()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        report = {
+            'commit': git_commit(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'options': {
+                'requests': options['requests'],
+                'download_size_mb': options['download_size'],
+                'download_requests': options['download_requests'],
+                'readers': options['readers'],
+                'concurrency_seconds': options['concurrency_seconds'],
+            },
+            'scenarios': results,
+        }
+        body = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(body + '\n')
+            self.stderr.write(f'结果已写入 {options["output"]}')
+        else:
+            self.stdout.write(body)
+        if options['compare']:
+            self.compare(report, options['compare'])
+
+    # ---------------- 数据准备 ----------------
+    def log(self, message):
+        self.stderr.write(message)
+
+    def reset_data(self):
+        Application.objects.all().delete()
+        Category.objects.all().delete()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'uploads'))
+
+    def seed(self, size):
+        """生成 size 个应用，分布在多个分类中；另建上传目录文件和一个大文件供下载测试。"""
+        categories = Category.objects.bulk_create([
+            Category(name=f'分类 {i}', slug=f'category-{i}', order=i)
+            for i in range(max(5, min(500, size // 50)))
+        ])
+        file_count = min(size, self.options['max_files'])
+        upload_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+        for i in range(file_count):
+            open(os.path.join(upload_dir, f'安装包 {i}.exe'), 'wb').close()
+
+        # 稀疏文件：不占用磁盘空间，读取时内容为零
+        download_path = os.path.join(settings.MEDIA_ROOT, DOWNLOAD_FILE_NAME)
+        with open(download_path, 'wb') as f:
+            f.truncate(self.options['download_size'] * 1024 * 1024)
+
+        apps = []
+        for i in range(size):
+            app = Application(
+                name=f'应用 {i}', version=f'{i % 10}.{i % 7}', category=categories[i % len(categories)],
+                short_description=f'第 {i} 个基准测试应用', order=i,
+                logo=f'blobs/{i % 256:02x}/{i:064x}.png',
+                install_method=AppChoices.SILENT if i % 2 else AppChoices.MANUAL,
+                is_recommended=i % 10 == 0,
+            )
+            if i == 0:
+                app.download_type = AppChoices.SERVER_PATH
+                app.server_file_path = DOWNLOAD_FILE_NAME
+            elif i % 5 == 0:
+                app.download_type = AppChoices.EXTERNAL_LINK
+                app.external_link = f'https://example.com/download/{i}.exe'
+            else:
+                app.uploaded_file = f'uploads/安装包 {i % max(file_count, 1)}.exe'
+                app.file_size = i
+                app.file_sha256 = f'{i:064x}'
+            apps.append(app)
+        Application.objects.bulk_create(apps, batch_size=1000)
+        return len(categories), file_count
+
+    # ---------------- 测量 ----------------
+    def request(self, client, path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f'{path} 返回 {response.status_code}')
+        size = 0
+        if response.streaming:
+            for chunk in response.streaming_content:
+                size += len(chunk)
+            response.close()
+        else:
+            size = len(response.content)
+        return size
+
+    def measure(self, client, path, requests, cold=None):
+        """
+        先在空缓存下测一次冷启动 (耗时、查询数、tracemalloc 峰值内存)，
+        再连续请求 requests 次测热路径的吞吐量和延迟分布。cold 为清空缓存的函数。
+        """
+        result = {'path': path}
+
+        if cold is not None:
+            cold()
+            queries = QueryCounter()
+            start = time.perf_counter()
+            with connection.execute_wrapper(queries):
+                self.request(client, path)
+            result['cold_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            result['cold_queries'] = queries.count
+
+        if cold is not None:
+            cold()
+        tracemalloc.start()
+        try:
+            self.request(client, path)
+            result['peak_memory_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+
+        timings, query_counts, response_bytes = [], [], 0
+        total_start = time.perf_counter()
+        for _ in range(requests):
+            queries = QueryCounter()
+            start = time.perf_counter()
+            with connection.execute_wrapper(queries):
+                response_bytes = self.request(client, path)
+            timings.append(time.perf_counter() - start)
+            query_counts.append(queries.count)
+        total = time.perf_counter() - total_start
+        analytics.buffer.events.clear()
+
+        timings.sort()
+        result.update({
+            'requests': requests,
+            'throughput_rps': round(requests / total, 2) if total else None,
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p99_ms': round(percentile(timings, 99) * 1000, 3),
+            'max_ms': round(timings[-1] * 1000, 3),
+            'queries_per_request': round(sum(query_counts) / len(query_counts), 2),
+            'response_bytes': response_bytes,
+        })
+        if response_bytes and total:
+            result['throughput_mb_s'] = round(response_bytes * requests / total / 1024 / 1024, 1)
+        return result
+
+    def run_scenario(self, size):
+        self.log(f'== {size} 个应用 ==')
+        self.reset_data()
+        start = time.perf_counter()
+        category_count, file_count = self.seed(size)
+        seed_seconds = time.perf_counter() - start
+        # bulk_create 不触发信号，手动递增版本号使旧快照失效
+        catalog.bump_revision()
+        cache.clear()
+
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        admin = get_user_model().objects.filter(username='bench').first() \
+            or get_user_model().objects.create_superuser('bench', 'bench@example.com', 'bench')
+        staff_client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        staff_client.force_login(admin)
+
+        requests = self.options['requests']
+        endpoints = {}
+        for name, endpoint_client, path, count in (
+            ('application_list', client, '/api/v1/applications/', requests),
+            ('application_list_page', client, '/api/v1/applications/?page_size=100', requests),
+            ('index', client, '/', requests),
+            ('uploaded_files', staff_client, '/admin/core/uploaded-files/?page_size=100', requests),
+            ('download_server_file', client, f'/download/server-file/?path={DOWNLOAD_FILE_NAME}',
+             self.options['download_requests']),
+        ):
+            self.log(f'  {name} ...')
+            endpoints[name] = self.measure(endpoint_client, path, count, cold=cache.clear)
+            self.log('    p50 {p50_ms} ms, p99 {p99_ms} ms, {throughput_rps} req/s'.format(**endpoints[name]))
+
+        result = {
+            'applications': size,
+            'categories': category_count,
+            'uploaded_files': file_count,
+            'seed_seconds': round(seed_seconds, 3),
+            'endpoints': endpoints,
+        }
+        if self.options['readers'] and connection.vendor == 'sqlite':
+            result['read_concurrency'] = self.read_concurrency()
+        return result
+
+    # ---------------- 读并发 ----------------
+    def read_concurrency(self):
+        """
+        分别在调优前的默认设置和 SQLITE_PRAGMAS 下，让多个读进程持续查询分类下的应用列表，
+        同时一个写进程不断提交更新事务 (模拟后台编辑)，比较读吞吐量、延迟和锁错误数。
+        """
+        results = {}
+        for mode, pragmas in (('default', LEGACY_SQLITE_PRAGMAS), ('tuned', settings.SQLITE_PRAGMAS)):
+            # 关闭现有连接，新连接按本轮的 PRAGMA 建立 (journal_mode 需在没有其他连接时才能切换)
+            connections.close_all()
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                results[mode] = self.run_concurrent_reads()
+            connections.close_all()
+            self.log('  read_concurrency ({}): {reads_per_second} reads/s, p99 {read_p99_ms} ms, '
+                     '{writes_per_second} writes/s, {lock_errors} lock errors'.format(mode, **results[mode]))
+        default, tuned = results['default'], results['tuned']
+        if default['reads_per_second']:
+            results['read_speedup'] = round(tuned['reads_per_second'] / default['reads_per_second'], 2)
+        return results
+
+    def run_concurrent_reads(self):
+        """
+        读写各在独立的进程中运行 (与 gunicorn 多 worker 部署一致，也避免线程共用 GIL 掩盖数据库锁的影响)，
+        不支持 fork 的平台退回线程。
+        """
+        category_ids = list(Category.objects.values_list('id', flat=True))
+        app_ids = list(Application.objects.values_list('id', flat=True)[:200])
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        # 子进程不能复用父进程的数据库连接
+        connections.close_all()
+
+        readers = self.options['readers']
+        deadline = time.time() + self.options['concurrency_seconds']
+        try:
+            context = multiprocessing.get_context('fork')
+            queue = context.Queue()
+            workers = [context.Process(target=_concurrent_reader, args=(i, readers, deadline, category_ids, queue))
+                       for i in range(readers)]
+            workers.append(context.Process(target=_concurrent_writer, args=(deadline, app_ids, queue)))
+        except ValueError:
+            queue = stdlib_queue.Queue()
+            workers = [threading.Thread(target=_concurrent_reader, args=(i, readers, deadline, category_ids, queue))
+                       for i in range(readers)]
+            workers.append(threading.Thread(target=_concurrent_writer, args=(deadline, app_ids, queue)))
+
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        reports = [queue.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        timings = sorted(t for report in reports for t in report['latencies'])
+        return {
+            'journal_mode': journal_mode,
+            'reads_per_second': round(len(timings) / elapsed, 1),
+            'read_p50_ms': round(percentile(timings, 50) * 1000, 3) if timings else None,
+            'read_p99_ms': round(percentile(timings, 99) * 1000, 3) if timings else None,
+            'writes_per_second': round(sum(report['writes'] for report in reports) / elapsed, 1),
+            'lock_errors': sum(report['errors'] for report in reports),
+        }
+
+    # ---------------- 对比 ----------------
+    def compare(self, report, baseline_path):
+        try:
+            with open(baseline_path, encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'无法读取对比结果 {baseline_path}: {e}')
+
+        previous = {scenario['applications']: scenario for scenario in baseline.get('scenarios', [])}
+        self.stderr.write(f'对比基准: {baseline.get("commit") or baseline_path}')
+        for scenario in report['scenarios']:
+            old = previous.get(scenario['applications'])
+            if old is None:
+                continue
+            self.stderr.write(f'== {scenario["applications"]} 个应用 ==')
+            for name, result in scenario['endpoints'].items():
+                old_result = old['endpoints'].get(name)
+                if not old_result:
+                    continue
+                changes = []
+                for key in ('p50_ms', 'p99_ms', 'throughput_rps', 'queries_per_request', 'peak_memory_kb'):
+                    before, after = old_result.get(key), result.get(key)
+                    if before and after is not None:
+                        changes.append(f'{key} {before} -> {after} ({(after - before) / before * 100:+.1f}%)')
+                self.stderr.write(f'  {name}: ' + ', '.join(changes))
+            if scenario.get('read_concurrency') and old.get('read_concurrency'):
+                before = old['read_concurrency']['tuned']['reads_per_second']
+                after = scenario['read_concurrency']['tuned']['reads_per_second']
+                if before:
+                    self.stderr.write(f'  read_concurrency: reads_per_second {before} -> {after} '
+                                      f'({(after - before) / before * 100:+.1f}%)')
@@ -0,0 +1,76 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from core import catalog
+from core.models import AppChoices, Application, Category
+from core.serializers import ApplicationRowSerializer, ApplicationSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = '对比 ApplicationSerializer 与 ApplicationRowSerializer 序列化应用列表的耗时，并校验输出逐字节一致'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0, help='临时生成这么多条测试应用 (结束后回滚)，0 表示使用现有数据')
+        parser.add_argument('--repeat', type=int, default=5, help='每种序列化器运行的次数 (取最快一次)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['rows']:
+                    self.seed(options['rows'])
+                self.run(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, rows):
+        category = Category.objects.create(name='bench-serializers', slug='bench-serializers')
+        Application.objects.bulk_create([
+            Application(
+                name=f'应用 {i}', version='1.0', category=category, short_description='基准测试数据',
+                logo=f'blobs/{i % 256:02x}/{i:064x}.png', uploaded_file=f'uploads/安装包 {i}.exe',
+                install_method=AppChoices.SILENT if i % 2 else AppChoices.MANUAL,
+                file_size=i, file_sha256='0' * 64, order=i,
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+
+    def run(self, repeat):
+        request = RequestFactory().get('/api/v1/applications/', HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        renderer = JSONRenderer()
+        queryset = catalog.application_queryset().order_by('category', 'order')
+
+        def drf():
+            return renderer.render(ApplicationSerializer(queryset.all(), many=True, context={'request': request}).data)
+
+        def rows():
+            serializer = ApplicationRowSerializer(request)
+            return renderer.render(serializer.many(queryset.values(*serializer.values_fields)))
+
+        results = {}
+        for name, build in (('ApplicationSerializer', drf), ('ApplicationRowSerializer', rows)):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                body = build()
+                timings.append(time.perf_counter() - start)
+            results[name] = (min(timings), body)
+
+        drf_time, drf_body = results['ApplicationSerializer']
+        row_time, row_body = results['ApplicationRowSerializer']
+        if drf_body != row_body:
+            raise CommandError('两种序列化器的输出不一致！')
+
+        count = queryset.count()
+        self.stdout.write(f'应用数量: {count}，响应大小: {len(drf_body) / 1024:.1f} KB (输出一致)')
+        self.stdout.write(f'ApplicationSerializer:    {drf_time * 1000:8.1f} ms')
+        self.stdout.write(f'ApplicationRowSerializer: {row_time * 1000:8.1f} ms ({drf_time / row_time:.1f}x)')
@@ -0,0 +1,30 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.export import CatalogExporter
+
+
+class Command(BaseCommand):
+    help = '把应用目录导出为静态 JSON 和资源文件 (文件名带内容哈希)，可由任意静态服务器或 CDN 托管'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output_dir', nargs='?', default=os.path.join(settings.BASE_DIR, 'catalog_export'),
+            help='导出目录 (默认 <项目目录>/catalog_export)',
+        )
+        parser.add_argument('--base-url', default='', help='导出目录的公开地址，如 https://cdn.example.com/catalog/ (默认使用相对路径)')
+        parser.add_argument('--server-url', default='http://localhost:8000/', help='Django 服务的公开地址 (未导出的安装包等链接指向这里)')
+        parser.add_argument('--with-installers', action='store_true', help='同时导出本机上传的安装包')
+        parser.add_argument('--full', action='store_true', help='忽略上次的导出状态，全部重新导出')
+
+    def handle(self, *args, **options):
+        exporter = CatalogExporter(
+            options['output_dir'],
+            base_url=options['base_url'],
+            server_url=options['server_url'],
+            with_installers=options['with_installers'],
+            stdout=self.stdout,
+        )
+        exporter.run(full=options['full'])
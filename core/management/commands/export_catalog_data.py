@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bulk import FORMATS, CatalogImportError, detect_format, export_records, write_records
+
+
+class Command(BaseCommand):
+    help = '把分类和应用导出为 CSV / JSON / JSONL 数据文件 (可由 import_catalog 导入)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-', help='输出文件路径，默认输出到标准输出')
+        parser.add_argument('--format', choices=FORMATS, help='文件格式 (默认按扩展名判断，标准输出时为 jsonl)')
+
+    def handle(self, *args, **options):
+        path = options['output']
+        try:
+            fmt = detect_format(path, options['format'] or ('jsonl' if path == '-' else None))
+        except CatalogImportError as e:
+            raise CommandError(str(e))
+
+        if path == '-':
+            # 直接写入底层的流 (self.stdout 会给每次 write 补换行)
+            write_records(export_records(), options.get('stdout') or sys.stdout, fmt)
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            count = write_records(export_records(), f, fmt)
+        self.stderr.write(f'已导出 {count} 个应用到 {path}')
@@ -0,0 +1,47 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import catalog
+from core.models import Application, WebsiteNavigation
+from core.storage import blob_storage, collect_garbage, is_blob
+
+
+class Command(BaseCommand):
+    help = '回收没有被任何应用/导航引用的内容寻址图片 (media/blobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=3600, help='不删除最近这么多秒内写入的文件')
+        parser.add_argument('--dry-run', action='store_true', help='只列出将被删除的文件')
+        parser.add_argument(
+            '--adopt-legacy', action='store_true',
+            help='先把旧的 logos/、favicons/ 图片迁移到内容寻址存储并删除旧文件',
+        )
+
+    def handle(self, *args, **options):
+        if options['adopt_legacy'] and not options['dry_run']:
+            adopted = self.adopt_legacy()
+            self.stdout.write(f'已迁移 {adopted} 个旧图片到内容寻址存储。')
+
+        removed, freed = collect_garbage(options['grace'], dry_run=options['dry_run'])
+        for name in removed:
+            self.stdout.write(f"{'将删除' if options['dry_run'] else '已删除'}: {name}")
+        self.stdout.write(f'孤立文件 {len(removed)} 个，共 {freed / 1024:.1f} KB。')
+
+    def adopt_legacy(self):
+        adopted = 0
+        for model, field in ((Application, 'logo'), (WebsiteNavigation, 'favicon')):
+            for instance in model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}):
+                legacy_name = getattr(instance, field).name
+                if is_blob(legacy_name) or not default_storage.exists(legacy_name):
+                    continue
+                with default_storage.open(legacy_name, 'rb') as f:
+                    blob_name = blob_storage.save(legacy_name, f)
+                with transaction.atomic():
+                    # 直接 update，避免重复触发图标抓取等保存逻辑，随后手动记录目录变更
+                    model.objects.filter(pk=instance.pk).update(**{field: blob_name})
+                    catalog.record_change(instance)
+                if not model.objects.filter(**{field: legacy_name}).exists():
+                    default_storage.delete(legacy_name)
+                adopted += 1
+        return adopted
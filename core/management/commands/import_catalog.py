@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from core.bulk import FORMATS, CatalogImporter, CatalogImportError, detect_format, read_records
+
+
+class Command(BaseCommand):
+    help = '从 CSV / JSON / JSONL 文件批量导入分类和应用 (按分类 slug 和应用名称新建或更新)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='输入文件路径，- 表示标准输入 (此时需指定 --format)')
+        parser.add_argument('--format', choices=FORMATS, help='文件格式 (默认按扩展名判断)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批 (每个事务) 写入的记录数')
+        parser.add_argument('--fetch-logos', action='store_true', help='下载 logo_url 列中的图片作为应用 Logo')
+        parser.add_argument('--concurrency', type=int, default=None, help='并发下载 Logo 的线程数')
+
+    def handle(self, *args, **options):
+        importer = CatalogImporter(
+            batch_size=options['batch_size'],
+            fetch_logos=options['fetch_logos'],
+            concurrency=options['concurrency'],
+            stdout=self.stdout,
+            stderr=self.stderr,
+        )
+        path = options['input']
+        try:
+            fmt = detect_format(path, options['format'])
+            if path == '-':
+                stats = importer.run(read_records(sys.stdin, fmt))
+            else:
+                # utf-8-sig: 兼容 Excel 保存的带 BOM 的 CSV
+                with open(path, encoding='utf-8-sig', newline='') as f:
+                    stats = importer.run(read_records(f, fmt))
+        except (OSError, CatalogImportError, IntegrityError) as e:
+            raise CommandError(f'导入失败 (之前的批次已提交): {e}')
+
+        message = (
+            f"应用: 新建 {stats['created']}，更新 {stats['updated']}，未变化 {stats['unchanged']}；"
+            f"分类: 新建 {stats['categories_created']}，更新 {stats['categories_updated']}"
+        )
+        if options['fetch_logos']:
+            message += f"；Logo: 下载 {stats['logos_fetched']}，失败 {stats['logo_failures']}"
+        self.stdout.write(message)
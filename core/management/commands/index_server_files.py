@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core import fileindex
+
+
+class Command(BaseCommand):
+    help = '增量刷新服务器文件索引 (media/uploads 和 SERVER_PATH 应用所在目录)，可选计算 SHA-256'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hash', action='store_true', help='为尚未计算哈希的文件计算 SHA-256')
+        parser.add_argument('--hash-limit', type=int, default=0, help='本次最多计算多少个文件的哈希 (0 表示不限)')
+
+    def handle(self, *args, **options):
+        for root, (created, updated, removed) in fileindex.refresh_index().items():
+            self.stdout.write(f'{root}: 新增 {created}，更新 {updated}，删除 {removed}')
+        if options['hash']:
+            hashed = fileindex.hash_pending(options['hash_limit'] or None)
+            self.stdout.write(f'已计算 {hashed} 个文件的 SHA-256。')
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import catalog
+
+
+class Command(BaseCommand):
+    help = '清理目录变更日志，只保留最近 N 个版本 (更早的客户端增量同步时会收到 full_resync)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int, default=None,
+            help='保留的版本数 (默认 settings.CATALOG_CHANGES_KEEP_REVISIONS)',
+        )
+
+    def handle(self, *args, **options):
+        keep = options['keep']
+        if keep is None:
+            keep = settings.CATALOG_CHANGES_KEEP_REVISIONS
+        deleted = catalog.prune_changes(max(keep, 0))
+        pruned_revision, _ = catalog.get_change_log_start()
+        self.stdout.write(f'已删除 {deleted} 条变更记录，保留版本号 {pruned_revision} 之后的变更。')
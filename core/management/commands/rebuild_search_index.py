@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = '整体重建应用搜索索引 (平时由目录变更增量更新，migrate 后自动建立)'
+
+    def handle(self, *args, **options):
+        search.rebuild_index()
+        self.stdout.write('搜索索引已重建。')
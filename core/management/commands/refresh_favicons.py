@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import tasks
+from core.models import WebsiteNavigation
+
+
+class Command(BaseCommand):
+    help = '并发刷新所有网站导航的图标 (按主机限流，使用条件请求跳过未变化的图标)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='只刷新指定 ID 的导航条目')
+        parser.add_argument('--concurrency', type=int, default=settings.FAVICON_WORKER_CONCURRENCY, help='总并发线程数')
+        parser.add_argument('--per-host', type=int, default=2, help='对同一主机的最大并发请求数')
+        parser.add_argument('--force', action='store_true', help='忽略 ETag/Last-Modified，强制重新下载')
+
+    def handle(self, *args, **options):
+        queryset = WebsiteNavigation.objects.exclude(url='')
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+
+        report = tasks.refresh_all_favicons(
+            queryset,
+            concurrency=options['concurrency'],
+            per_host=options['per_host'],
+            force=options['force'],
+        )
+
+        for name, url, error in report['failures']:
+            self.stderr.write(f'失败: {name} ({url}) - {error}')
+        self.stdout.write(
+            f"共 {report['total']} 个: 更新 {report['updated']}，未变化 {report['unchanged']}，"
+            f"失败 {report['failed']}，耗时 {report['elapsed']:.2f} 秒"
+        )
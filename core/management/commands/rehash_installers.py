@@ -0,0 +1,89 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core import catalog
+from core.models import AppChoices, Application, ServerFile
+from core.utils import hash_file
+
+
+class Command(BaseCommand):
+    help = '为安装包计算大小和 SHA-256 (SERVER_PATH 文件按修改时间和大小判断是否需要重新计算)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='忽略修改时间和大小，全部重新计算')
+        parser.add_argument('--watch', action='store_true', help='持续运行，定期检查文件变化')
+        parser.add_argument('--interval', type=float, default=300, help='--watch 模式下的检查间隔 (秒)')
+
+    def handle(self, *args, **options):
+        while True:
+            hashed, cleared = self.rehash(options['force'])
+            if hashed or cleared:
+                self.stdout.write(f'重新计算 {hashed} 个，清除失效清单 {cleared} 个。')
+            if not options['watch']:
+                break
+            time.sleep(options['interval'])
+
+    def rehash(self, force):
+        hashed = cleared = 0
+        applications = Application.objects.filter(
+            download_type__in=[AppChoices.UPLOADED_FILE, AppChoices.SERVER_PATH]
+        )
+        for app in applications.iterator():
+            path = app.installer_path()
+            if path is None:
+                if app.file_sha256 or app.file_size is not None:
+                    app.set_file_manifest('', None)
+                    self.save_manifest(app)
+                    cleared += 1
+                continue
+
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                # 文件在 installer_path() 检查之后被删除或移走
+                app.set_file_manifest('', None)
+                self.save_manifest(app)
+                cleared += 1
+                continue
+            unchanged_size = app.file_sha256 and app.file_size == stat_result.st_size
+            if not force and unchanged_size and app.file_mtime == stat_result.st_mtime:
+                continue
+            if not force and unchanged_size and app.file_mtime is None and app.download_type == AppChoices.UPLOADED_FILE:
+                # 上传时已在接收数据的同时计算过哈希，只需补记修改时间
+                Application.objects.filter(pk=app.pk).update(file_mtime=stat_result.st_mtime)
+                continue
+
+            digest = self.indexed_sha256(app, path, stat_result)
+            size = stat_result.st_size
+            if not digest:
+                self.stdout.write(f'计算 {app.name}: {path}')
+                digest, size = hash_file(path)
+            app.set_file_manifest(digest, size, stat_result.st_mtime)
+            self.save_manifest(app)
+            hashed += 1
+        return hashed, cleared
+
+    def indexed_sha256(self, app, path, stat_result):
+        """SERVER_PATH 文件在服务器文件索引中已有哈希 (大小和修改时间一致) 时直接沿用，不再读取文件。"""
+        if app.download_type != AppChoices.SERVER_PATH:
+            return ''
+        return ServerFile.objects.filter(
+            root=os.path.dirname(path), name=os.path.basename(path),
+            size=stat_result.st_size, mtime=stat_result.st_mtime,
+        ).exclude(sha256='').values_list('sha256', flat=True).first() or ''
+
+    def save_manifest(self, app):
+        # 直接 update，避免触发保存逻辑；随后记录目录变更使 API 快照失效
+        with transaction.atomic():
+            Application.objects.filter(pk=app.pk).update(
+                file_sha256=app.file_sha256,
+                file_size=app.file_size,
+                file_mtime=app.file_mtime,
+                file_hashed_at=app.file_hashed_at,
+                updated_at=timezone.now(),
+            )
+            catalog.record_change(app)
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = '运行 Favicon 抓取后台任务 worker (处理 WebsiteNavigation 保存时入队的任务)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='处理完当前队列后退出')
+        parser.add_argument('--refresh-all', action='store_true', help='先为所有导航条目入队抓取任务')
+        parser.add_argument('--concurrency', type=int, default=settings.FAVICON_WORKER_CONCURRENCY, help='并发抓取的线程数')
+        parser.add_argument('--batch-size', type=int, default=settings.FAVICON_WORKER_BATCH_SIZE, help='每批领取的任务数')
+        parser.add_argument('--interval', type=float, default=2.0, help='队列为空时的轮询间隔 (秒)')
+
+    def handle(self, *args, **options):
+        if options['refresh_all']:
+            count = tasks.enqueue_all_favicons()
+            self.stdout.write(f'已为 {count} 个导航条目加入抓取任务。')
+
+        # 处理时间超过 3 倍超时时间仍未完成的任务视为 worker 异常退出遗留
+        tasks.requeue_stale_tasks(settings.FAVICON_FETCH_TIMEOUT * 3)
+
+        while True:
+            succeeded, failed = tasks.process_favicon_tasks(
+                limit=options['batch_size'], concurrency=options['concurrency']
+            )
+            if succeeded or failed:
+                self.stdout.write(f'本批完成: 成功 {succeeded}，失败 {failed}')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
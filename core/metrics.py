@@ -0,0 +1,323 @@
+# 文件: core/metrics.py
+# Prometheus 文本格式的运行指标 (/metrics)。
+#
+# 每个进程在内存中累计计数器和直方图，并每隔 METRICS_FLUSH_INTERVAL 秒把自己的数据写入
+# METRICS_DIR/<pid>.json (原子替换)。/metrics 读取目录中所有进程的文件并求和，
+# 因此 gunicorn 多 worker、favicon worker 等多个进程的数据会汇总在一起。
+# 已退出进程的文件保留 (计数器不回退)；部署重启前应清空该目录。
+# METRICS_DIR 为空时只输出当前进程的数据。
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_safe
+
+logger = logging.getLogger(__name__)
+
+# 请求耗时、图标抓取耗时的直方图分桶 (秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 每个请求的 SQL 查询数分桶
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# 指标定义: 名称 -> (类型, 说明, 直方图分桶)
+METRICS = {
+    'appmanager_http_requests_total': ('counter', '按视图和状态码统计的请求数', None),
+    'appmanager_http_request_duration_seconds': ('histogram', '按视图统计的请求耗时', LATENCY_BUCKETS),
+    'appmanager_db_queries_per_request': ('histogram', '每个请求执行的 SQL 查询数', QUERY_BUCKETS),
+    'appmanager_db_query_duration_seconds_total': ('counter', '按视图统计的 SQL 查询总耗时', None),
+    'appmanager_cache_requests_total': ('counter', '缓存查找次数 (result 为 hit/miss)', None),
+    'appmanager_cache_tier_requests_total': ('counter', '两级缓存各层的查找次数 (tier 为 l1/l2)', None),
+    'appmanager_downloads_total': ('counter', '按来源和结果统计的下载次数', None),
+    'appmanager_download_bytes_total': ('counter', '下载实际发送的字节数', None),
+    'appmanager_favicon_fetch_duration_seconds': ('histogram', 'Favicon 抓取耗时', LATENCY_BUCKETS),
+    'appmanager_favicon_fetch_failures_total': ('counter', 'Favicon 抓取失败次数 (reason 为异常类型)', None),
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Registry:
+    """进程内的指标数据。计数器: {(名称, 标签): 值}；直方图: {(名称, 标签): [各桶计数..., 总和, 次数]}。"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.pid = os.getpid()
+        self.last_flush = time.monotonic()
+
+    def reset_after_fork(self):
+        # fork 出的 worker 继承了父进程的数据，清空后单独计数，避免父进程的数据被重复累加
+        if self.pid != os.getpid():
+            with self.lock:
+                self.counters, self.histograms = {}, {}
+                self.pid = os.getpid()
+                self.last_flush = time.monotonic()
+
+    def inc(self, name, value=1, **labels):
+        self.reset_after_fork()
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.maybe_flush()
+
+    def observe(self, name, value, **labels):
+        self.reset_after_fork()
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with self.lock:
+            data = self.histograms.get(key)
+            if data is None:
+                data = self.histograms[key] = [0] * len(buckets) + [0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    data[i] += 1
+                    break
+            data[-2] += value
+            data[-1] += 1
+        self.maybe_flush()
+
+    def dump(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, list(data)] for (name, labels), data in self.histograms.items()],
+            }
+
+    def maybe_flush(self):
+        if settings.METRICS_DIR and time.monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """把当前进程的数据写入 METRICS_DIR/<pid>.json。"""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        self.last_flush = time.monotonic()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.dump(), f)
+            os.replace(temp_path, os.path.join(directory, f'{os.getpid()}.json'))
+        except OSError:
+            logger.exception('写入指标文件失败')
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+
+
+def _flush_at_exit():
+    try:
+        registry.flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def collect():
+    """汇总所有进程的数据，返回与 Registry.dump() 结构相同的 (counters, histograms) 字典。"""
+    counters, histograms = {}, {}
+
+    def merge(dump):
+        for name, labels, value in dump.get('counters', []):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, data in dump.get('histograms', []):
+            key = (name, tuple(map(tuple, labels)))
+            if key in histograms and len(histograms[key]) == len(data):
+                histograms[key] = [a + b for a, b in zip(histograms[key], data)]
+            else:
+                histograms[key] = list(data)
+
+    directory = settings.METRICS_DIR
+    if not directory:
+        merge(registry.dump())
+        return counters, histograms
+
+    registry.reset_after_fork()
+    registry.flush()
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        names = []
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                merge(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{%s}' % ','.join(f'{key}="{_escape(value)}"' for key, value in items)
+
+
+def _format_value(value):
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def render():
+    """生成 Prometheus 文本格式 (version 0.0.4)。"""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            continue
+        for (metric, labels), data in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, data):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {data[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(data[-2])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {data[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+@require_safe
+def metrics_view(request):
+    """/metrics: 只允许 METRICS_ALLOWED_IPS 中的地址访问 (列表为空时不限制)。"""
+    allowed = settings.METRICS_ALLOWED_IPS
+    if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def record_cache(cache_name, hit):
+    inc('appmanager_cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+def record_cache_tier(tier, hit):
+    inc('appmanager_cache_tier_requests_total', tier=tier, result='hit' if hit else 'miss')
+
+
+class QueryCounter:
+    """connection.execute_wrapper 的包装函数：统计请求期间执行的 SQL 查询数和耗时。"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+# 当前请求的 QueryCounter。ASGI 下视图的 ORM 操作经 sync_to_async 在其他线程中执行，
+# 使用的是那个线程的数据库连接；上下文变量会随 sync_to_async 复制到执行线程，
+# 所以计数包装函数安装在每个连接上，从上下文变量中找到所属请求的计数器
+_current_queries = contextvars.ContextVar('appmanager_current_queries', default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    queries = _current_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    return queries(execute, sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created 信号处理函数：在新建的数据库连接上安装请求查询计数。"""
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+connection_created.connect(install_query_counter, dispatch_uid='core_install_query_counter')
+
+
+def view_label(request):
+    """视图的指标标签: 函数视图用函数名，类视图 / 视图集用类名；未匹配到 URL 时为 unmatched。"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view_func = match.func
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    return (view_class or view_func).__name__
+
+
+class MetricsMiddleware:
+    """
+    记录每个请求的耗时、状态码和 SQL 查询数/耗时 (按视图区分)。
+    应放在 MIDDLEWARE 的第一位，使耗时包含其他中间件。
+    同时支持 WSGI 和 ASGI (异步模式下不切换线程)。
+    流式响应 (文件下载) 只计到响应头返回为止，传输字节数由下载统计 (core/analytics.py) 记录。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = QueryCounter()
+        token = _current_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_queries.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryCounter()
+        token = _current_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_queries.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    def record(self, request, response, duration, queries):
+        view = view_label(request)
+        inc('appmanager_http_requests_total', view=view, method=request.method, status=response.status_code)
+        observe('appmanager_http_request_duration_seconds', duration, view=view)
+        observe('appmanager_db_queries_per_request', queries.count, view=view)
+        if queries.count:
+            inc('appmanager_db_query_duration_seconds_total', queries.duration, view=view)
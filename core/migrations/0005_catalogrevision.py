@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+def create_revision_row(apps, schema_editor):
+    CatalogRevision = apps.get_model('core', 'CatalogRevision')
+    CatalogRevision.objects.get_or_create(pk=1, defaults={'value': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_application_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='版本号')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '目录版本',
+                'verbose_name_plural': '目录版本',
+            },
+        ),
+        migrations.RunPython(create_revision_row, migrations.RunPython.noop),
+    ]
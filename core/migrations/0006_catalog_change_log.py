@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+
+def seed_change_log(apps, schema_editor):
+    """把现有数据作为一个新版本写入变更日志，使 since=0 的增量同步也能拿到完整目录。"""
+    CatalogRevision = apps.get_model('core', 'CatalogRevision')
+    CatalogChange = apps.get_model('core', 'CatalogChange')
+    revision, _ = CatalogRevision.objects.get_or_create(pk=1, defaults={'value': 0})
+    revision.value += 1
+    revision.save()
+
+    changes = []
+    for model_name, change_name in (('Application', 'application'), ('Category', 'category'), ('WebsiteNavigation', 'navigation')):
+        for pk in apps.get_model('core', model_name).objects.values_list('pk', flat=True):
+            changes.append(CatalogChange(revision=revision.value, model=change_name, object_id=pk, action='upsert'))
+    CatalogChange.objects.bulk_create(changes, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_catalogrevision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveBigIntegerField(db_index=True, verbose_name='版本号')),
+                ('model', models.CharField(max_length=20, verbose_name='数据类型')),
+                ('object_id', models.BigIntegerField(verbose_name='对象 ID')),
+                ('action', models.CharField(choices=[('upsert', '新增/修改'), ('delete', '删除')], max_length=10, verbose_name='操作')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '目录变更',
+                'verbose_name_plural': '目录变更',
+                'ordering': ['revision'],
+            },
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新时间'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新时间'),
+        ),
+        migrations.AddField(
+            model_name='websitenavigation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新时间'),
+        ),
+        migrations.RunPython(seed_change_log, migrations.RunPython.noop),
+    ]
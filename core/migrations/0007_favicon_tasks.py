@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mark_existing_favicons(apps, schema_editor):
+    # 已有图标的条目视为从当前 URL 抓取，避免升级后全部重新抓取
+    WebsiteNavigation = apps.get_model('core', 'WebsiteNavigation')
+    for navigation in WebsiteNavigation.objects.exclude(favicon='').exclude(favicon__isnull=True):
+        navigation.favicon_source_url = navigation.url
+        navigation.save(update_fields=['favicon_source_url'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_catalog_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='websitenavigation',
+            name='favicon_source_url',
+            field=models.URLField(blank=True, default='', editable=False, max_length=500, verbose_name='图标来源网址'),
+        ),
+        migrations.CreateModel(
+            name='FaviconTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, verbose_name='网址')),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '处理中'), ('done', '已完成'), ('failed', '失败')], db_index=True, default='pending', max_length=10, verbose_name='状态')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='尝试次数')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('navigation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favicon_tasks', to='core.websitenavigation', verbose_name='网站导航')),
+            ],
+            options={
+                'verbose_name': '图标抓取任务',
+                'verbose_name_plural': '图标抓取任务',
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.RunPython(mark_existing_favicons, migrations.RunPython.noop),
+    ]
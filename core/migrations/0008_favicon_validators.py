@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_favicon_tasks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='websitenavigation',
+            name='favicon_etag',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='图标 ETag'),
+        ),
+        migrations.AddField(
+            model_name='websitenavigation',
+            name='favicon_icon_url',
+            field=models.URLField(blank=True, default='', editable=False, max_length=500, verbose_name='图标文件地址'),
+        ),
+        migrations.AddField(
+            model_name='websitenavigation',
+            name='favicon_last_modified',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='图标 Last-Modified'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:39
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_favicon_validators'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='application',
+            name='logo',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.get_blob_storage, upload_to='logos/', verbose_name='Logo'),
+        ),
+        migrations.AlterField(
+            model_name='websitenavigation',
+            name='favicon',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.get_blob_storage, upload_to='favicons/', verbose_name='图标'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_blob_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='file_hashed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='校验时间'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='file_mtime',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='文件修改时间'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='file_sha256',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='文件大小'),
+        ),
+    ]
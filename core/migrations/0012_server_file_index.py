@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_upload_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServerFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('root', models.CharField(max_length=500, verbose_name='所在目录')),
+                ('name', models.CharField(max_length=255, verbose_name='文件名')),
+                ('size', models.PositiveBigIntegerField(verbose_name='文件大小')),
+                ('mtime', models.FloatField(verbose_name='修改时间')),
+                ('sha256', models.CharField(blank=True, default='', max_length=64, verbose_name='SHA-256')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='索引时间')),
+            ],
+            options={
+                'verbose_name': '服务器文件',
+                'verbose_name_plural': '服务器文件',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['name'], name='core_server_name_cfa8ec_idx'), models.Index(fields=['mtime'], name='core_server_mtime_812ed9_idx'), models.Index(fields=['size'], name='core_server_size_df31a5_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='serverfile',
+            constraint=models.UniqueConstraint(fields=('root', 'name'), name='unique_server_file'),
+        ),
+    ]
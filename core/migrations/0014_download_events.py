@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_application_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DownloadReport',
+            fields=[
+            ],
+            options={
+                'verbose_name': '下载统计',
+                'verbose_name_plural': '下载统计',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('core.application',),
+        ),
+        migrations.CreateModel(
+            name='DownloadEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('server_path', '服务器文件'), ('uploaded_file', '本机上传'), ('external_link', '外部链接')], max_length=20, verbose_name='来源')),
+                ('path', models.CharField(blank=True, default='', max_length=500, verbose_name='文件/链接')),
+                ('status', models.CharField(choices=[('complete', '完成'), ('aborted', '中断'), ('redirect', '跳转'), ('offloaded', '由 Web 服务器传输')], max_length=10, verbose_name='状态')),
+                ('partial', models.BooleanField(default=False, verbose_name='断点续传请求')),
+                ('bytes_sent', models.PositiveBigIntegerField(default=0, verbose_name='发送字节数')),
+                ('bytes_expected', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='应发送字节数')),
+                ('duration_ms', models.PositiveIntegerField(default=0, verbose_name='耗时 (毫秒)')),
+                ('client_ip', models.GenericIPAddressField(blank=True, null=True, verbose_name='客户端 IP')),
+                ('user_agent', models.CharField(blank=True, default='', max_length=255, verbose_name='User-Agent')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='时间')),
+                ('application', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='download_events', to='core.application', verbose_name='应用')),
+            ],
+            options={
+                'verbose_name': '下载记录',
+                'verbose_name_plural': '下载记录',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['application', 'created_at'], name='core_downlo_applica_9e4aad_idx')],
+            },
+        ),
+    ]
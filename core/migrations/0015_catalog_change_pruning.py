@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_download_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogrevision',
+            name='pruned_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='已清理时间'),
+        ),
+        migrations.AddField(
+            model_name='catalogrevision',
+            name='pruned_revision',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='已清理版本号'),
+        ),
+    ]
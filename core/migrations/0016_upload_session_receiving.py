@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_catalog_change_pruning'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('uploading', '上传中'), ('receiving', '接收中'), ('complete', '已完成')], default='uploading', max_length=10, verbose_name='状态'),
+        ),
+    ]
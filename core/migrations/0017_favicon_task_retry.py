@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_upload_session_receiving'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favicontask',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='下次尝试时间'),
+        ),
+    ]
@@ -1,9 +1,11 @@
-from django.db import models
-import requests
 import os
-from bs4 import BeautifulSoup
-from django.core.files.base import ContentFile
-from urllib.parse import urlparse, urljoin # 确保导入了 urljoin 和 urlparse
+import uuid
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from .storage import get_blob_storage
+from .utils import download_favicon, hash_file, locate_server_file
 
 
 class AppChoices(models.TextChoices):
@@ -17,11 +19,60 @@ class AppChoices(models.TextChoices):
     MANUAL = 'MANUAL', '手动安装'
 
 
+class CatalogRevision(models.Model):
+    """
+    应用目录的全局版本号 (单行表，pk=1)。
+    Application / Category / WebsiteNavigation 的每次保存和删除都会使其递增，
+    API 快照、ETag 等缓存都以它作为失效依据。
+    """
+    value = models.PositiveBigIntegerField(default=0, verbose_name='版本号')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    # 变更日志清理 (catalog.prune_changes) 的位置：不大于 pruned_revision 的变更记录已被删除，
+    # pruned_at 为其中最后一条的记录时间。更早的 since / since_time 无法增量同步。
+    pruned_revision = models.PositiveBigIntegerField(default=0, verbose_name='已清理版本号')
+    pruned_at = models.DateTimeField(null=True, blank=True, verbose_name='已清理时间')
+
+    class Meta:
+        verbose_name = '目录版本'
+        verbose_name_plural = '目录版本'
+
+    def __str__(self):
+        return str(self.value)
+
+
+class CatalogChange(models.Model):
+    """
+    目录变更日志：每次保存/删除记录一行，供增量同步接口返回
+    "某个版本号之后" 新增、修改和删除 (墓碑) 的条目。
+    """
+    ACTION_UPSERT = 'upsert'
+    ACTION_DELETE = 'delete'
+
+    revision = models.PositiveBigIntegerField(db_index=True, verbose_name='版本号')
+    model = models.CharField(max_length=20, verbose_name='数据类型')
+    object_id = models.BigIntegerField(verbose_name='对象 ID')
+    action = models.CharField(
+        max_length=10,
+        choices=[(ACTION_UPSERT, '新增/修改'), (ACTION_DELETE, '删除')],
+        verbose_name='操作'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='创建时间')
+
+    class Meta:
+        verbose_name = '目录变更'
+        verbose_name_plural = '目录变更'
+        ordering = ['revision']
+
+    def __str__(self):
+        return f"{self.revision}: {self.action} {self.model}#{self.object_id}"
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name='分类名称')
     slug = models.SlugField(max_length=100, unique=True, verbose_name='Slug')
     order = models.IntegerField(default=0, verbose_name='排序')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
     class Meta:
         verbose_name = '应用分类'
@@ -32,6 +83,10 @@ class Category(models.Model):
         return self.name
 
 
+# 决定安装包来源的字段 (见 Application.file_source)
+FILE_SOURCE_FIELDS = {'download_type', 'uploaded_file', 'server_file_path'}
+
+
 class Application(models.Model):
     name = models.CharField(max_length=200, verbose_name='应用名称')
     version = models.CharField(max_length=50, blank=True, null=True, verbose_name='版本号')
@@ -42,10 +97,11 @@ class Application(models.Model):
         verbose_name='所属分类'
     )
     short_description = models.TextField(blank=True, null=True, verbose_name='简短描述')
-    logo = models.ImageField(upload_to='logos/', blank=True, null=True, verbose_name='Logo')
+    logo = models.ImageField(upload_to='logos/', storage=get_blob_storage, blank=True, null=True, verbose_name='Logo')
     is_recommended = models.BooleanField(default=False, verbose_name='是否推荐')
     order = models.IntegerField(default=0, verbose_name='排序')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
     # ------------------ 安装方式配置 ------------------
     install_params = models.CharField(
@@ -79,22 +135,94 @@ class Application(models.Model):
     external_link = models.URLField(max_length=500, blank=True, null=True, verbose_name='外部链接')
     uploaded_file = models.FileField(upload_to='uploads/', blank=True, null=True, verbose_name='本机上传文件')
     server_file_path = models.CharField(max_length=500, blank=True, null=True, verbose_name='服务器文件路径')
+
+    # ------------------ 安装包清单 (完整性校验) ------------------
+    file_size = models.PositiveBigIntegerField(blank=True, null=True, editable=False, verbose_name='文件大小')
+    file_sha256 = models.CharField(max_length=64, blank=True, default='', editable=False, verbose_name='SHA-256')
+    file_mtime = models.FloatField(blank=True, null=True, editable=False, verbose_name='文件修改时间')
+    file_hashed_at = models.DateTimeField(blank=True, null=True, editable=False, verbose_name='校验时间')
     
     class Meta:
         verbose_name = '应用管理'
         verbose_name_plural = '应用管理'
         ordering = ['order', 'name']
+        # 列表接口按分类内排序分页，并支持按推荐/安装方式/下载方式过滤
+        indexes = [
+            models.Index(fields=['category', 'order', 'id'], name='app_category_order_idx'),
+            models.Index(fields=['is_recommended', 'category', 'order'], name='app_recommended_idx'),
+            models.Index(fields=['install_method', 'category', 'order'], name='app_install_method_idx'),
+            models.Index(fields=['download_type', 'category', 'order'], name='app_download_type_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时的下载来源，保存时用于判断安装包是否被更换
+        # (用 only()/defer() 延迟加载了来源字段时不记录，否则读取字段会再次查询数据库)
+        if not FILE_SOURCE_FIELDS & instance.get_deferred_fields():
+            instance._loaded_file_source = instance.file_source()
+        return instance
+
+    def file_source(self):
+        return (self.download_type, self.uploaded_file.name or '', self.server_file_path or '')
+
+    def save(self, *args, **kwargs):
+        self.update_file_manifest()
+        super().save(*args, **kwargs)
+        self._loaded_file_source = self.file_source()
+
+    def update_file_manifest(self):
+        """
+        新上传的安装包在保存前记录大小和 SHA-256 (上传处理器接收数据时已流式计算，不再重读文件)；
+        下载来源变化时清空旧清单，由 manage.py rehash_installers 在后台重新计算。
+        """
+        upload = self.uploaded_file
+        if self.download_type == AppChoices.UPLOADED_FILE and upload and not upload._committed:
+            digest = getattr(upload.file, 'sha256', None)
+            if digest is None:
+                digest, size = hash_file(upload.file)
+            self.set_file_manifest(digest, upload.size)
+        elif not self._state.adding and not hasattr(self, '_loaded_file_source'):
+            # 延迟加载来源字段的实例无法判断来源是否变化，保留原清单
+            return
+        elif getattr(self, '_loaded_file_source', None) != self.file_source() \
+                and getattr(self, '_manifest_source', None) != self.file_source():
+            self.set_file_manifest('', None)
+
+    def set_file_manifest(self, digest, size, mtime=None):
+        # 记录清单对应的下载来源 (分片上传等场景在保存前已经算好清单)
+        self._manifest_source = self.file_source()
+        self.file_sha256 = digest
+        self.file_size = size
+        self.file_mtime = mtime
+        self.file_hashed_at = timezone.now() if digest else None
+
+    def installer_path(self):
+        """返回安装包在本机上的绝对路径 (外部链接或文件不存在时返回 None)。"""
+        if self.download_type == AppChoices.UPLOADED_FILE and self.uploaded_file:
+            path = self.uploaded_file.path
+            return path if os.path.isfile(path) else None
+        if self.download_type == AppChoices.SERVER_PATH:
+            return locate_server_file(self.server_file_path)
+        return None
+
 
 class WebsiteNavigation(models.Model):
     name = models.CharField(max_length=100, verbose_name='网站名称')
     url = models.URLField(max_length=500, verbose_name='网址')
-    favicon = models.ImageField(upload_to='favicons/', blank=True, null=True, verbose_name='图标')
+    favicon = models.ImageField(upload_to='favicons/', storage=get_blob_storage, blank=True, null=True, verbose_name='图标')
+    # 当前图标是从哪个 URL 抓取的 (用于判断 URL 是否变化)
+    favicon_source_url = models.URLField(max_length=500, blank=True, default='', editable=False, verbose_name='图标来源网址')
+    # 图标文件地址及其缓存校验信息 (刷新时用于条件请求)
+    favicon_icon_url = models.URLField(max_length=500, blank=True, default='', editable=False, verbose_name='图标文件地址')
+    favicon_etag = models.CharField(max_length=255, blank=True, default='', editable=False, verbose_name='图标 ETag')
+    favicon_last_modified = models.CharField(max_length=64, blank=True, default='', editable=False, verbose_name='图标 Last-Modified')
     order = models.IntegerField(default=0, verbose_name='排序')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
     class Meta:
         verbose_name = '网站导航'
@@ -105,88 +233,252 @@ class WebsiteNavigation(models.Model):
         return self.name
         
     def save(self, *args, **kwargs):
-        # 简化 save 逻辑：如果 URL 存在，就尝试抓取。
-        # 确保在调用 super().save() 之前运行抓取逻辑
-        if self.url:
-             self.fetch_favicon()
-
+        # 不再在保存时同步抓取 Favicon (最长会阻塞 20 秒)，
+        # 只有 URL 变化时才在事务提交后加入后台任务队列，由 run_favicon_worker 处理。
         super().save(*args, **kwargs)
 
-    def fetch_favicon(self):
-        """尝试从 URL 抓取并保存 Favicon"""
-        print(f"\n--- Starting Favicon fetch for URL: {self.url} ---")
+        if self.url and self.url != self.favicon_source_url:
+            transaction.on_commit(lambda: FaviconTask.enqueue(self))
+
+    def apply_favicon(self, result, source_url):
+        """
+        保存抓取结果 (utils.FaviconResult)，并记录其对应的 URL 和缓存校验信息
+        (之后 URL 不变就不再重复抓取，刷新时可发送条件请求)。
+        """
+        if result.content is not None:
+            self.favicon.save(result.content.name, result.content, save=False)
+        self.favicon_source_url = source_url
+        self.favicon_icon_url = result.icon_url
+        self.favicon_etag = result.etag[:255]
+        self.favicon_last_modified = result.last_modified[:64]
+        self.save(update_fields=[
+            'favicon', 'favicon_source_url', 'favicon_icon_url',
+            'favicon_etag', 'favicon_last_modified', 'updated_at',
+        ])
+
+    def fetch_favicon(self, session=None):
+        """同步抓取并保存 Favicon (供 shell 等手动调用)。"""
         if not self.url:
             return
+        self.apply_favicon(download_favicon(self.url, session=session), self.url)
+
+
+class FaviconTask(models.Model):
+    """
+    Favicon 抓取任务队列 (数据库表)。
+    WebsiteNavigation 的 URL 变化时入队，由 manage.py run_favicon_worker 并发处理。
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    navigation = models.ForeignKey(
+        WebsiteNavigation,
+        on_delete=models.CASCADE,
+        related_name='favicon_tasks',
+        verbose_name='网站导航'
+    )
+    url = models.URLField(max_length=500, verbose_name='网址')
+    status = models.CharField(
+        max_length=10,
+        choices=[
+            (STATUS_PENDING, '等待中'),
+            (STATUS_RUNNING, '处理中'),
+            (STATUS_DONE, '已完成'),
+            (STATUS_FAILED, '失败'),
+        ],
+        default=STATUS_PENDING,
+        db_index=True,
+        verbose_name='状态'
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='尝试次数')
+    # 失败后等待重试的任务在此时间之前不会被领取 (指数退避，见 tasks.process_favicon_tasks)
+    next_attempt_at = models.DateTimeField(blank=True, null=True, verbose_name='下次尝试时间')
+    error = models.TextField(blank=True, verbose_name='错误信息')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '图标抓取任务'
+        verbose_name_plural = '图标抓取任务'
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.navigation} ({self.get_status_display()})"
 
-        # 定义 User-Agent 头部，模拟浏览器 (解决 Bilibili/QQ 的 4xx/5xx 错误)
-        HEADERS = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-
-        try:
-            # 1. 尝试获取网站根目录或 HTML 中的 Favicon 链接
-            r = requests.get(self.url, timeout=10, allow_redirects=True, headers=HEADERS) 
-            r.raise_for_status() 
-
-            soup = BeautifulSoup(r.content, 'html.parser')
-            favicon_link = None
-            
-            # 尝试通过 <link> 标签获取图标链接
-            for rel in ('icon', 'shortcut icon', 'apple-touch-icon'):
-                link_tag = soup.find('link', rel=rel)
-                if link_tag and link_tag.get('href'):
-                    favicon_link = link_tag['href']
-                    print(f"Found link tag for favicon: {favicon_link}")
-                    break
-
-            # 如果 HTML 中没有找到，则尝试默认路径 /favicon.ico
-            if not favicon_link:
-                parsed_url = urlparse(self.url)
-                base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-                favicon_link = f"{base_url}/favicon.ico"
-                print(f"No link tag found, defaulting to: {favicon_link}")
-                
-            # 确保 favicon_link 是一个绝对 URL
-            if not favicon_link.startswith(('http', 'https')):
-                favicon_link = urljoin(self.url, favicon_link)
-                print(f"Absolute favicon URL: {favicon_link}")
-
-            # 2. 下载 Favicon 文件
-            icon_response = requests.get(favicon_link, timeout=10, stream=True, headers=HEADERS)
-            icon_response.raise_for_status()
-            print(f"Favicon file downloaded. Status: {icon_response.status_code}")
-            
-            # 3. 保存文件到 Django 模型
-            content_type = icon_response.headers.get('content-type', '').lower()
-            if 'image' in content_type or 'icon' in content_type:
-                filename = os.path.basename(favicon_link).split('?')[0]
-                if not filename or '.' not in filename:
-                    # 使用 self.pk 或进程 ID 来确保文件名唯一性
-                    filename = f"favicon_{self.pk or os.getpid()}.ico" 
-
-                # 重点：使用 .save() 方法将文件内容写入 media 目录
-                self.favicon.save(
-                    filename,
-                    ContentFile(icon_response.content),
-                    save=False # 不在这里保存，留给 save() 方法
-                )
-                print(f"SUCCESS: Favicon saved to model instance as: {filename}")
-                
-            else:
-                print(f"FAILURE: Downloaded content is not an image (Content-Type: {content_type}).")
-                # 清除旧图标
-                if self.favicon:
-                    self.favicon.delete(save=False)
-                self.favicon = None
-                
-        except requests.exceptions.Timeout:
-            print(f"ERROR: Request timed out for {self.url} or favicon URL.")
-            self.favicon = None
-        except requests.exceptions.RequestException as e:
-            print(f"ERROR: HTTP Request failed for {self.url}. Details: {e}")
-            self.favicon = None
-        except Exception as e:
-            print(f"ERROR: An unexpected error occurred during favicon processing. Details: {e}")
-            self.favicon = None
-            
-        print("--- Favicon fetch process finished. ---\n")
\ No newline at end of file
+    @classmethod
+    def enqueue(cls, navigation):
+        """
+        为导航条目创建抓取任务；已有相同 URL 的等待中任务时不重复创建，
+        该任务正在退避等待重试时改为立即可领取。
+        """
+        task = cls.objects.filter(
+            navigation=navigation, url=navigation.url, status=cls.STATUS_PENDING
+        ).first()
+        if task is None:
+            task = cls.objects.create(navigation=navigation, url=navigation.url)
+        elif task.next_attempt_at is not None:
+            task.next_attempt_at = None
+            task.save(update_fields=['next_attempt_at', 'updated_at'])
+        return task
+
+
+class UploadSession(models.Model):
+    """
+    分片上传会话：大安装包按块写入磁盘上的临时文件，可按偏移量断点续传，
+    全部接收后再组装到 MEDIA_ROOT/uploads 并计算 SHA-256。
+    """
+    STATUS_UPLOADING = 'uploading'
+    STATUS_RECEIVING = 'receiving'  # 某个请求正在写入数据块 (见 files.chunked_upload_detail)
+    STATUS_COMPLETE = 'complete'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255, verbose_name='文件名')
+    size = models.PositiveBigIntegerField(verbose_name='文件大小')
+    offset = models.PositiveBigIntegerField(default=0, verbose_name='已接收字节数')
+    status = models.CharField(
+        max_length=10,
+        choices=[(STATUS_UPLOADING, '上传中'), (STATUS_RECEIVING, '接收中'), (STATUS_COMPLETE, '已完成')],
+        default=STATUS_UPLOADING,
+        verbose_name='状态'
+    )
+    final_name = models.CharField(max_length=500, blank=True, default='', verbose_name='存储路径')
+    sha256 = models.CharField(max_length=64, blank=True, default='', verbose_name='SHA-256')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        verbose_name='上传者'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '分片上传'
+        verbose_name_plural = '分片上传'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+    @property
+    def part_path(self):
+        """接收中的临时文件路径。"""
+        return os.path.join(settings.CHUNKED_UPLOAD_TEMP_DIR, f'{self.pk}.part')
+
+
+class ServerFile(models.Model):
+    """
+    服务器文件索引：media/uploads 以及 SERVER_PATH 应用所在目录中的文件。
+    由 core/fileindex.py 按 mtime 增量刷新，供 Admin 文件选择器分页检索。
+    """
+    root = models.CharField(max_length=500, verbose_name='所在目录')
+    name = models.CharField(max_length=255, verbose_name='文件名')
+    size = models.PositiveBigIntegerField(verbose_name='文件大小')
+    mtime = models.FloatField(verbose_name='修改时间')
+    # 文件内容变化 (大小或 mtime 变化) 时清空，由 manage.py index_server_files --hash 重新计算
+    sha256 = models.CharField(max_length=64, blank=True, default='', verbose_name='SHA-256')
+    indexed_at = models.DateTimeField(auto_now=True, verbose_name='索引时间')
+
+    class Meta:
+        verbose_name = '服务器文件'
+        verbose_name_plural = '服务器文件'
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['root', 'name'], name='unique_server_file'),
+        ]
+        indexes = [
+            models.Index(fields=['name']),
+            models.Index(fields=['mtime']),
+            models.Index(fields=['size']),
+        ]
+
+    def __str__(self):
+        return self.path
+
+    @property
+    def absolute_path(self):
+        return os.path.join(self.root, self.name)
+
+    @property
+    def path(self):
+        """填入 server_file_path 的值：MEDIA_ROOT 下的文件用相对路径 (如 uploads/xxx)，其余用绝对路径。"""
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        absolute_path = self.absolute_path
+        if absolute_path.startswith(media_root + os.sep):
+            return os.path.relpath(absolute_path, media_root).replace(os.sep, '/')
+        return absolute_path
+
+
+class DownloadEvent(models.Model):
+    """
+    一次安装包下载 (服务器文件、本机上传文件或外部链接跳转)。
+    由 core/analytics.py 先写入内存缓冲区，再由后台线程批量写入，下载路径上不做同步写库。
+    """
+    SOURCE_SERVER_PATH = 'server_path'
+    SOURCE_UPLOADED_FILE = 'uploaded_file'
+    SOURCE_EXTERNAL_LINK = 'external_link'
+
+    STATUS_COMPLETE = 'complete'
+    STATUS_ABORTED = 'aborted'
+    STATUS_REDIRECT = 'redirect'
+    # 由前端 Web 服务器 (X-Accel-Redirect / X-Sendfile) 传输，Django 无法得知实际字节数
+    STATUS_OFFLOADED = 'offloaded'
+
+    application = models.ForeignKey(
+        Application,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='download_events',
+        verbose_name='应用'
+    )
+    source = models.CharField(
+        max_length=20,
+        choices=[
+            (SOURCE_SERVER_PATH, '服务器文件'),
+            (SOURCE_UPLOADED_FILE, '本机上传'),
+            (SOURCE_EXTERNAL_LINK, '外部链接'),
+        ],
+        verbose_name='来源'
+    )
+    path = models.CharField(max_length=500, blank=True, default='', verbose_name='文件/链接')
+    status = models.CharField(
+        max_length=10,
+        choices=[
+            (STATUS_COMPLETE, '完成'),
+            (STATUS_ABORTED, '中断'),
+            (STATUS_REDIRECT, '跳转'),
+            (STATUS_OFFLOADED, '由 Web 服务器传输'),
+        ],
+        verbose_name='状态'
+    )
+    partial = models.BooleanField(default=False, verbose_name='断点续传请求')
+    bytes_sent = models.PositiveBigIntegerField(default=0, verbose_name='发送字节数')
+    bytes_expected = models.PositiveBigIntegerField(blank=True, null=True, verbose_name='应发送字节数')
+    duration_ms = models.PositiveIntegerField(default=0, verbose_name='耗时 (毫秒)')
+    client_ip = models.GenericIPAddressField(blank=True, null=True, verbose_name='客户端 IP')
+    user_agent = models.CharField(max_length=255, blank=True, default='', verbose_name='User-Agent')
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='时间')
+
+    class Meta:
+        verbose_name = '下载记录'
+        verbose_name_plural = '下载记录'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['application', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.path} ({self.get_status_display()})'
+
+
+class DownloadReport(Application):
+    """按应用汇总下载次数的 Admin 报表 (代理模型，不建表)。"""
+
+    class Meta:
+        proxy = True
+        verbose_name = '下载统计'
+        verbose_name_plural = '下载统计'
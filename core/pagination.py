@@ -0,0 +1,106 @@
+# 文件: core/pagination.py
+# 应用列表的按需游标分页：请求带 page_size 或 cursor 参数时才分页，否则仍返回完整列表 (兼容旧客户端)。
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .catalog import APPLICATION_ORDERING
+
+
+class CatalogCursorPagination(BasePagination):
+    """
+    按 (分类排序, 分类 ID, 应用排序, 应用 ID) 的组合键做 keyset 分页。
+    游标记录上一页最后一条的组合键，下一页用 WHERE (键) > (游标) 继续，
+    翻到多深都不需要 OFFSET 扫描；应用表上的 (category, order, id) 索引支撑分类内的排序。
+    """
+    ordering = APPLICATION_ORDERING
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = self.decode_cursor(params.get(self.cursor_query_param))
+        if cursor is not None:
+            queryset = queryset.filter(self.after(cursor))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_cursor = self.encode_cursor(self.position(results[-1])) if self.has_next else None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def position(self, obj):
+        # 支持模型实例和 .values() 行 (行中需包含排序键的各列)
+        if isinstance(obj, dict):
+            return [obj[field] for field in self.ordering]
+        return [obj.category.order, obj.category_id, obj.order, obj.pk]
+
+    def after(self, cursor):
+        """组合键严格大于游标: (a > x) OR (a = x AND b > y) OR ..."""
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            equal = {self.ordering[j]: cursor[j] for j in range(i)}
+            condition |= Q(**equal, **{f'{field}__gt': cursor[i]})
+        return condition
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, value):
+        if not value:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(value.encode()))
+        except (TypeError, ValueError):
+            raise NotFound('无效的分页游标。')
+        if not (isinstance(position, list) and len(position) == len(self.ordering)
+                and all(isinstance(v, int) for v in position)):
+            raise NotFound('无效的分页游标。')
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('cursor', self.next_cursor),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
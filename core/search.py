@@ -0,0 +1,361 @@
+# 文件: core/search.py
+# 应用全文搜索：名称和简介预先分词 (英文单词、中文单字/双字、拼音全拼和首字母) 建立倒排索引。
+# SQLite 支持 FTS5 时索引存放在 FTS5 虚拟表中 (多进程共享)，否则使用进程内的内存索引。
+# 索引记录已同步到的目录版本号，目录变更提交后 (catalog.catalog_changed) 按变更日志增量更新
+# 变化的应用；变更日志已被清理或版本号回退时整体重建。搜索请求只读取索引：
+#   - FTS5 索引由写入数据的进程更新，migrate 后自动建立，也可用 manage.py rebuild_search_index 重建；
+#   - 内存索引每个进程一份，第一次搜索时建立，之后只应用其他进程提交的增量变化。
+
+import copy
+import logging
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from . import catalog
+from .models import Application
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # 未安装 pypinyin 时不生成拼音词元
+    lazy_pinyin = None
+
+# 名称中的词元权重高于简介
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+# 英文/拼音前缀匹配最多展开的词元数量
+MAX_PREFIX_EXPANSION = 200
+
+FTS_TABLE = 'core_application_fts'
+FTS_META_TABLE = 'core_application_fts_meta'
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+|[㐀-鿿豈-﫿]+')
+
+
+def _is_cjk(run):
+    return not run[0].isascii()
+
+
+def _pinyin_tokens(run):
+    """中文片段的拼音词元：全拼 (weixin)、首字母 (wx) 以及每个音节。"""
+    if lazy_pinyin is None:
+        return []
+    syllables = [s for s in lazy_pinyin(run, errors='ignore') if s.isascii() and s.isalpha()]
+    if not syllables:
+        return []
+    initials = ''.join(s[0] for s in syllables)
+    return [''.join(syllables), initials] + syllables
+
+
+def tokenize(text, pinyin=False):
+    """
+    索引分词：英文和数字按单词切分；中文生成单字和相邻双字 (bigram)；
+    pinyin 为 True 时中文片段另外生成拼音词元。
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall((text or '').lower()):
+        if not _is_cjk(run):
+            tokens.append(run)
+            continue
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        if pinyin:
+            tokens.extend(_pinyin_tokens(run))
+    return tokens
+
+
+def query_terms(query):
+    """
+    查询分词，返回 [(词元, 是否前缀匹配)]，所有词元都必须命中。
+    英文/拼音按前缀匹配；中文片段用双字 (单个汉字时用单字) 精确匹配。
+    """
+    terms = []
+    for run in _TOKEN_RE.findall((query or '').lower()):
+        if not _is_cjk(run):
+            terms.append((run, True))
+        elif len(run) == 1:
+            terms.append((run, False))
+        else:
+            terms.extend((run[i:i + 2], False) for i in range(len(run) - 1))
+    # 去重并保持顺序
+    return list(dict.fromkeys(terms))
+
+
+def _documents(queryset=None):
+    """返回 [(应用 ID, 名称词元, 简介词元)]。"""
+    if queryset is None:
+        queryset = Application.objects.all()
+    rows = queryset.values_list('id', 'name', 'short_description')
+    return [(pk, tokenize(name, pinyin=True), tokenize(description)) for pk, name, description in rows]
+
+
+def _application_changes(indexed_revision, revision):
+    """
+    返回索引从 indexed_revision 同步到 revision 需要处理的 (changed_ids, deleted_ids)；
+    无法增量同步 (尚未建立、版本号回退或变更日志已被清理) 时返回 None，需要整体重建。
+    """
+    if (indexed_revision is None or indexed_revision > revision
+            or catalog.requires_full_resync(since_revision=indexed_revision)):
+        return None
+    return catalog.get_changes(since_revision=indexed_revision)['application']
+
+
+class MemoryIndex:
+    """进程内倒排索引：词元 -> {应用 ID: 权重}，另保存排序后的英文词元表用于前缀查找。"""
+
+    def __init__(self, documents):
+        self.documents = {pk: (name_tokens, description_tokens) for pk, name_tokens, description_tokens in documents}
+        postings = defaultdict(lambda: defaultdict(float))
+        for pk, (name_tokens, description_tokens) in self.documents.items():
+            for token in name_tokens:
+                postings[token][pk] += NAME_WEIGHT
+            for token in description_tokens:
+                postings[token][pk] += DESCRIPTION_WEIGHT
+        self.postings = {token: dict(scores) for token, scores in postings.items()}
+        self.ascii_tokens = sorted(token for token in self.postings if token.isascii())
+
+    def updated(self, changed_ids, deleted_ids):
+        """
+        返回应用增量变化后的新索引 (只对变化的应用重新分词，只复制涉及的词元的倒排表)。
+        不修改当前索引，其他线程可以继续在旧索引上搜索。
+        """
+        added = _documents(Application.objects.filter(pk__in=changed_ids)) if changed_ids else []
+        documents = dict(self.documents)
+        touched = {}
+
+        def posting(token):
+            if token not in touched:
+                touched[token] = dict(self.postings.get(token, ()))
+            return touched[token]
+
+        for pk in changed_ids | deleted_ids:
+            old = documents.pop(pk, None)
+            if old is not None:
+                for token in set(old[0]) | set(old[1]):
+                    posting(token).pop(pk, None)
+        for pk, name_tokens, description_tokens in added:
+            documents[pk] = (name_tokens, description_tokens)
+            for token in name_tokens:
+                scores = posting(token)
+                scores[pk] = scores.get(pk, 0.0) + NAME_WEIGHT
+            for token in description_tokens:
+                scores = posting(token)
+                scores[pk] = scores.get(pk, 0.0) + DESCRIPTION_WEIGHT
+
+        postings = dict(self.postings)
+        ascii_tokens = self.ascii_tokens
+        for token, scores in touched.items():
+            if scores:
+                postings[token] = scores
+            else:
+                postings.pop(token, None)
+            if token.isascii() and bool(scores) != (token in self.postings):
+                # 新增或删除的英文词元：复制一次前缀表后按序插入 / 删除
+                if ascii_tokens is self.ascii_tokens:
+                    ascii_tokens = list(ascii_tokens)
+                if scores:
+                    insort(ascii_tokens, token)
+                else:
+                    del ascii_tokens[bisect_left(ascii_tokens, token)]
+
+        index = copy.copy(self)
+        index.documents, index.postings, index.ascii_tokens = documents, postings, ascii_tokens
+        return index
+
+    def _expand(self, term, prefix):
+        if not prefix:
+            return [term] if term in self.postings else []
+        start = bisect_left(self.ascii_tokens, term)
+        matched = []
+        for token in self.ascii_tokens[start:start + MAX_PREFIX_EXPANSION]:
+            if not token.startswith(term):
+                break
+            matched.append(token)
+        return matched
+
+    def search(self, terms):
+        """返回 {应用 ID: 得分}。完整匹配的词元计全分，前缀匹配按匹配比例计分。"""
+        scores = None
+        for term, prefix in terms:
+            term_scores = {}
+            for token in self._expand(term, prefix):
+                factor = len(term) / len(token)
+                for pk, weight in self.postings[token].items():
+                    term_scores[pk] = max(term_scores.get(pk, 0), weight * factor)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {pk: score + term_scores[pk] for pk, score in scores.items() if pk in term_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+
+class Fts5Index:
+    """
+    SQLite FTS5 索引。预先分好的词元以空格拼接写入虚拟表，由 FTS5 的 unicode61 分词器按空格切分，
+    排序使用 bm25 (名称列权重更高)。rowid 即应用 ID，增量更新时按 rowid 删除旧行。
+    虚拟表不受迁移管理，每个进程第一次使用时创建 (available())。
+    """
+
+    _available = {}
+
+    @classmethod
+    def available(cls):
+        """当前数据库是否支持 FTS5 (每个数据库只检测一次)。"""
+        if connection.vendor != 'sqlite':
+            return False
+        name = connection.settings_dict['NAME']
+        if name not in cls._available:
+            try:
+                with transaction.atomic():
+                    cls.ensure_tables()
+                cls._available[name] = True
+            except DatabaseError:
+                cls._available[name] = False
+        return cls._available[name]
+
+    @staticmethod
+    def ensure_tables():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(app_id UNINDEXED, name, description, tokenize='unicode61')"
+            )
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {FTS_META_TABLE} (id INTEGER PRIMARY KEY, revision INTEGER)")
+
+    @staticmethod
+    def indexed_revision():
+        """索引已同步到的目录版本号，尚未建立时为 None。"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT revision FROM {FTS_META_TABLE} WHERE id = 1")
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _insert(cursor, documents):
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, app_id, name, description) VALUES (%s, %s, %s, %s)",
+            [(pk, pk, ' '.join(name), ' '.join(description)) for pk, name, description in documents],
+        )
+
+    @classmethod
+    def rebuild(cls, revision):
+        documents = _documents()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cls._insert(cursor, documents)
+            cursor.execute(f"INSERT OR REPLACE INTO {FTS_META_TABLE} (id, revision) VALUES (1, %s)", [revision])
+
+    @classmethod
+    def sync(cls, revision):
+        """把索引更新到目录版本号 revision：只重新写入变更日志中变化的应用。"""
+        changes = _application_changes(cls.indexed_revision(), revision)
+        if changes is None:
+            cls.rebuild(revision)
+            return
+        changed_ids, deleted_ids = changes
+        documents = _documents(Application.objects.filter(pk__in=changed_ids)) if changed_ids else []
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in changed_ids | deleted_ids])
+            cls._insert(cursor, documents)
+            # 多个进程同时同步时版本号只前进不后退
+            cursor.execute(
+                f"INSERT INTO {FTS_META_TABLE} (id, revision) VALUES (1, %s) "
+                f"ON CONFLICT (id) DO UPDATE SET revision = MAX(revision, excluded.revision)",
+                [revision],
+            )
+
+    def search(self, terms):
+        match = ' AND '.join(
+            '"{}"{}'.format(term.replace('"', '""'), '*' if prefix else '') for term, prefix in terms
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, bm25({FTS_TABLE}, 0.0, %s, %s) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                [NAME_WEIGHT, DESCRIPTION_WEIGHT, match],
+            )
+            # bm25 越小越相关，取相反数作为得分
+            return {int(pk): -rank for pk, rank in cursor.fetchall()}
+
+
+_memory_lock = threading.Lock()
+_memory_index = (None, None)  # (版本号, MemoryIndex)
+
+
+def _use_fts():
+    return settings.SEARCH_BACKEND != 'memory' and Fts5Index.available()
+
+
+def _sync_memory_index(revision, build):
+    """把本进程的内存索引更新到 revision；build 为 False 时尚未建立的索引保持不建立。"""
+    global _memory_index
+    with _memory_lock:
+        indexed_revision, index = _memory_index
+        if index is None and not build:
+            return None
+        if indexed_revision != revision:
+            changes = _application_changes(indexed_revision, revision) if index is not None else None
+            index = MemoryIndex(_documents()) if changes is None else index.updated(*changes)
+            _memory_index = (revision, index)
+    return index
+
+
+def get_index():
+    """返回用于搜索的索引。FTS5 索引尚未建立时 (迁移之前创建的数据库)，本进程暂时使用内存索引。"""
+    if _use_fts() and Fts5Index.indexed_revision() is not None:
+        return Fts5Index()
+    return _sync_memory_index(catalog.get_revision(), build=True)
+
+
+def sync_index(revision=None):
+    """把搜索索引同步到目录版本号 revision (默认为当前版本号)。"""
+    if revision is None:
+        revision = catalog.get_revision()
+    if _use_fts():
+        Fts5Index.sync(revision)
+    else:
+        _sync_memory_index(revision, build=False)
+
+
+def rebuild_index():
+    """整体重建搜索索引 (manage.py rebuild_search_index)。内存索引只重建当前进程中的一份。"""
+    global _memory_index
+    revision = catalog.get_revision()
+    if _use_fts():
+        Fts5Index.rebuild(revision)
+    else:
+        with _memory_lock:
+            _memory_index = (revision, MemoryIndex(_documents()))
+
+
+def _sync_on_catalog_change(sender, revision, **kwargs):
+    # 数据已提交，索引更新失败不影响本次请求；索引版本号未前进，下次同步时会一并补上
+    try:
+        sync_index(revision)
+    except DatabaseError:
+        logger.exception('更新搜索索引失败')
+
+
+def sync_after_migrate(sender, **kwargs):
+    if _use_fts():
+        Fts5Index.sync(catalog.get_revision())
+
+
+catalog.catalog_changed.connect(_sync_on_catalog_change, dispatch_uid='search_sync_on_catalog_change')
+
+
+def search_ids(query, limit=None):
+    """按相关度从高到低返回匹配的应用 ID 列表。"""
+    terms = query_terms(query)
+    if not terms:
+        return []
+    scores = get_index().search(terms)
+    ranked = sorted(scores, key=lambda pk: (-scores[pk], pk))
+    return ranked[:limit] if limit else ranked
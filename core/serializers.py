@@ -1,8 +1,12 @@
 # 文件路径: core/serializers.py (修复 Logo 和文件的绝对 URL)
 
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
 from rest_framework import serializers
 # 确保导入了正确的模型 (这里假设您有 Application, Category, WebsiteNavigation)
 from .models import Application, Category, WebsiteNavigation 
+from .thumbnails import THUMBNAIL_FORMATS, THUMBNAIL_PREFIX
 
 
 # 1. Category 的序列化器
@@ -11,19 +15,55 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['name'] 
 
+# 媒体文件绝对 URL 的前缀每个请求只计算一次 (many=True 时各行共用同一个子序列化器)
+class MediaUrlsMixin:
+    def media_urls(self):
+        request = self.context.get('request')
+        urls = getattr(self, '_media_urls', None)
+        if urls is None or urls.request is not request:
+            urls = self._media_urls = MediaUrls(request)
+        return urls
+
+
 # 3. Website Navigation 的序列化器 (假设您在模型中定义了它)
-class WebsiteNavigationSerializer(serializers.ModelSerializer):
+class WebsiteNavigationSerializer(MediaUrlsMixin, serializers.ModelSerializer):
+    # 图标原图和各尺寸缩略图的绝对 URL，格式与应用的 logo_url / logo_variants 相同
+    favicon_url = serializers.SerializerMethodField()
+    favicon_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = WebsiteNavigation
-        fields = ['id', 'name', 'url', 'order']
+        fields = ['id', 'name', 'url', 'order', 'favicon_url', 'favicon_variants']
+
+    def get_favicon_url(self, obj):
+        if obj.favicon and self.context.get('request'):
+            return self.media_urls().favicon_url(obj.favicon.name)
+        return None
+
+    def get_favicon_variants(self, obj):
+        if not (obj.favicon and self.context.get('request')):
+            return None
+        return self.media_urls().logo_variants(obj.favicon.name)
+
+
+# 按需字段：视图在 context['fields'] 中给出字段列表时 (?fields=id,name)，只输出并计算这些字段
+class SparseFieldsMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
 
 
 # 2. Application 的序列化器 (核心修复区)
-class ApplicationSerializer(serializers.ModelSerializer):
+class ApplicationSerializer(SparseFieldsMixin, MediaUrlsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True, allow_null=True) 
 
     # 使用 SerializerMethodField 来手动生成绝对 URL
     logo_url = serializers.SerializerMethodField()
+    # 各尺寸缩略图: {"32": {"webp": url, "png": url}, "64": ..., "128": ...}
+    logo_variants = serializers.SerializerMethodField()
     uploaded_file_url = serializers.SerializerMethodField()
     
     # 确保 install_method 和 download_type 在模型中有定义（或使用 get_FOO_display）
@@ -37,22 +77,137 @@ class ApplicationSerializer(serializers.ModelSerializer):
             'id', 'name', 'version', 'category', 'short_description', 
             # 字段列表应包含所有需要传递给客户端的字段
             'download_type', 'external_link', 'server_file_path', 
-            'logo_url', 'uploaded_file_url', 
+            'logo_url', 'logo_variants', 'uploaded_file_url', 
             'install_method', 
+            # 安装包清单：客户端可据此校验、去重和断点续传
+            'file_size', 'file_sha256',
         ]
-        
-    # 💥 修复点 1: 获取 Logo 的绝对 URL
+
+    # 💥 修复点 1: 获取 Logo 的绝对 URL (与 request.build_absolute_uri(obj.logo.url) 相同)
     def get_logo_url(self, obj):
-        request = self.context.get('request')
-        if obj.logo and hasattr(obj.logo, 'url') and request:
-            # 使用 request.build_absolute_uri 来获取完整的 http://... 链接
-            return request.build_absolute_uri(obj.logo.url)
+        if obj.logo and self.context.get('request'):
+            return self.media_urls().logo_url(obj.logo.name)
         return None
 
+    # 获取 Logo 各尺寸缩略图的绝对 URL (客户端按显示尺寸选择，避免下载原图)
+    def get_logo_variants(self, obj):
+        if not (obj.logo and self.context.get('request')):
+            return None
+        return self.media_urls().logo_variants(obj.logo.name)
+
     # 💥 修复点 2: 获取上传文件的绝对 URL
     def get_uploaded_file_url(self, obj):
-        request = self.context.get('request')
-        if obj.uploaded_file and hasattr(obj.uploaded_file, 'url') and request:
-            # 使用 request.build_absolute_uri 来获取完整的 http://... 链接
-            return request.build_absolute_uri(obj.uploaded_file.url)
-        return None
\ No newline at end of file
+        if obj.uploaded_file and self.context.get('request'):
+            return self.media_urls().file_url(obj.uploaded_file.name)
+        return None
+
+
+# 4. 增量同步接口使用的序列化器 (比列表接口多返回关联 ID 和更新时间)
+class CategorySyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug', 'order', 'updated_at']
+
+
+class ApplicationSyncSerializer(ApplicationSerializer):
+    class Meta(ApplicationSerializer.Meta):
+        fields = ApplicationSerializer.Meta.fields + ['category_id', 'order', 'updated_at']
+
+
+class WebsiteNavigationSyncSerializer(WebsiteNavigationSerializer):
+    class Meta(WebsiteNavigationSerializer.Meta):
+        fields = WebsiteNavigationSerializer.Meta.fields + ['updated_at']
+
+
+# 5. 列表接口的快速序列化器：直接处理 .values() 行，输出与 ApplicationSerializer 逐字节一致
+def _media_url_builder(request, storage):
+    """
+    返回 name -> 绝对 URL 的函数，结果与 request.build_absolute_uri(storage.url(name)) 相同。
+    本地文件存储的绝对前缀每个请求只计算一次，之后每行只做一次路径转义。
+    """
+    if isinstance(storage, FileSystemStorage):
+        base = request.build_absolute_uri(storage.base_url)
+        return lambda name: base + filepath_to_uri(name).lstrip('/')
+    return lambda name: request.build_absolute_uri(storage.url(name))
+
+
+class MediaUrls:
+    """应用的 Logo、导航图标、缩略图和安装包的绝对 URL，前缀按请求计算一次。"""
+
+    def __init__(self, request):
+        self.request = request
+        self.logo_url = _media_url_builder(request, Application._meta.get_field('logo').storage)
+        self.file_url = _media_url_builder(request, Application._meta.get_field('uploaded_file').storage)
+        self.favicon_url = _media_url_builder(request, WebsiteNavigation._meta.get_field('favicon').storage)
+        self.thumbnail_base = request.build_absolute_uri(settings.MEDIA_URL) + THUMBNAIL_PREFIX
+        self.thumbnail_sizes = [str(size) for size in settings.THUMBNAIL_SIZES]
+
+    def logo_variants(self, name):
+        quoted = filepath_to_uri(name)
+        return {
+            size: {fmt: f'{self.thumbnail_base}/{size}/{quoted}.{fmt}' for fmt in THUMBNAIL_FORMATS}
+            for size in self.thumbnail_sizes
+        }
+
+
+class ApplicationRowSerializer:
+    """
+    ApplicationSerializer 的批量版本，用于目录列表这种一次输出成百上千行的场景：
+    - 从 .values() 行读取数据，不构造模型实例；
+    - 媒体文件的绝对 URL 前缀每个请求只计算一次；
+    - 选项显示名用字典映射，分类名称直接取 category__name。
+    修改 ApplicationSerializer 的字段时需要同步修改这里 (core/tests.py 中有等价性测试)。
+    """
+    fields = ApplicationSerializer.Meta.fields
+    # 查询的列 (分页器使用的排序键也包含在内)
+    values_fields = (
+        'id', 'name', 'version', 'category__name', 'short_description', 'download_type', 'external_link',
+        'server_file_path', 'logo', 'uploaded_file', 'install_method', 'file_size', 'file_sha256',
+        'category__order', 'category_id', 'order',
+    )
+
+    def __init__(self, request=None, fields=None):
+        self.request = request
+        self.output_fields = [name for name in self.fields if not fields or name in fields]
+        self.sparse = len(self.output_fields) != len(self.fields)
+        self.download_type_labels = self.choice_labels('download_type')
+        self.install_method_labels = self.choice_labels('install_method')
+        # 只有需要输出时才计算 URL (有 request 时 ApplicationSerializer 才会生成绝对 URL)
+        self.with_logo_url = request is not None and 'logo_url' in self.output_fields
+        self.with_logo_variants = request is not None and 'logo_variants' in self.output_fields
+        self.with_file_url = request is not None and 'uploaded_file_url' in self.output_fields
+        if request is not None:
+            urls = MediaUrls(request)
+            self.logo_url, self.file_url, self.logo_variants = urls.logo_url, urls.file_url, urls.logo_variants
+
+    @staticmethod
+    def choice_labels(field_name):
+        return {value: str(label) for value, label in Application._meta.get_field(field_name).flatchoices}
+
+    def to_representation(self, row):
+        logo = row['logo']
+        uploaded_file = row['uploaded_file']
+        download_type = row['download_type']
+        install_method = row['install_method']
+        values = {
+            'id': row['id'],
+            'name': row['name'],
+            'version': row['version'],
+            'category': {'name': row['category__name']} if row['category__name'] is not None else None,
+            'short_description': row['short_description'],
+            'download_type': self.download_type_labels.get(download_type, download_type),
+            'external_link': row['external_link'],
+            'server_file_path': row['server_file_path'],
+            'logo_url': self.logo_url(logo) if logo and self.with_logo_url else None,
+            'logo_variants': self.logo_variants(logo) if logo and self.with_logo_variants else None,
+            'uploaded_file_url': self.file_url(uploaded_file) if uploaded_file and self.with_file_url else None,
+            'install_method': self.install_method_labels.get(install_method, install_method),
+            'file_size': row['file_size'],
+            'file_sha256': row['file_sha256'],
+        }
+        if not self.sparse:
+            return values
+        return {name: values[name] for name in self.output_fields}
+
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
@@ -0,0 +1,61 @@
+# 文件: core/signals.py
+# 目录数据变化时递增目录版本号，使快照和 ETag 失效。
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import catalog
+from .models import Application, Category, WebsiteNavigation
+from .storage import release_blobs
+
+CATALOG_MODELS = (Application, Category, WebsiteNavigation)
+
+# 使用内容寻址存储的图片字段
+BLOB_FIELDS = {Application: 'logo', WebsiteNavigation: 'favicon'}
+
+
+def catalog_saved(sender, instance, **kwargs):
+    # loaddata 等原始导入 (raw=True) 不触发
+    if kwargs.get('raw'):
+        return
+    catalog.record_change(instance)
+
+
+def catalog_deleted(sender, instance, **kwargs):
+    catalog.record_change(instance, deleted=True)
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(catalog_saved, sender=model, dispatch_uid=f'catalog_saved_{model.__name__}')
+    post_delete.connect(catalog_deleted, sender=model, dispatch_uid=f'catalog_deleted_{model.__name__}')
+
+
+# =========================================================
+# 内容寻址图片的引用释放：图片被替换或对象被删除后，
+# 如果旧文件已没有任何引用，则在事务提交后删除。
+# =========================================================
+def remember_previous_blob(sender, instance, **kwargs):
+    field = BLOB_FIELDS[sender]
+    update_fields = kwargs.get('update_fields')
+    if kwargs.get('raw') or not instance.pk or (update_fields is not None and field not in update_fields):
+        instance._previous_blob = None
+        return
+    instance._previous_blob = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+def release_replaced_blob(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_blob', None)
+    if previous and previous != getattr(instance, BLOB_FIELDS[sender]).name:
+        transaction.on_commit(lambda: release_blobs([previous]))
+
+
+def release_deleted_blob(sender, instance, **kwargs):
+    name = getattr(instance, BLOB_FIELDS[sender]).name
+    if name:
+        transaction.on_commit(lambda: release_blobs([name]))
+
+
+for model in BLOB_FIELDS:
+    pre_save.connect(remember_previous_blob, sender=model, dispatch_uid=f'blob_remember_{model.__name__}')
+    post_save.connect(release_replaced_blob, sender=model, dispatch_uid=f'blob_replaced_{model.__name__}')
+    post_delete.connect(release_deleted_blob, sender=model, dispatch_uid=f'blob_deleted_{model.__name__}')
@@ -0,0 +1,112 @@
+// 文件: core/static/admin/js/chunked_upload.js (大文件分片上传，支持断点续传)
+
+(function($) {
+    $(document).ready(function() {
+        const uploadInput = $('#id_uploaded_file'); // 原始文件上传字段
+        const sessionInput = $('#id_chunked_upload_id'); // 隐藏的上传会话 ID
+        const createUrl = '/admin/core/uploads/';
+        const maxRetries = 5;
+
+        if (uploadInput.length === 0 || sessionInput.length === 0) {
+            return;
+        }
+
+        function getCsrfToken() {
+            const field = $('input[name=csrfmiddlewaretoken]');
+            if (field.length) {
+                return field.val();
+            }
+            const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+            return match ? decodeURIComponent(match[1]) : '';
+        }
+
+        // 1. 创建分片上传控件
+        const box = $(`
+            <div id="chunked-upload-box" style="margin-top: 8px;">
+                <input type="file" id="chunked-upload-file">
+                <button type="button" class="button" id="chunked-upload-start" style="margin-left: 10px;">分片上传大文件</button>
+                <div id="chunked-upload-status" style="margin-top: 6px; color: #666;"></div>
+            </div>
+        `);
+        uploadInput.after(box);
+        const statusText = $('#chunked-upload-status');
+
+        function sleep(ms) {
+            return new Promise(resolve => setTimeout(resolve, ms));
+        }
+
+        async function requestJson(url, options) {
+            const response = await fetch(url, Object.assign({ credentials: 'same-origin' }, options));
+            const data = await response.json();
+            // 409 表示偏移量不一致，响应中带有服务器记录的偏移量，可直接继续
+            if (!response.ok && response.status !== 409) {
+                throw new Error(data.detail || `HTTP ${response.status}`);
+            }
+            return data;
+        }
+
+        async function upload(file) {
+            const form = new FormData();
+            form.append('filename', file.name);
+            form.append('size', file.size);
+
+            // 2. 创建会话 (服务器发现同名同大小的未完成会话时返回其偏移量，实现续传)
+            let session = await requestJson(createUrl, {
+                method: 'POST',
+                headers: { 'X-CSRFToken': getCsrfToken() },
+                body: form,
+            });
+            const sessionUrl = `${createUrl}${session.id}/`;
+            let retries = 0;
+
+            // 3. 按块上传，每块从服务器确认的偏移量开始
+            while (session.status !== 'complete') {
+                const chunk = file.slice(session.offset, session.offset + session.chunk_size);
+                try {
+                    session = await requestJson(sessionUrl, {
+                        method: 'PUT',
+                        headers: {
+                            'X-CSRFToken': getCsrfToken(),
+                            'Upload-Offset': String(session.offset),
+                            'Content-Type': 'application/octet-stream',
+                        },
+                        body: chunk,
+                    });
+                    retries = 0;
+                } catch (e) {
+                    if (++retries > maxRetries) {
+                        throw e;
+                    }
+                    // 网络中断后稍等片刻，查询服务器实际接收到的位置再继续
+                    await sleep(1000 * retries);
+                    session = await requestJson(sessionUrl, { method: 'GET' });
+                }
+                const percent = file.size ? Math.floor(session.offset * 100 / file.size) : 100;
+                statusText.text(`上传中... ${percent}%`);
+            }
+            return session;
+        }
+
+        $('#chunked-upload-start').on('click', function() {
+            const file = $('#chunked-upload-file')[0].files[0];
+            if (!file) {
+                statusText.text('请先选择文件。');
+                return;
+            }
+            const button = $(this).prop('disabled', true);
+            statusText.text('正在准备上传...');
+
+            upload(file).then(function(session) {
+                // 4. 上传完成，保存表单时由 ApplicationAdmin.save_model 关联到 uploaded_file 字段
+                sessionInput.val(session.id);
+                uploadInput.val('');
+                $('#id_download_type').val('UPLOADED_FILE').trigger('change');
+                statusText.text(`上传完成: ${session.name} (SHA-256 ${session.sha256.slice(0, 12)}...)，请保存以生效。`);
+            }).catch(function(e) {
+                statusText.text(`上传失败: ${e.message}，再次点击可从中断处继续。`);
+            }).finally(function() {
+                button.prop('disabled', false);
+            });
+        });
+    });
+})(django.jQuery);
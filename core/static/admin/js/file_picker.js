@@ -33,6 +33,12 @@
             #file-list-ul li:hover {
                 background-color: #f6f6f6;
             }
+            #file-picker-toolbar {
+                display: flex; gap: 10px;
+            }
+            #file-picker-search {
+                flex-grow: 1;
+            }
             .modal-title {
                 font-size: 1.2em; font-weight: bold; margin-bottom: 15px;
                 border-bottom: 1px solid #eee; padding-bottom: 10px;
@@ -54,8 +60,18 @@
                 <div id="file-picker-overlay">
                     <div id="file-picker-modal">
                         <div class="modal-title">选择服务器文件</div>
+                        <div id="file-picker-toolbar">
+                            <input type="search" id="file-picker-search" placeholder="按文件名前缀搜索...">
+                            <select id="file-picker-sort">
+                                <option value="name">按名称</option>
+                                <option value="-mtime">最近修改</option>
+                                <option value="-size">从大到小</option>
+                                <option value="size">从小到大</option>
+                            </select>
+                        </div>
                         <p id="loading-message">正在加载文件列表...</p>
                         <ul id="file-list-ul"></ul>
+                        <button type="button" class="button" id="file-picker-more" style="margin-top: 10px; display: none;">加载更多</button>
                         <button type="button" class="button default" id="modal-close-button" style="margin-top: 20px;">关闭</button>
                     </div>
                 </div>
@@ -66,32 +82,56 @@
             const fileListElement = $('#file-list-ul');
             const loadingMessage = $('#loading-message');
 
-            function openModal() {
-                overlay.fadeIn(200);
-                fileListElement.empty();
-                loadingMessage.show().text('正在加载文件列表...');
+            const searchInput = $('#file-picker-search');
+            const sortSelect = $('#file-picker-sort');
+            const moreButton = $('#file-picker-more');
+            let nextPage = 1;
+            let searchTimer = null;
+
+            function formatSize(bytes) {
+                const units = ['B', 'KB', 'MB', 'GB'];
+                let i = 0;
+                while (bytes >= 1024 && i < units.length - 1) {
+                    bytes /= 1024;
+                    i++;
+                }
+                return `${bytes.toFixed(i ? 1 : 0)} ${units[i]}`;
+            }
+
+            // 分页加载文件索引，reset 为 true 时从第一页重新开始
+            function loadFiles(reset) {
+                if (reset) {
+                    nextPage = 1;
+                    fileListElement.empty();
+                }
+                moreButton.hide();
+                loadingMessage.show().text('正在加载文件列表...').css('color', '');
 
-                // 异步请求文件列表
                 $.ajax({
                     url: url,
                     dataType: 'json',
+                    data: { q: searchInput.val(), sort: sortSelect.val(), page: nextPage },
                     success: function(data) {
                         loadingMessage.hide();
                         if (data.files && data.files.length > 0) {
-                            $.each(data.files, function(index, fileName) {
-                                const listItem = $(`<li>${fileName}</li>`);
+                            $.each(data.files, function(index, file) {
+                                const listItem = $('<li></li>').text(file.path);
+                                listItem.append($('<span style="float: right; color: #999;"></span>').text(formatSize(file.size)));
                                 
-                                // 点击文件名时，将其值填入输入框
+                                // 点击文件时，将其路径填入输入框 (media/uploads 下的文件为 uploads/xxx)
                                 listItem.on('click', function() {
-                                    // 自动在文件名前加上 uploads/ 前缀
-                                    filePathInput.val(`uploads/${fileName}`); 
+                                    filePathInput.val(file.path); 
                                     overlay.fadeOut(200);
                                 });
                                 fileListElement.append(listItem);
                             });
-                        } else {
+                        } else if (nextPage === 1) {
                             fileListElement.html('<li style="padding: 10px;">未找到任何文件。请确认文件已上传至 media/uploads 目录。</li>');
                         }
+                        if (data.has_next) {
+                            nextPage = data.page + 1;
+                            moreButton.show();
+                        }
                     },
                     error: function(xhr, status, error) {
                         loadingMessage.text('加载文件列表失败，请检查服务器日志。').css('color', 'red');
@@ -100,6 +140,18 @@
                 });
             }
 
+            function openModal() {
+                overlay.fadeIn(200);
+                loadFiles(true);
+            }
+
+            searchInput.on('input', function() {
+                clearTimeout(searchTimer);
+                searchTimer = setTimeout(function() { loadFiles(true); }, 300);
+            });
+            sortSelect.on('change', function() { loadFiles(true); });
+            moreButton.on('click', function() { loadFiles(false); });
+
             // 3. 绑定点击事件
             pickerButton.on('click', openModal);
             
@@ -0,0 +1,128 @@
+# 文件: core/storage.py
+# 内容寻址的图片存储 (Logo / Favicon)：按 SHA-256 命名，相同内容只保存一份。
+
+import hashlib
+import os
+import time
+from collections import Counter
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import LazyObject
+
+# 内容寻址文件在 MEDIA_ROOT 下的目录
+BLOB_PREFIX = 'blobs'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    忽略上传时的文件名，按内容的 SHA-256 保存为 blobs/ab/abcdef....ext。
+    同样的字节无论上传多少次都只占一份空间，文件名不变，可以长期缓存。
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        ext = os.path.splitext(name)[1].lower()[:10]
+        blob_name = f'{BLOB_PREFIX}/{digest[:2]}/{digest}{ext}'
+
+        if self.exists(blob_name):
+            # 已存在相同内容，更新修改时间以免被刚好运行的垃圾回收删除
+            os.utime(self.path(blob_name))
+            return blob_name
+
+        saved_name = self._save(blob_name, content)
+        if saved_name != blob_name:
+            # 其他进程同时写入了同一内容，保留先写入的那份
+            self.delete(saved_name)
+        return blob_name
+
+
+class DefaultBlobStorage(LazyObject):
+    def _setup(self):
+        self._wrapped = ContentAddressedStorage()
+
+
+blob_storage = DefaultBlobStorage()
+
+
+def get_blob_storage():
+    """供模型字段 storage= 参数使用的可调用对象 (迁移文件中按引用保存)。"""
+    return blob_storage
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX + '/')
+
+
+def blob_references():
+    """统计每个内容寻址文件被模型字段引用的次数 (引用计数)。"""
+    from .models import Application, WebsiteNavigation
+
+    counts = Counter()
+    for model, field in ((Application, 'logo'), (WebsiteNavigation, 'favicon')):
+        for name in model.objects.filter(**{f'{field}__startswith': BLOB_PREFIX + '/'}).values_list(field, flat=True):
+            counts[name] += 1
+    return counts
+
+
+def release_blobs(names):
+    """删除已不再被任何模型引用的内容寻址文件，返回删除的文件名列表。只查询这些文件名的引用。"""
+    from .models import Application, WebsiteNavigation
+    from .thumbnails import delete_variants
+
+    names = [name for name in set(names) if is_blob(name)]
+    if not names:
+        return []
+    referenced = set(Application.objects.filter(logo__in=names).values_list('logo', flat=True))
+    referenced.update(WebsiteNavigation.objects.filter(favicon__in=names).values_list('favicon', flat=True))
+    released = []
+    for name in names:
+        if name not in referenced and blob_storage.exists(name):
+            blob_storage.delete(name)
+            delete_variants(name)
+            released.append(name)
+    return released
+
+
+def collect_garbage(grace_seconds=3600, dry_run=False):
+    """
+    删除引用计数为 0 的孤立文件。
+    最近 grace_seconds 秒内写入的文件可能还没来得及保存到模型，暂不删除。
+    返回 (删除的文件名列表, 释放的字节数)。
+    """
+    from .thumbnails import delete_variants
+
+    root = blob_storage.path(BLOB_PREFIX)
+    if not os.path.isdir(root):
+        return [], 0
+
+    references = blob_references()
+    cutoff = time.time() - grace_seconds
+    removed, freed = [], 0
+    for directory, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, blob_storage.location).replace(os.sep, '/')
+            stat_result = os.stat(path)
+            if references[name] or stat_result.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                os.remove(path)
+                delete_variants(name)
+            removed.append(name)
+            freed += stat_result.st_size
+
+    if not dry_run:
+        # 清理空的哈希前缀目录
+        for entry in os.scandir(root):
+            if entry.is_dir() and not os.listdir(entry.path):
+                os.rmdir(entry.path)
+    return removed, freed
@@ -0,0 +1,175 @@
+# 文件: core/tasks.py
+# 基于数据库任务表的后台任务 (由 manage.py run_favicon_worker 执行)。
+
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import FaviconTask, WebsiteNavigation
+from .utils import download_favicon, get_http_session
+
+
+def enqueue_all_favicons():
+    """为所有网站导航条目创建抓取任务 (批量刷新)，返回入队数量。"""
+    count = 0
+    for navigation in WebsiteNavigation.objects.exclude(url=''):
+        FaviconTask.enqueue(navigation)
+        count += 1
+    return count
+
+
+def requeue_stale_tasks(max_age):
+    """
+    把处理时间过长 (worker 异常退出遗留) 的任务重新置为等待中，返回重新入队的数量；
+    尝试次数已用完的任务标记为失败。
+    """
+    stale = FaviconTask.objects.filter(
+        status=FaviconTask.STATUS_RUNNING,
+        updated_at__lt=timezone.now() - timedelta(seconds=max_age),
+    )
+    stale.filter(attempts__gte=settings.FAVICON_TASK_MAX_ATTEMPTS).update(
+        status=FaviconTask.STATUS_FAILED, error='处理超时', updated_at=timezone.now(),
+    )
+    return stale.update(status=FaviconTask.STATUS_PENDING, next_attempt_at=None)
+
+
+def retry_delay(attempts):
+    """第 attempts 次尝试失败后的等待时间 (指数退避)。"""
+    return timedelta(seconds=settings.FAVICON_TASK_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_favicon_tasks(limit):
+    """
+    领取最多 limit 个等待中的任务。
+    用条件 UPDATE 抢占，多个 worker 同时运行时同一任务只会被一个 worker 领到。
+    """
+    claimed = []
+    pending_ids = FaviconTask.objects.filter(status=FaviconTask.STATUS_PENDING).filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now())
+    ).values_list('pk', flat=True)[:limit]
+    for pk in pending_ids:
+        updated = FaviconTask.objects.filter(pk=pk, status=FaviconTask.STATUS_PENDING).update(
+            status=FaviconTask.STATUS_RUNNING, attempts=F('attempts') + 1, updated_at=timezone.now()
+        )
+        if updated:
+            claimed.append(pk)
+    return list(FaviconTask.objects.filter(pk__in=claimed).select_related('navigation'))
+
+
+def _download(task, session):
+    try:
+        return download_favicon(task.url, session=session), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def process_favicon_tasks(limit=None, concurrency=None):
+    """
+    并发处理一批等待中的抓取任务，返回 (成功数, 失败数)。
+    网络请求在线程池中进行并共享同一个连接池会话，数据库写入都在当前线程完成。
+    失败的任务按指数退避重新等待，尝试 FAVICON_TASK_MAX_ATTEMPTS 次后标记为失败。
+    """
+    limit = limit or settings.FAVICON_WORKER_BATCH_SIZE
+    concurrency = concurrency or settings.FAVICON_WORKER_CONCURRENCY
+
+    tasks = claim_favicon_tasks(limit)
+    if not tasks:
+        return 0, 0
+
+    session = get_http_session()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda task: _download(task, session), tasks))
+
+    succeeded = failed = 0
+    for task, (result, error) in zip(tasks, results):
+        navigation = task.navigation
+        if error is None and navigation.url == task.url:
+            navigation.apply_favicon(result, task.url)
+            task.status = FaviconTask.STATUS_DONE
+            task.error = ''
+            succeeded += 1
+        elif error is None:
+            # 抓取期间 URL 又被修改，新 URL 已有自己的任务，丢弃本次结果
+            task.status = FaviconTask.STATUS_DONE
+            task.error = 'URL 已变化，结果已丢弃'
+        elif task.attempts < settings.FAVICON_TASK_MAX_ATTEMPTS:
+            task.status = FaviconTask.STATUS_PENDING
+            task.next_attempt_at = timezone.now() + retry_delay(task.attempts)
+            task.error = error
+            failed += 1
+        else:
+            task.status = FaviconTask.STATUS_FAILED
+            task.error = error
+            failed += 1
+        task.save(update_fields=['status', 'error', 'next_attempt_at', 'updated_at'])
+    return succeeded, failed
+
+
+class HostLimiter:
+    """限制对同一主机的并发请求数 (每个主机一个信号量)。"""
+
+    def __init__(self, per_host):
+        self._semaphores = defaultdict(lambda: threading.BoundedSemaphore(per_host))
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            return self._semaphores[host]
+
+
+def refresh_all_favicons(queryset=None, concurrency=None, per_host=2, force=False):
+    """
+    并发刷新导航条目的图标，返回汇总报告 dict。
+    - 线程池大小为 concurrency，对同一主机最多 per_host 个并发请求；
+    - 除非 force=True，已知图标地址的条目发送 If-None-Match / If-Modified-Since 条件请求，
+      服务器返回 304 时跳过。
+    """
+    if queryset is None:
+        queryset = WebsiteNavigation.objects.exclude(url='')
+    navigations = list(queryset)
+    concurrency = concurrency or settings.FAVICON_WORKER_CONCURRENCY
+    session = get_http_session()
+    limiter = HostLimiter(per_host)
+
+    def fetch(navigation):
+        started = time.monotonic()
+        kwargs = {}
+        if not force and navigation.url == navigation.favicon_source_url and navigation.favicon:
+            kwargs = {
+                'icon_url': navigation.favicon_icon_url,
+                'etag': navigation.favicon_etag,
+                'last_modified': navigation.favicon_last_modified,
+            }
+        with limiter(navigation.url):
+            try:
+                result, error = download_favicon(navigation.url, session=session, **kwargs), None
+            except Exception as e:
+                result, error = None, f"{type(e).__name__}: {e}"
+        return result, error, time.monotonic() - started
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(fetch, navigations))
+
+    report = {'total': len(navigations), 'updated': 0, 'unchanged': 0, 'failed': 0, 'failures': []}
+    for navigation, (result, error, elapsed) in zip(navigations, results):
+        if error is not None:
+            report['failed'] += 1
+            report['failures'].append((navigation.name, navigation.url, error))
+            continue
+        if result.not_modified:
+            # 304: 图标和校验信息都没有变化，不保存 (保存会触发 post_save，递增目录版本号并记录变更)
+            report['unchanged'] += 1
+            continue
+        navigation.apply_favicon(result, navigation.url)
+        report['updated'] += 1
+    report['elapsed'] = time.monotonic() - started
+    return report
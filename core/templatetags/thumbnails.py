@@ -0,0 +1,13 @@
+from django import template
+
+from core.thumbnails import variant_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(image, size, fmt='webp'):
+    """{% thumbnail_url app.logo 64 'webp' %} -> 缩略图 URL (首次访问时生成)"""
+    if not image:
+        return ''
+    return variant_url(image.name, size, fmt)
@@ -1,3 +1,1656 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import json
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import time
+import warnings
+from collections import Counter
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from AppManager.asgi import application as asgi_application
+
+from . import analytics, bulk, catalog, compression, fileindex, files, metrics, search, tasks, thumbnails
+from .models import (
+    AppChoices, Application, CatalogChange, CatalogRevision, Category, DownloadEvent, FaviconTask, ServerFile,
+    UploadSession, WebsiteNavigation,
+)
+from .cache import LocalCache, tiered
+from .storage import blob_references, blob_storage, release_blobs
+from .serializers import ApplicationRowSerializer, ApplicationSerializer, WebsiteNavigationSerializer
+from .views import ApplicationViewSet
+
+
+class GroupedCatalogTests(TestCase):
+    """catalog.build_grouped_catalog 的分组顺序和查询次数"""
+
+    def seed(self, categories, apps_per_category):
+        Category.objects.all().delete()
+        for i in range(categories):
+            # 分类的 order 与创建顺序相反，确保分组顺序由 order 决定
+            category = Category.objects.create(name=f'cat-{i}', slug=f'cat-{i}', order=categories - i)
+            Application.objects.bulk_create([
+                Application(name=f'app-{i}-{j}', category=category, order=apps_per_category - j)
+                for j in range(apps_per_category)
+            ])
+
+    def test_groups_are_ordered(self):
+        self.seed(3, 4)
+        groups = catalog.build_grouped_catalog()
+        self.assertEqual([c.name for c, apps in groups], ['cat-2', 'cat-1', 'cat-0'])
+        self.assertEqual([a.name for a in groups[0][1]], ['app-2-3', 'app-2-2', 'app-2-1', 'app-2-0'])
+
+    def test_empty_categories_are_skipped(self):
+        self.seed(2, 1)
+        Category.objects.create(name='empty', slug='empty', order=-1)
+        self.assertNotIn('empty', [c.name for c, apps in catalog.build_grouped_catalog()])
+
+    def test_query_count_is_constant(self):
+        for categories, apps_per_category in ((1, 1), (5, 10), (20, 25)):
+            self.seed(categories, apps_per_category)
+            with self.assertNumQueries(1):
+                groups = catalog.build_grouped_catalog()
+                # 访问分类名称不应触发额外查询
+                [app.category.name for category, apps in groups for app in apps]
+
+
+class StubFaviconHandler(http.server.BaseHTTPRequestHandler):
+    """本地桩服务器：首页声明 /icon.png，图标支持 ETag 条件请求，并统计并发数。"""
+    ETAG = '"icon-v1"'
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(0.02)
+            if self.path == '/icon.png':
+                if self.headers.get('If-None-Match') == cls.ETAG:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('ETag', cls.ETAG)
+                self.end_headers()
+                self.wfile.write(b'\x89PNG stub icon')
+            else:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html')
+                self.end_headers()
+                self.wfile.write(b'<html><head><link rel="icon" href="/icon.png"></head></html>')
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServerMixin:
+    """整个测试类共用一个本地桩 HTTP 服务器 (handler_class)，地址为 cls.base_url。"""
+    handler_class = StubFaviconHandler
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), cls.handler_class)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+
+class TempDirMixin:
+    """创建测试结束后自动删除的临时目录，以及只在当前测试中生效的设置。"""
+
+    def temp_dir(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        return path
+
+    def use_settings(self, **options):
+        settings_override = override_settings(**options)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class TempMediaRootMixin(TempDirMixin):
+    """每个测试使用独立的临时 MEDIA_ROOT (self.media_root)。"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = self.temp_dir()
+        self.use_settings(MEDIA_ROOT=self.media_root)
+
+
+class RefreshFaviconsCommandTests(StubServerMixin, TempMediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        StubFaviconHandler.max_in_flight = 0
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('refresh_favicons', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_refresh_then_skip_unchanged(self):
+        for i in range(6):
+            WebsiteNavigation.objects.create(name=f'site-{i}', url=f'{self.base_url}/page-{i}')
+
+        output = self.run_command('--concurrency', '6', '--per-host', '2')
+        self.assertIn('更新 6', output)
+        self.assertLessEqual(StubFaviconHandler.max_in_flight, 2)
+        navigation = WebsiteNavigation.objects.first()
+        self.assertTrue(navigation.favicon)
+        self.assertEqual(navigation.favicon_etag, StubFaviconHandler.ETAG)
+
+        # 第二次刷新直接对图标地址发送条件请求，全部返回 304
+        output = self.run_command('--concurrency', '6', '--per-host', '2')
+        self.assertIn('未变化 6', output)
+
+        output = self.run_command('--force')
+        self.assertIn('更新 6', output)
+
+    def test_not_modified_does_not_touch_catalog(self):
+        for i in range(3):
+            WebsiteNavigation.objects.create(name=f'site-{i}', url=f'{self.base_url}/page-{i}')
+        self.run_command()
+        revision = CatalogRevision.objects.get().value
+        changes = CatalogChange.objects.count()
+        updated_at = list(WebsiteNavigation.objects.order_by('pk').values_list('updated_at', flat=True))
+
+        # 全部返回 304 的刷新不保存条目，目录版本号和变更日志都不变
+        self.assertIn('未变化 3', self.run_command())
+        self.assertEqual(CatalogRevision.objects.get().value, revision)
+        self.assertEqual(CatalogChange.objects.count(), changes)
+        self.assertEqual(list(WebsiteNavigation.objects.order_by('pk').values_list('updated_at', flat=True)), updated_at)
+
+    def test_failures_are_reported(self):
+        WebsiteNavigation.objects.create(name='down', url='http://127.0.0.1:1/')
+        output = self.run_command()
+        self.assertIn('失败 1', output)
+
+
+@override_settings(FAVICON_TASK_MAX_ATTEMPTS=2, FAVICON_TASK_RETRY_DELAY=60)
+class FaviconTaskTests(StubServerMixin, TempMediaRootMixin, TestCase):
+    """图标抓取任务队列：URL 变化时入队并去重，worker 抓取成功后保存图标，失败时退避重试"""
+
+    def test_enqueue_on_save_and_dedup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            navigation = WebsiteNavigation.objects.create(name='示例', url=f'{self.base_url}/a')
+        self.assertEqual(list(FaviconTask.objects.values_list('url', 'status')), [
+            (f'{self.base_url}/a', FaviconTask.STATUS_PENDING),
+        ])
+
+        # URL 不变的保存、以及同一 URL 再次入队都不产生新任务
+        with self.captureOnCommitCallbacks(execute=True):
+            navigation.name = '改名'
+            navigation.save()
+        FaviconTask.enqueue(navigation)
+        self.assertEqual(FaviconTask.objects.count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            navigation.url = f'{self.base_url}/b'
+            navigation.save()
+        self.assertEqual(FaviconTask.objects.filter(status=FaviconTask.STATUS_PENDING).count(), 2)
+
+    def test_worker_applies_favicon(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            navigation = WebsiteNavigation.objects.create(name='示例', url=f'{self.base_url}/a')
+        self.assertEqual(tasks.process_favicon_tasks(), (1, 0))
+        navigation.refresh_from_db()
+        self.assertTrue(navigation.favicon)
+        self.assertEqual(navigation.favicon_source_url, f'{self.base_url}/a')
+        task = FaviconTask.objects.get()
+        self.assertEqual((task.status, task.attempts), (FaviconTask.STATUS_DONE, 1))
+
+        # 图标已对应当前 URL，再次保存不入队，worker 没有可领取的任务
+        with self.captureOnCommitCallbacks(execute=True):
+            navigation.save()
+        self.assertEqual(tasks.process_favicon_tasks(), (0, 0))
+
+    def test_failed_task_retries_with_backoff(self):
+        navigation = WebsiteNavigation.objects.create(name='down', url='http://127.0.0.1:1/')
+        task = FaviconTask.enqueue(navigation)
+
+        self.assertEqual(tasks.process_favicon_tasks(), (0, 1))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (FaviconTask.STATUS_PENDING, 1))
+        self.assertNotEqual(task.error, '')
+        self.assertGreater(task.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        # 退避期间不会被领取
+        self.assertEqual(tasks.process_favicon_tasks(), (0, 0))
+
+        FaviconTask.objects.filter(pk=task.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(tasks.process_favicon_tasks(), (0, 1))
+        task.refresh_from_db()
+        # 尝试次数用完后标记为失败，不再重试
+        self.assertEqual((task.status, task.attempts), (FaviconTask.STATUS_FAILED, 2))
+        self.assertEqual(tasks.process_favicon_tasks(), (0, 0))
+
+    def test_enqueue_resets_backoff(self):
+        navigation = WebsiteNavigation.objects.create(name='down', url='http://127.0.0.1:1/')
+        FaviconTask.enqueue(navigation)
+        tasks.process_favicon_tasks()
+        # 后台手动刷新时，等待重试的任务立即可领取
+        task = FaviconTask.enqueue(navigation)
+        self.assertIsNone(task.next_attempt_at)
+        self.assertEqual(FaviconTask.objects.count(), 1)
+        self.assertEqual(tasks.claim_favicon_tasks(10), [task])
+
+
+class RangeRequestTests(TempMediaRootMixin, TestCase):
+    """断点续传：Range 解析、206 / 416、multipart/byteranges、If-Range 和 HEAD"""
+
+    def setUp(self):
+        super().setUp()
+        self.content = bytes(range(256)) * 4  # 1024 字节
+        self.path = os.path.join(self.media_root, 'setup.bin')
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+
+    def serve(self, method='get', **headers):
+        request = getattr(RequestFactory(), method)('/download/', **headers)
+        return files.serve_file(request, self.path)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_parse_range_header(self):
+        parse = files.parse_range_header
+        self.assertEqual(parse('bytes=0-99', 1000), [(0, 99)])
+        self.assertEqual(parse('bytes=900-', 1000), [(900, 999)])       # 开放结尾
+        self.assertEqual(parse('bytes=-100', 1000), [(900, 999)])       # 后缀
+        self.assertEqual(parse('bytes=-5000', 1000), [(0, 999)])        # 后缀超过文件大小
+        self.assertEqual(parse('bytes=990-2000', 1000), [(990, 999)])   # 结尾截断到文件末尾
+        self.assertEqual(parse('bytes=0-0, 10-19', 1000), [(0, 0), (10, 19)])
+        self.assertEqual(parse('bytes=1000-', 1000), [])                # 无法满足
+        self.assertIsNone(parse('bytes=20-10', 1000))                   # 非法：忽略 Range
+        self.assertIsNone(parse('items=0-10', 1000))
+        self.assertIsNone(parse(None, 1000))
+
+    def test_single_range(self):
+        response = self.serve(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.body(response), self.content[100:200])
+
+    def test_suffix_and_open_ended_ranges(self):
+        response = self.serve(HTTP_RANGE='bytes=-24')
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(self.body(response), self.content[-24:])
+        response = self.serve(HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(response['Content-Length'], '24')
+        self.assertEqual(self.body(response), self.content[1000:])
+
+    def test_multiple_ranges(self):
+        response = self.serve(HTTP_RANGE='bytes=0-9,500-509')
+        self.assertEqual(response.status_code, 206)
+        content_type, _, boundary = response['Content-Type'].partition('; boundary=')
+        self.assertEqual(content_type, 'multipart/byteranges')
+        body = self.body(response)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        expected = b''.join(
+            f'--{boundary}\r\nContent-Type: application/octet-stream\r\n'
+            f'Content-Range: bytes {start}-{end}/1024\r\n\r\n'.encode() + self.content[start:end + 1] + b'\r\n'
+            for start, end in ((0, 9), (500, 509))
+        ) + f'--{boundary}--\r\n'.encode()
+        self.assertEqual(body, expected)
+
+    def test_unsatisfiable_range(self):
+        response = self.serve(HTTP_RANGE='bytes=2000-3000')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_if_range(self):
+        etag = self.serve()['ETag']
+        response = self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.content[:10])
+        # 校验值已过期 (文件已变化)：忽略 Range，返回完整文件
+        response = self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        last_modified = self.serve()['Last-Modified']
+        self.assertEqual(self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=last_modified).status_code, 206)
+        self.assertEqual(
+            self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200,
+        )
+
+    def test_head_and_conditional_get(self):
+        response = self.serve('head')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '1024')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), b'')
+        response = self.serve('head', HTTP_RANGE='bytes=0-9')
+        self.assertEqual((response.status_code, response['Content-Length']), (206, '10'))
+        self.assertEqual(self.body(response), b'')
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class DeliverFileTests(TempMediaRootMixin, TestCase):
+    """文件交付后端：X-Accel-Redirect 映射并转义内部路径，X-Sendfile 给出真实路径，未知后端报配置错误"""
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, 'uploads'))
+        self.path = os.path.join(self.media_root, 'uploads', '安装 包#1?.exe')
+        with open(self.path, 'wb') as f:
+            f.write(b'installer')
+        self.request = RequestFactory().get('/download/')
+
+    def test_x_accel_redirect(self):
+        self.use_settings(
+            FILE_DELIVERY_BACKEND=files.DELIVERY_X_ACCEL_REDIRECT,
+            FILE_DELIVERY_ACCEL_LOCATIONS=[(self.media_root, '/protected/media/')],
+        )
+        response = files.deliver_file(self.request, self.path, filename='setup.exe')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected/media/uploads/%E5%AE%89%E8%A3%85%20%E5%8C%85%231%3F.exe',
+        )
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="setup.exe"')
+        self.assertEqual(response.content, b'')
+
+        # 不在任何 internal location 之下的文件退回进程内传输
+        outside = os.path.join(self.temp_dir(), 'other.exe')
+        with open(outside, 'wb') as f:
+            f.write(b'other')
+        response = files.deliver_file(self.request, outside)
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertEqual(b''.join(response.streaming_content), b'other')
+
+        with self.assertRaises(Http404):
+            files.deliver_file(self.request, os.path.join(self.media_root, 'uploads', 'missing.exe'))
+
+    def test_x_sendfile(self):
+        self.use_settings(FILE_DELIVERY_BACKEND=files.DELIVERY_X_SENDFILE)
+        path = os.path.join(self.media_root, 'uploads', 'setup.zip')
+        with open(path, 'wb') as f:
+            f.write(b'installer')
+        link = os.path.join(self.media_root, 'latest.zip')
+        os.symlink(path, link)
+        response = files.deliver_file(self.request, link)
+        self.assertEqual(response['X-Sendfile'], os.path.realpath(path))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertEqual(response.content, b'')
+
+    def test_unknown_backend(self):
+        self.use_settings(FILE_DELIVERY_BACKEND='sendfile')
+        with self.assertRaises(ImproperlyConfigured):
+            files.deliver_file(self.request, self.path)
+
+
+class ThumbnailTests(TempMediaRootMixin, TestCase):
+    """缩略图：首次请求时生成，之后复用磁盘上的文件，原图更新后重新生成，非法规格返回 404"""
+
+    def setUp(self):
+        super().setUp()
+        self.name = 'logos/logo #1?.png'
+        self.source = os.path.join(self.media_root, self.name)
+        os.makedirs(os.path.dirname(self.source))
+        Image.new('RGBA', (256, 128), (255, 0, 0, 255)).save(self.source, 'PNG')
+
+    def get(self, url):
+        response = self.client.get(url)
+        if response.status_code == 200:
+            return response, b''.join(response.streaming_content)
+        return response, b''
+
+    def test_generate_and_reuse(self):
+        url = thumbnails.variant_url(self.name, 64, 'webp')
+        self.assertEqual(url, '/media/thumbs/64/logos/logo%20%231%3F.png.webp')
+        response, content = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
+        with Image.open(BytesIO(content)) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (64, 32)))
+
+        # 缩略图已存在且不比原图旧时直接复用
+        path = thumbnails.get_variant_path(self.name, 64, 'webp')
+        generated = os.stat(path).st_mtime_ns
+        self.assertEqual(thumbnails.get_variant_path(self.name, 64, 'webp'), path)
+        self.assertEqual(os.stat(path).st_mtime_ns, generated)
+
+        # 原图更新后重新生成
+        Image.new('RGBA', (64, 64)).save(self.source, 'PNG')
+        os.utime(self.source, ns=(generated + 10 ** 9, generated + 10 ** 9))
+        thumbnails.get_variant_path(self.name, 64, 'webp')
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (64, 64))
+
+    def test_invalid_requests(self):
+        with open(os.path.join(self.media_root, 'logos', 'broken.png'), 'wb') as f:
+            f.write(b'not an image')
+        thumbnails.get_variant_path(self.name, 32, 'png')
+        for url in (
+            '/media/thumbs/48/logos/logo%20%231%3F.png.webp',    # 不支持的尺寸
+            '/media/thumbs/64/logos/logo%20%231%3F.png.gif',     # 不支持的格式
+            '/media/thumbs/64/logos/missing.png.webp',           # 原图不存在
+            '/media/thumbs/64/logos/broken.png.webp',            # 无法解码
+            '/media/thumbs/64/thumbs/32/logos/logo%20%231%3F.png.png.webp',  # 缩略图的缩略图
+            '/media/thumbs/64/..%2F..%2Fsecret.png.webp',        # 目录穿越
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url)[0].status_code, 404)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'thumbs', '48')))
+
+
+class BlobStorageTests(TempMediaRootMixin, TestCase):
+    """内容寻址存储：相同内容只保存一份，没有引用时才释放，gc_blobs 只回收孤立文件"""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='工具', slug='tools')
+
+    def png(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue(), name='logo.PNG')
+
+    def blob_path(self, name):
+        return os.path.join(self.media_root, name)
+
+    def test_dedup(self):
+        content = self.png('red')
+        digest = hashlib.sha256(content.read()).hexdigest()
+        first = blob_storage.save('logos/a.PNG', self.png('red'))
+        self.assertEqual(first, f'blobs/{digest[:2]}/{digest}.png')
+        self.assertEqual(blob_storage.save('logos/b.png', self.png('red')), first)
+        self.assertEqual(os.listdir(os.path.dirname(self.blob_path(first))), [f'{digest}.png'])
+        self.assertNotEqual(blob_storage.save('logos/c.png', self.png('blue')), first)
+
+    def test_release_only_when_unreferenced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Application.objects.create(name='一', category=self.category, logo=self.png('red'))
+            second = Application.objects.create(name='二', category=self.category, logo=self.png('red'))
+        name = first.logo.name
+        self.assertEqual(second.logo.name, name)
+        thumbnail = thumbnails.get_variant_path(name, 32, 'png')
+
+        # 仍被另一个应用引用时不删除
+        with self.captureOnCommitCallbacks(execute=True):
+            first.logo = self.png('blue')
+            first.save()
+        self.assertTrue(os.path.exists(self.blob_path(name)))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(release_blobs([name]), [])
+        # 只查询要释放的文件名的引用，不统计全部文件
+        self.assertTrue(all(' IN (' in query['sql'] for query in queries.captured_queries))
+
+        # 最后一个引用删除后，文件和缩略图在事务提交后删除
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(self.blob_path(name)))
+        self.assertFalse(os.path.exists(thumbnail))
+        self.assertTrue(os.path.exists(self.blob_path(first.logo.name)))
+        self.assertEqual(blob_references(), Counter({first.logo.name: 1}))
+
+    def test_gc_blobs(self):
+        app = Application.objects.create(name='一', category=self.category, logo=self.png('red'))
+        orphan = blob_storage.save('logos/orphan.png', self.png('green'))
+        recent = blob_storage.save('logos/recent.png', self.png('blue'))
+        old = time.time() - 7200
+        for name in (app.logo.name, orphan):
+            os.utime(self.blob_path(name), (old, old))
+
+        out = StringIO()
+        call_command('gc_blobs', '--dry-run', stdout=out)
+        self.assertIn(orphan, out.getvalue())
+        self.assertTrue(os.path.exists(self.blob_path(orphan)))
+
+        # 被引用的文件和宽限期内写入的文件都保留
+        call_command('gc_blobs', stdout=StringIO())
+        self.assertFalse(os.path.exists(self.blob_path(orphan)))
+        self.assertTrue(os.path.exists(self.blob_path(app.logo.name)))
+        self.assertTrue(os.path.exists(self.blob_path(recent)))
+
+
+class InstallerManifestTests(TempMediaRootMixin, TestCase):
+    """安装包清单：上传保存时计算，下载来源变化时清空，rehash_installers 只在修改时间或大小变化时重算"""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='工具', slug='tools')
+
+    def write(self, name, content):
+        path = os.path.join(self.media_root, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def rehash(self):
+        out = StringIO()
+        call_command('rehash_installers', stdout=out)
+        return out.getvalue()
+
+    def test_manifest_computed_on_upload(self):
+        app = Application.objects.create(
+            name='上传', category=self.category, download_type=AppChoices.UPLOADED_FILE,
+            uploaded_file=ContentFile(b'installer', name='setup.exe'),
+        )
+        app.refresh_from_db()
+        self.assertEqual(app.file_sha256, hashlib.sha256(b'installer').hexdigest())
+        self.assertEqual(app.file_size, 9)
+        self.assertIsNotNone(app.file_hashed_at)
+
+        # 与下载来源无关的修改保留清单
+        app.name = '改名'
+        app.save()
+        app.refresh_from_db()
+        self.assertEqual(app.file_size, 9)
+
+    def test_manifest_cleared_when_source_changes(self):
+        self.write('a.exe', b'aaa')
+        self.write('b.exe', b'bbbb')
+        app = Application.objects.create(
+            name='服务器文件', category=self.category, download_type=AppChoices.SERVER_PATH, server_file_path='a.exe',
+        )
+        self.assertEqual(app.file_sha256, '')
+        self.rehash()
+        app = Application.objects.get(pk=app.pk)
+        self.assertEqual(app.file_size, 3)
+
+        app.server_file_path = 'b.exe'
+        app.save()
+        app.refresh_from_db()
+        self.assertEqual((app.file_sha256, app.file_size, app.file_mtime), ('', None, None))
+        self.rehash()
+        self.assertEqual(Application.objects.get(pk=app.pk).file_sha256, hashlib.sha256(b'bbbb').hexdigest())
+
+    def test_rehash_only_changed_files(self):
+        path = self.write('tool.exe', b'12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            app = Application.objects.create(
+                name='工具', category=self.category, download_type=AppChoices.SERVER_PATH, server_file_path='tool.exe',
+            )
+        revision = catalog.get_revision()
+
+        # 清单变化记录为目录变更，API 快照随之失效
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIn('重新计算 1 个', self.rehash())
+        hashed_at = Application.objects.get(pk=app.pk).file_hashed_at
+        self.assertGreater(catalog.get_revision(), revision)
+
+        # 修改时间和大小都没变化时不读取文件
+        self.assertEqual(self.rehash(), '')
+        self.assertEqual(Application.objects.get(pk=app.pk).file_hashed_at, hashed_at)
+
+        # 大小不变、修改时间变化
+        self.write('tool.exe', b'54321')
+        stat_result = os.stat(path)
+        os.utime(path, (stat_result.st_atime, stat_result.st_mtime + 10))
+        self.assertIn('重新计算 1 个', self.rehash())
+        self.assertEqual(Application.objects.get(pk=app.pk).file_sha256, hashlib.sha256(b'54321').hexdigest())
+
+        # 大小变化 (修改时间恰好相同)
+        mtime = os.stat(path).st_mtime
+        self.write('tool.exe', b'123456')
+        os.utime(path, (mtime, mtime))
+        self.assertIn('重新计算 1 个', self.rehash())
+        self.assertEqual(Application.objects.get(pk=app.pk).file_size, 6)
+
+        # 文件不存在时清除清单
+        os.remove(path)
+        self.assertIn('清除失效清单 1 个', self.rehash())
+        self.assertEqual(Application.objects.get(pk=app.pk).file_sha256, '')
+
+    def test_reuse_indexed_hash(self):
+        path = self.write('tool.exe', b'12345')
+        app = Application.objects.create(
+            name='工具', category=self.category, download_type=AppChoices.SERVER_PATH, server_file_path='tool.exe',
+        )
+        # 服务器文件索引中已有大小和修改时间一致的哈希时直接沿用，不读取文件
+        stat_result = os.stat(path)
+        ServerFile.objects.create(
+            root=self.media_root, name='tool.exe', size=5, mtime=stat_result.st_mtime, sha256='f' * 64,
+        )
+        self.assertNotIn('计算 工具', self.rehash())
+        app.refresh_from_db()
+        self.assertEqual((app.file_sha256, app.file_size, app.file_mtime), ('f' * 64, 5, stat_result.st_mtime))
+
+        # 文件在检查存在之后、读取状态之前被删除
+        Application.objects.filter(pk=app.pk).update(file_mtime=None)
+        os.remove(path)
+        with mock.patch.object(Application, 'installer_path', return_value=path):
+            self.assertIn('清除失效清单 1 个', self.rehash())
+        self.assertEqual(Application.objects.get(pk=app.pk).file_sha256, '')
+
+
+class ChunkedUploadTests(TempMediaRootMixin, TestCase):
+    """分片上传：按偏移量续传，完成后组装并计算 SHA-256"""
+
+    def setUp(self):
+        super().setUp()
+        self.upload_dir = self.temp_dir()
+        self.use_settings(CHUNKED_UPLOAD_TEMP_DIR=self.upload_dir)
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def put_chunk(self, upload_id, offset, data):
+        return self.client.put(
+            f'/admin/core/uploads/{upload_id}/', data,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_resume_and_assemble(self):
+        content = os.urandom(3000)
+        created = self.client.post('/admin/core/uploads/', {'filename': 'setup.exe', 'size': len(content)})
+        self.assertEqual(created.status_code, 201)
+        upload_id = created.json()['id']
+
+        self.assertEqual(self.put_chunk(upload_id, 0, content[:1000]).json()['offset'], 1000)
+        # 偏移量不一致时返回 409 和服务器记录的偏移量
+        conflict = self.put_chunk(upload_id, 2000, content[2000:])
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.json()['offset'], 1000)
+
+        # 重新创建同名同大小的会话时从中断处继续
+        resumed = self.client.post('/admin/core/uploads/', {'filename': 'setup.exe', 'size': len(content)})
+        self.assertEqual(resumed.json()['id'], upload_id)
+        self.assertEqual(resumed.json()['offset'], 1000)
+
+        done = self.put_chunk(upload_id, 1000, content[1000:]).json()
+        self.assertEqual(done['status'], UploadSession.STATUS_COMPLETE)
+        self.assertEqual(done['sha256'], hashlib.sha256(content).hexdigest())
+        with open(os.path.join(self.media_root, done['name']), 'rb') as f:
+            self.assertEqual(f.read(), content)
+        files = self.client.get('/admin/core/uploaded-files/').json()['files']
+        self.assertEqual(files[0]['path'], 'uploads/setup.exe')
+        self.assertEqual(files[0]['sha256'], done['sha256'])
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_other_users_sessions_are_hidden(self):
+        upload_id = self.client.post('/admin/core/uploads/', {'filename': 'setup.exe', 'size': 10}).json()['id']
+        # 未完成的文件不在 MEDIA_ROOT 中，无法通过 /media/ 访问
+        self.assertEqual(os.listdir(self.upload_dir), [f'{upload_id}.part'])
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'uploads')))
+
+        other = get_user_model().objects.create_user('editor', 'editor@example.com', 'password', is_staff=True)
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(f'/admin/core/uploads/{upload_id}/').status_code, 404)
+        self.assertEqual(self.put_chunk(upload_id, 0, b'x' * 10).status_code, 404)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).offset, 0)
+
+    def test_admin_links_only_own_completed_upload(self):
+        upload_id = self.client.post('/admin/core/uploads/', {'filename': 'setup.exe', 'size': 10}).json()['id']
+        self.put_chunk(upload_id, 0, b'a' * 10)
+        category = Category.objects.create(name='工具', slug='tools')
+        form = {
+            'name': '安装包', 'category': category.pk, 'install_method': AppChoices.MANUAL,
+            'download_type': AppChoices.UPLOADED_FILE, 'order': 0, 'chunked_upload_id': upload_id,
+        }
+
+        other = get_user_model().objects.create_superuser('editor', 'editor@example.com', 'password')
+        self.client.force_login(other)
+        self.assertEqual(self.client.post('/admin/core/application/add/', form).status_code, 302)
+        app = Application.objects.get()
+        self.assertFalse(app.uploaded_file)
+        self.assertEqual(app.file_sha256, '')
+
+        self.client.force_login(UploadSession.objects.get(pk=upload_id).created_by)
+        self.client.post(f'/admin/core/application/{app.pk}/change/', form)
+        app.refresh_from_db()
+        self.assertEqual(app.uploaded_file.name, UploadSession.objects.get(pk=upload_id).final_name)
+        self.assertEqual(app.file_sha256, hashlib.sha256(b'a' * 10).hexdigest())
+
+    def test_concurrent_write_at_same_offset(self):
+        upload_id = self.client.post('/admin/core/uploads/', {'filename': 'setup.exe', 'size': 10}).json()['id']
+        # 模拟另一个请求已经占用会话、正在写入偏移量 0 处的数据块
+        UploadSession.objects.filter(pk=upload_id).update(status=UploadSession.STATUS_RECEIVING)
+        conflict = self.put_chunk(upload_id, 0, b'b' * 10)
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.json()['offset'], 0)
+        with open(os.path.join(self.upload_dir, f'{upload_id}.part'), 'rb') as f:
+            self.assertEqual(f.read(), b'')
+
+        # 占用超时 (写入的进程已经退出) 后可以重新写入
+        stale = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_WRITE_TIMEOUT + 1)
+        UploadSession.objects.filter(pk=upload_id).update(updated_at=stale)
+        done = self.put_chunk(upload_id, 0, b'a' * 10).json()
+        self.assertEqual(done['status'], UploadSession.STATUS_COMPLETE)
+        self.assertEqual(done['sha256'], hashlib.sha256(b'a' * 10).hexdigest())
+
+
+class ServerFileIndexTests(TempMediaRootMixin, TestCase):
+    """服务器文件索引：按 mtime 增量刷新，分页、前缀搜索和排序"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.server_dir = self.temp_dir()
+        os.makedirs(os.path.join(self.media_root, 'uploads'))
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def write(self, directory, name, size):
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(b'x' * size)
+
+    def test_incremental_refresh(self):
+        uploads = os.path.join(self.media_root, 'uploads')
+        for i in range(3):
+            self.write(uploads, f'app-{i}.exe', 10 + i)
+        self.write(self.server_dir, 'tool.msi', 5)
+        category = Category.objects.create(name='tools', slug='tools')
+        Application.objects.create(
+            name='tool', category=category, download_type=AppChoices.SERVER_PATH,
+            server_file_path=os.path.join(self.server_dir, 'tool.msi'),
+        )
+
+        report = fileindex.refresh_index()
+        self.assertEqual(report[fileindex.upload_root()], (3, 0, 0))
+        self.assertEqual(report[self.server_dir], (1, 0, 0))
+        self.assertEqual(fileindex.hash_pending(), 4)
+
+        # 未变化的文件不会被重写，改动的文件清空哈希，删除的文件移出索引
+        self.write(uploads, 'app-0.exe', 100)
+        os.remove(os.path.join(uploads, 'app-1.exe'))
+        report = fileindex.refresh_index()
+        self.assertEqual(report[fileindex.upload_root()], (0, 1, 1))
+        self.assertEqual(ServerFile.objects.get(name='app-0.exe').sha256, '')
+        self.assertNotEqual(ServerFile.objects.get(name='app-2.exe').sha256, '')
+
+    def test_warm_refresh_skips_queries(self):
+        self.write(os.path.join(self.media_root, 'uploads'), 'app.exe', 10)
+        self.assertEqual(fileindex.refresh_index(max_age=60), {fileindex.upload_root(): (1, 0, 0)})
+        # 缓存未过期时不计算目录列表，也不清理旧目录的记录
+        with self.assertNumQueries(0):
+            self.assertEqual(fileindex.refresh_index(max_age=60), {})
+        # max_age=0 (index_server_files 命令) 总是刷新
+        self.assertEqual(fileindex.refresh_index(), {fileindex.upload_root(): (0, 0, 0)})
+
+    def test_api_pagination_prefix_and_sort(self):
+        uploads = os.path.join(self.media_root, 'uploads')
+        for i in range(5):
+            self.write(uploads, f'setup-{i}.exe', i + 1)
+        self.write(uploads, 'other.zip', 100)
+
+        data = self.client.get('/admin/core/uploaded-files/', {'q': 'SETUP', 'page_size': 2}).json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(data['num_pages'], 3)
+        self.assertTrue(data['has_next'])
+        self.assertEqual([f['path'] for f in data['files']], ['uploads/setup-0.exe', 'uploads/setup-1.exe'])
+
+        data = self.client.get('/admin/core/uploaded-files/', {'sort': '-size', 'page_size': 1}).json()
+        self.assertEqual(data['files'][0]['name'], 'other.zip')
+
+        self.assertEqual(self.client.get('/admin/core/uploaded-files/', {'sort': 'sha256'}).status_code, 400)
+
+
+class ApplicationSearchTests(TestCase):
+    """应用搜索：中文片段、英文前缀、相关度排序，FTS5 与内存索引结果一致"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='工具', slug='tools')
+        for name, description in (
+            ('微信', '聊天和社交工具'),
+            ('企业微信', '办公沟通'),
+            ('Visual Studio Code', '代码编辑器'),
+            ('Notepad++', '文本编辑器，支持微信公众号排版插件'),
+        ):
+            # 索引在目录变更提交后更新
+            with self.captureOnCommitCallbacks(execute=True):
+                Application.objects.create(name=name, short_description=description, category=category)
+
+    def names(self, query):
+        apps = Application.objects.in_bulk(search.search_ids(query))
+        return [apps[pk].name for pk in search.search_ids(query)]
+
+    def test_backends(self):
+        for backend in ('memory', 'auto'):
+            with self.subTest(backend=backend), override_settings(SEARCH_BACKEND=backend):
+                # 名称命中排在简介命中之前
+                self.assertEqual(self.names('微信')[-1], 'Notepad++')
+                self.assertEqual(set(self.names('微信')), {'微信', '企业微信', 'Notepad++'})
+                self.assertEqual(self.names('企业微'), ['企业微信'])
+                self.assertEqual(self.names('visu cod'), ['Visual Studio Code'])
+                self.assertEqual(set(self.names('编辑器')), {'Visual Studio Code', 'Notepad++'})
+                self.assertEqual(self.names('不存在'), [])
+                # 名称的拼音全拼、首字母和音节前缀 (简介不生成拼音词元)
+                self.assertEqual(self.names('weixin'), ['微信'])
+                self.assertEqual(self.names('wx'), ['微信'])
+                self.assertEqual(self.names('qywx'), ['企业微信'])
+                self.assertEqual(self.names('qiye'), ['企业微信'])
+
+    def test_index_follows_catalog_changes(self):
+        for backend in ('memory', 'auto'):
+            with self.subTest(backend=backend), override_settings(SEARCH_BACKEND=backend):
+                self.assertEqual(self.names('firefox'), [])
+                with self.captureOnCommitCallbacks(execute=True):
+                    firefox = Application.objects.create(
+                        name='Firefox', category=Category.objects.get(), short_description='',
+                    )
+                self.assertEqual(self.names('fire'), ['Firefox'])
+                with self.captureOnCommitCallbacks(execute=True):
+                    firefox.name = '火狐浏览器'
+                    firefox.save()
+                self.assertEqual(self.names('fire'), [])
+                self.assertEqual(self.names('huohu'), ['火狐浏览器'])
+                with self.captureOnCommitCallbacks(execute=True):
+                    firefox.delete()
+                self.assertEqual(self.names('huohu'), [])
+
+    def test_memory_index_incremental_update(self):
+        index = search.MemoryIndex(search._documents())
+        before = {token: dict(scores) for token, scores in index.postings.items()}
+        wechat, notepad = (Application.objects.get(name=name).pk for name in ('微信', 'Notepad++'))
+        Application.objects.filter(pk=wechat).update(name='Firefox', short_description='浏览器')
+        Application.objects.filter(pk=notepad).delete()
+
+        updated = index.updated({wechat}, {notepad})
+        # 与整体重建的结果一致，旧索引不受影响 (其他线程仍可在旧索引上搜索)
+        rebuilt = search.MemoryIndex(search._documents())
+        self.assertEqual(updated.documents, rebuilt.documents)
+        self.assertEqual(updated.postings, rebuilt.postings)
+        self.assertEqual(updated.ascii_tokens, rebuilt.ascii_tokens)
+        self.assertEqual(index.postings, before)
+        self.assertIn('wx', index.ascii_tokens)
+        self.assertNotIn('wx', updated.ascii_tokens)
+        # 未涉及的词元共用原来的倒排表
+        self.assertIs(updated.postings['代码'], index.postings['代码'])
+
+    def test_search_does_not_write_index(self):
+        self.assertTrue(search.Fts5Index.available())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names('wx'), ['微信'])
+        statements = [query['sql'].split(None, 1)[0].upper() for query in queries]
+        self.assertTrue(set(statements) <= {'SELECT'}, statements)
+
+        # 绕过变更日志写入的数据在重建索引后才能搜到
+        Application.objects.filter(name='微信').update(name='QQ')
+        self.assertEqual(self.names('wx'), ['QQ'])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.names('wx'), [])
+        self.assertEqual(self.names('qq'), ['QQ'])
+
+    def test_admin_search_is_bounded(self):
+        model_admin = admin.site._registry[Application]
+        with override_settings(SEARCH_ADMIN_MAX_RESULTS=1):
+            queryset, _ = model_admin.get_search_results(None, Application.objects.all(), '编辑器')
+        self.assertEqual(list(queryset.values_list('name', flat=True)), ['Visual Studio Code'])
+
+    def test_api(self):
+        response = self.client.get('/api/v1/applications/search/', {'q': 'code', 'format': 'json'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(response.json()['results'][0]['name'], 'Visual Studio Code')
+        self.assertEqual(self.client.get('/api/v1/applications/search/').status_code, 400)
+
+
+class CatalogSnapshotTests(TestCase):
+    """列表快照：ETag 稳定、If-None-Match 返回 304、任何目录数据保存都令快照失效、带参数的请求不走快照"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='工具', slug='tools')
+        self.app = Application.objects.create(name='编辑器', category=self.category)
+        self.navigation = WebsiteNavigation.objects.create(name='示例', url='https://example.com/')
+
+    def etag(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_etag_is_stable_and_revalidates(self):
+        for path in ('/api/v1/applications/', '/api/v1/navigation/'):
+            with self.subTest(path=path):
+                etag = self.etag(path)
+                self.assertEqual(self.etag(path), etag)
+                with self.assertNumQueries(0):
+                    response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_any_catalog_save_changes_etag(self):
+        # ETag 是快照内容的哈希：保存后快照按新版本号重建，内容变化则 ETag 变化
+        cases = (
+            (self.app, 'name', '/api/v1/applications/'),
+            (self.category, 'name', '/api/v1/applications/'),  # 分类名称出现在应用列表中
+            (self.navigation, 'name', '/api/v1/navigation/'),
+        )
+        for obj, field, path in cases:
+            with self.subTest(model=type(obj).__name__):
+                etag = self.etag(path)
+                setattr(obj, field, getattr(obj, field) + ' v2')
+                with self.captureOnCommitCallbacks(execute=True):
+                    obj.save()
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_query_parameters_bypass_snapshot(self):
+        self.etag('/api/v1/applications/')
+        # 在快照不知情的情况下改名 (update 不触发信号)，带参数的请求仍读到数据库中的最新数据
+        Application.objects.filter(pk=self.app.pk).update(name='新名称')
+        self.assertEqual(self.client.get('/api/v1/applications/').json()[0]['name'], '编辑器')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/applications/', {'fields': 'id,name'})
+        self.assertGreater(len(queries), 0)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(response.json(), [{'id': self.app.pk, 'name': '新名称'}])
+
+
+class IndexViewTests(TestCase):
+    """首页：整页 HTML 按目录版本号缓存，命中时不访问数据库，目录数据保存后重新渲染"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='工具', slug='tools')
+        self.app = Application.objects.create(name='编辑器', category=self.category)
+
+    def page(self, **headers):
+        response = self.client.get('/', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        return response
+
+    def test_warm_cache_serves_without_queries(self):
+        first = self.page()
+        self.assertContains(first, '编辑器')
+        with self.assertNumQueries(0):
+            second = self.page()
+            compressed = self.page(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), first.content)
+
+    def test_catalog_save_invalidates(self):
+        self.page()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.app.name = '新编辑器'
+            self.app.save()
+        self.assertContains(self.page(), '新编辑器')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = '工具箱'
+            self.category.save()
+        self.assertContains(self.page(), '工具箱')
+        with self.assertNumQueries(0):
+            self.assertContains(self.page(), '工具箱')
+
+
+class CatalogChangesTests(TestCase):
+    """增量同步接口：新增/修改、墓碑、删除后重建、按时间同步，以及变更日志清理后的 full_resync"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='工具', slug='tools')
+        self.app = Application.objects.create(name='编辑器', category=self.category)
+        self.revision = catalog.get_revision()
+
+    def changes(self, **params):
+        response = self.client.get('/api/v1/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_upserts_and_tombstones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.app.name = '新编辑器'
+            self.app.save()
+            navigation = WebsiteNavigation.objects.create(name='示例', url='https://example.com/')
+            removed = Application.objects.create(name='临时', category=self.category)
+            removed_pk = removed.pk
+            removed.delete()
+
+        data = self.changes(since=self.revision)
+        self.assertFalse(data['full_resync'])
+        self.assertEqual(data['revision'], catalog.get_revision())
+        self.assertEqual([app['name'] for app in data['applications']], ['新编辑器'])
+        self.assertEqual([item['id'] for item in data['navigation']], [navigation.pk])
+        self.assertEqual(data['categories'], [])
+        self.assertEqual(data['deleted'], {'applications': [removed_pk], 'categories': [], 'navigation': []})
+
+        with self.assertNumQueries(0):
+            data = self.changes(since=data['revision'])
+        self.assertEqual(data['applications'], [])
+
+    def test_delete_then_recreate_is_upsert(self):
+        pk = self.app.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.app.delete()
+            Application.objects.create(pk=pk, name='重建', category=self.category)
+        data = self.changes(since=self.revision)
+        self.assertEqual([app['id'] for app in data['applications']], [pk])
+        self.assertEqual(data['deleted']['applications'], [])
+
+        # 反过来：修改后再删除只返回墓碑
+        revision = data['revision']
+        with self.captureOnCommitCallbacks(execute=True):
+            app = Application.objects.get(pk=pk)
+            app.name = '又改名'
+            app.save()
+            app.delete()
+        data = self.changes(since=revision)
+        self.assertEqual(data['applications'], [])
+        self.assertEqual(data['deleted']['applications'], [pk])
+
+    def test_since_time(self):
+        since = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = '工具箱'
+            self.category.save()
+            removed_pk = self.app.pk
+            self.app.delete()
+        data = self.changes(since_time=since.isoformat())
+        self.assertEqual([item['name'] for item in data['categories']], ['工具箱'])
+        self.assertEqual(data['deleted']['applications'], [removed_pk])
+
+        # 不带时区的时间按服务器时区解释 (不以 naive 时间查询数据库)
+        local_since = timezone.localtime(since).replace(tzinfo=None)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            self.assertEqual(self.changes(since_time=local_since.isoformat()), data)
+        future = timezone.localtime(timezone.now() + timedelta(hours=1)).replace(tzinfo=None)
+        self.assertEqual(self.changes(since_time=future.isoformat())['categories'], [])
+
+        for value in ('yesterday', '2024-13-01T00:00:00'):
+            with self.subTest(since_time=value):
+                self.assertEqual(self.client.get('/api/v1/changes/', {'since_time': value}).status_code, 400)
+
+    def test_prune_requires_full_resync(self):
+        for index in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                Application.objects.create(name=f'应用{index}', category=self.category)
+        revision = catalog.get_revision()
+
+        out = StringIO()
+        call_command('prune_catalog_changes', keep=2, stdout=out)
+        self.assertFalse(CatalogChange.objects.filter(revision__lte=revision - 2).exists())
+        self.assertEqual(CatalogChange.objects.count(), 2)
+        self.assertEqual(catalog.get_change_log_start()[0], revision - 2)
+        # 重复执行不再删除
+        self.assertEqual(catalog.prune_changes(2), 0)
+
+        data = self.changes(since=self.revision)
+        self.assertTrue(data['full_resync'])
+        self.assertEqual(data['applications'], [])
+        self.assertEqual(data['revision'], revision)
+        self.assertTrue(self.changes(since_time='2000-01-01T00:00:00')['full_resync'])
+
+        data = self.changes(since=revision - 2)
+        self.assertFalse(data['full_resync'])
+        self.assertEqual([app['name'] for app in data['applications']], ['应用1', '应用2'])
+
+
+class ApplicationListParamsTests(TestCase):
+    """应用列表：按需游标分页、字段选择和过滤"""
+
+    def setUp(self):
+        cache.clear()
+        for i in range(3):
+            category = Category.objects.create(name=f'cat-{i}', slug=f'cat-{i}', order=3 - i)
+            for j in range(4):
+                Application.objects.create(
+                    name=f'app-{i}-{j}', category=category, order=j,
+                    is_recommended=(j == 0), install_method=AppChoices.SILENT if j % 2 else AppChoices.MANUAL,
+                )
+
+    def get(self, **params):
+        response = self.client.get('/api/v1/applications/', dict(params, format='json'))
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_cursor_pagination_walks_catalog_order(self):
+        full = [app['id'] for app in self.get()]
+        self.assertEqual(len(full), 12)
+
+        seen, params = [], {'page_size': 5}
+        while True:
+            page = self.get(**params)
+            self.assertLessEqual(len(page['results']), 5)
+            seen += [app['id'] for app in page['results']]
+            if not page['cursor']:
+                break
+            params = {'page_size': 5, 'cursor': page['cursor']}
+        self.assertEqual(seen, full)
+
+    def test_full_list_and_pages_share_ordering(self):
+        # 分类排序相同、创建时间与 ID 顺序相反，应用排序也相同且名称与 ID 顺序相反：按分类 ID、应用 ID 决定先后
+        first = Category.objects.create(name='same-a', slug='same-a', order=0)
+        second = Category.objects.create(name='same-b', slug='same-b', order=0)
+        Category.objects.filter(pk=second.pk).update(created_at=first.created_at - timedelta(days=1))
+        for category in (second, first):
+            for name in ('y', 'x'):
+                Application.objects.create(name=f'{category.slug}-{name}', category=category, order=0)
+        cache.clear()
+
+        expected = list(Application.objects.order_by('category__order', 'category_id', 'order', 'id')
+                        .values_list('id', flat=True))
+        self.assertEqual([app['id'] for app in self.get()], expected)
+        page = self.get(page_size=20)
+        self.assertEqual([app['id'] for app in page['results']], expected)
+
+        # 首页按同一顺序分组渲染
+        grouped = [app.pk for category, apps in catalog.build_grouped_catalog() for app in apps]
+        self.assertEqual(grouped, expected)
+        html = self.client.get('/').content.decode()
+        names = Application.objects.in_bulk(expected)
+        positions = [html.index(f'<h3>{names[pk].name} (v') for pk in expected]
+        self.assertEqual(positions, sorted(positions))
+
+        # 批量导出 (export_catalog_data) 也使用同一顺序
+        self.assertEqual([record['name'] for record in bulk.export_records()], [names[pk].name for pk in expected])
+
+    def test_fields_and_filters(self):
+        apps = self.get(fields='id,name', is_recommended='true', category='cat-1')
+        self.assertEqual(apps, [{'id': apps[0]['id'], 'name': 'app-1-0'}])
+        self.assertEqual(len(self.get(install_method=AppChoices.SILENT)), 6)
+
+        self.assertEqual(self.client.get('/api/v1/applications/', {'fields': 'secret'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/applications/', {'download_type': 'FTP'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/applications/', {'cursor': 'bad'}).status_code, 404)
+
+
+class ApplicationRowSerializerTests(TestCase):
+    """ApplicationRowSerializer 的输出必须与 ApplicationSerializer 逐字节一致"""
+
+    def setUp(self):
+        category = Category.objects.create(name='办公 & 工具', slug='office')
+        samples = [
+            dict(name='空字段', version=None, short_description=None, external_link=None, server_file_path=None),
+            dict(name='Logo 应用', version='1.0', logo='blobs/ab/' + 'ab' * 32 + '.png',
+                 download_type=AppChoices.EXTERNAL_LINK, external_link='https://example.com/a?b=1'),
+            dict(name='旧 Logo', logo='logos/我的 logo #1.png', install_method=AppChoices.SILENT,
+                 uploaded_file='uploads/安装包 v2 (x64).exe'),
+            dict(name='服务器文件', download_type=AppChoices.SERVER_PATH, server_file_path='D:\\软件\\setup.exe'),
+        ]
+        for i, fields in enumerate(samples):
+            app = Application.objects.create(category=category, order=i, **fields)
+        Application.objects.filter(pk=app.pk).update(file_size=12345, file_sha256='f' * 64)
+        self.request = RequestFactory().get('/api/v1/applications/')
+
+    def render_both(self, request, fields=None):
+        queryset = Application.objects.select_related('category').order_by('category', 'order')
+        context = {'request': request, 'fields': fields}
+        expected = JSONRenderer().render(ApplicationSerializer(queryset, many=True, context=context).data)
+        row_serializer = ApplicationRowSerializer(request, fields=fields)
+        actual = JSONRenderer().render(row_serializer.many(queryset.values(*row_serializer.values_fields)))
+        return expected, actual
+
+    def test_output_is_identical(self):
+        for request in (self.request, None):
+            for fields in (None, ['id', 'logo_variants', 'uploaded_file_url', 'download_type']):
+                with self.subTest(request=request, fields=fields):
+                    expected, actual = self.render_both(request, fields)
+                    self.assertEqual(actual, expected)
+
+    def test_list_api_matches_serializer(self):
+        cache.clear()
+        response = self.client.get('/api/v1/applications/', {'format': 'json'})
+        expected, actual = self.render_both(response.wsgi_request)
+        self.assertEqual(response.content, expected)
+
+
+class CompressionTests(TestCase):
+    """目录快照返回预先压缩的版本，其他 JSON 响应即时压缩"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='工具', slug='tools')
+        for i in range(20):
+            Application.objects.create(name=f'app-{i}', category=category, short_description='压缩测试' * 5)
+
+    def test_snapshot_variants(self):
+        plain = self.client.get('/api/v1/applications/', {'format': 'json'})
+        compressed = self.client.get('/api/v1/applications/', {'format': 'json'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+
+        # 压缩版本有自己的 ETag，用它做条件请求返回 304
+        not_modified = self.client.get(
+            '/api/v1/applications/', {'format': 'json'},
+            HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'],
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+        refused = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        self.assertEqual(self.client.get('/', HTTP_ACCEPT_ENCODING='*')['Content-Encoding'], 'gzip'
+                         if 'br' not in compression.ENCODINGS else 'br')
+
+    def test_dynamic_responses(self):
+        params = {'format': 'json', 'page_size': 20}
+        plain = self.client.get('/api/v1/applications/', params)
+        compressed = self.client.get('/api/v1/applications/', params, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+
+
+class ExportCatalogCommandTests(TempMediaRootMixin, TestCase):
+    """静态目录导出：内容哈希文件名、缩略图、增量导出"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.output_dir = self.temp_dir()
+
+        buffer = BytesIO()
+        Image.new('RGB', (200, 200), 'red').save(buffer, 'PNG')
+        self.category = Category.objects.create(name='工具', slug='tools')
+        with self.captureOnCommitCallbacks(execute=True):
+            app = Application(name='带 Logo', category=self.category)
+            app.logo.save('logo.png', ContentFile(buffer.getvalue()), save=False)
+            app.save()
+            Application.objects.create(name='无 Logo', category=self.category)
+            WebsiteNavigation.objects.create(name='示例', url='https://example.com/')
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_catalog', self.output_dir, '--base-url', 'https://cdn.example.com/catalog',
+                     *args, stdout=out)
+        with open(os.path.join(self.output_dir, 'manifest.json'), 'rb') as f:
+            manifest = json.load(f)
+        return out.getvalue(), manifest
+
+    def read(self, url):
+        path = url.replace('https://cdn.example.com/catalog/', '')
+        with open(os.path.join(self.output_dir, path), 'rb') as f:
+            return json.load(f)
+
+    def test_export_and_incremental_update(self):
+        output, manifest = self.export()
+        apps = self.read(manifest['files']['applications'])
+        self.assertEqual([app['name'] for app in apps], ['带 Logo', '无 Logo'])
+        logo_url = apps[0]['logo_url']
+        self.assertTrue(logo_url.startswith('https://cdn.example.com/catalog/assets/'))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, logo_url.split('/catalog/')[1])))
+        self.assertIn('.webp', apps[0]['logo_variants']['64']['webp'])
+        navigation = self.read(manifest['files']['navigation'])
+        self.assertEqual(navigation[0]['name'], '示例')
+        self.assertEqual((navigation[0]['favicon_url'], navigation[0]['favicon_variants']), (None, None))
+
+        output, unchanged = self.export()
+        self.assertIn('未变化', output)
+        self.assertEqual(unchanged, manifest)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Application.objects.filter(name='无 Logo').get().delete()
+        output, updated = self.export()
+        self.assertEqual(updated['revision'], manifest['revision'] + 1)
+        self.assertEqual([app['name'] for app in self.read(updated['files']['applications'])], ['带 Logo'])
+        # 导航未变化，沿用同一个文件
+        self.assertEqual(updated['files']['navigation'], manifest['files']['navigation'])
+
+    def test_full_export_after_change_log_pruned(self):
+        self.export()
+        with self.captureOnCommitCallbacks(execute=True):
+            app = Application.objects.get(name='无 Logo')
+            app.name = '已改名'
+            app.save()
+        # 上次导出之后的变更记录已被清理，不能再按增量导出
+        catalog.prune_changes(0)
+        output, manifest = self.export()
+        self.assertEqual([app['name'] for app in self.read(manifest['files']['applications'])], ['带 Logo', '已改名'])
+
+
+@override_settings(DOWNLOAD_EVENTS_FLUSH_INTERVAL=0)
+class DownloadAnalyticsTests(TempMediaRootMixin, TestCase):
+    """下载统计：事件先进入缓冲区，flush 时批量写入；区分完成、中断和外部跳转"""
+
+    def setUp(self):
+        super().setUp()
+        analytics.buffer.events.clear()
+
+        os.makedirs(os.path.join(self.media_root, 'uploads'))
+        self.content = os.urandom(300 * 1024)
+        with open(os.path.join(self.media_root, 'uploads', 'setup.exe'), 'wb') as f:
+            f.write(self.content)
+        category = Category.objects.create(name='工具', slug='tools')
+        self.app = Application.objects.create(name='安装包', category=category, uploaded_file='uploads/setup.exe')
+        self.link = Application.objects.create(
+            name='外部', category=category, download_type=AppChoices.EXTERNAL_LINK,
+            external_link='https://example.com/setup.exe',
+        )
+
+    def test_events_are_buffered_then_flushed(self):
+        response = self.client.get('/media/uploads/setup.exe')
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+        # 客户端中途断开：只读取了第一块就关闭响应
+        response = self.client.get('/media/uploads/setup.exe', HTTP_RANGE='bytes=100-')
+        next(iter(response.streaming_content))
+        response.close()
+
+        response = self.client.get(f'/download/external/{self.link.pk}/')
+        self.assertEqual(response['Location'], 'https://example.com/setup.exe')
+        self.client.head('/media/uploads/setup.exe')
+
+        # 下载过程中没有写库
+        self.assertFalse(DownloadEvent.objects.exists())
+        self.assertEqual(analytics.buffer.flush(), 3)
+
+        complete, aborted, redirect = DownloadEvent.objects.order_by('pk')
+        self.assertEqual((complete.status, complete.bytes_sent), (DownloadEvent.STATUS_COMPLETE, len(self.content)))
+        self.assertEqual(complete.application, self.app)
+        self.assertEqual(aborted.status, DownloadEvent.STATUS_ABORTED)
+        self.assertTrue(aborted.partial)
+        self.assertEqual(aborted.bytes_expected, len(self.content) - 100)
+        self.assertEqual((redirect.status, redirect.application), (DownloadEvent.STATUS_REDIRECT, self.link))
+
+    def test_admin_report(self):
+        self.client.get(f'/download/external/{self.link.pk}/')
+        analytics.buffer.flush()
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        response = self.client.get('/admin/core/downloadreport/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '外部')
+
+
+class MetricsTests(TempDirMixin, TestCase):
+    """/metrics：按视图统计请求耗时和查询数，并汇总指标目录中其他进程的数据"""
+
+    def setUp(self):
+        self.metrics_dir = self.temp_dir()
+        self.use_settings(METRICS_DIR=self.metrics_dir)
+        metrics.registry.counters.clear()
+        metrics.registry.histograms.clear()
+        cache.clear()
+        category = Category.objects.create(name='工具', slug='tools')
+        Application.objects.create(name='编辑器', category=category)
+
+    def test_metrics_are_aggregated_across_processes(self):
+        # 另一个 worker 进程写入的数据
+        with open(os.path.join(self.metrics_dir, '999999.json'), 'w') as f:
+            json.dump({'counters': [[
+                'appmanager_http_requests_total',
+                [['method', 'GET'], ['status', '200'], ['view', 'ApplicationViewSet']], 2,
+            ]], 'histograms': []}, f)
+
+        self.client.get('/api/v1/applications/')
+        self.client.get('/api/v1/applications/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+
+        self.assertIn('appmanager_http_requests_total{method="GET",status="200",view="ApplicationViewSet"} 4', body)
+        self.assertIn('appmanager_http_request_duration_seconds_count{view="ApplicationViewSet"} 2', body)
+        self.assertIn('appmanager_db_queries_per_request_bucket{view="ApplicationViewSet",le="+Inf"} 2', body)
+        # 第一次请求生成快照，第二次命中缓存
+        self.assertIn('appmanager_cache_requests_total{cache="snapshot",result="hit"} 1', body)
+        self.assertIn('appmanager_cache_requests_total{cache="snapshot",result="miss"} 1', body)
+        self.assertTrue(os.path.exists(os.path.join(self.metrics_dir, f'{os.getpid()}.json')))
+
+    async def test_queries_counted_under_asgi(self):
+        # ASGI 下视图的 ORM 查询在 sync_to_async 的线程中执行，仍应计入该请求
+        response = await self.async_client.get('/api/v1/applications/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        key = ('appmanager_db_queries_per_request', (('view', 'ApplicationViewSet'),))
+        data = metrics.registry.histograms[key]
+        self.assertEqual(data[-1], 1)
+        self.assertGreater(data[-2], 0)
+
+    def test_metrics_access_is_restricted(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(DOWNLOAD_EVENTS_FLUSH_INTERVAL=0)
+class AsyncServingTests(TempMediaRootMixin, TestCase):
+    """ASGI 模式：列表快照在异步视图中直接返回，下载使用异步文件流并可在客户端断开后停止"""
+
+    def setUp(self):
+        super().setUp()
+        analytics.buffer.events.clear()
+        cache.clear()
+
+        self.content = os.urandom(200 * 1024)
+        with open(os.path.join(self.media_root, 'tool.zip'), 'wb') as f:
+            f.write(self.content)
+        category = Category.objects.create(name='工具', slug='tools')
+        Application.objects.create(
+            name='工具包', category=category,
+            download_type=AppChoices.SERVER_PATH, server_file_path='tool.zip',
+        )
+
+    def test_cached_list_matches_viewset_response(self):
+        first = self.client.get('/api/v1/applications/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/v1/applications/')
+        self.assertEqual(second.content, first.content)
+        for header in ('Content-Type', 'ETag', 'Allow', 'Cache-Control'):
+            self.assertEqual(second[header], first[header])
+        # 快照不依赖会话，快速路径不读取 Cookie，因此没有 Vary: Cookie
+        self.assertEqual(second['Vary'], 'Accept-Encoding, Accept')
+        # 带参数的请求仍由视图集处理
+        self.assertEqual(len(self.client.get('/api/v1/applications/?fields=id,name').json()), 1)
+
+    async def test_async_download(self):
+        response = await self.async_client.get('/download/server-file/', {'path': 'tool.zip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(body, self.content)
+        response.close()
+        self.assertEqual(analytics.buffer.events[-1].status, DownloadEvent.STATUS_COMPLETE)
+
+    async def test_static_files_served_without_debug(self):
+        self.assertFalse(settings.DEBUG)
+        for path in ('/static/admin/css/base.css', '/static/admin/js/chunked_upload.js'):
+            with self.subTest(path=path):
+                communicator = ApplicationCommunicator(asgi_application, {
+                    'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': [],
+                })
+                await communicator.send_input({'type': 'http.request', 'body': b''})
+                start = await communicator.receive_output(timeout=5)
+                self.assertEqual(start['status'], 200)
+                body = b''
+                while True:
+                    message = await communicator.receive_output(timeout=5)
+                    body += message.get('body', b'')
+                    if not message.get('more_body'):
+                        break
+                self.assertGreater(len(body), 0)
+                await communicator.wait()
+
+    async def test_stream_stops_after_disconnect(self):
+        disconnected = asyncio.Event()
+        chunks = []
+        async for chunk in files._aiter_file_range(
+                os.path.join(self.media_root, 'tool.zip'), 0, len(self.content), disconnected):
+            chunks.append(chunk)
+            disconnected.set()
+        self.assertEqual(chunks, [self.content[:files.STREAM_CHUNK_SIZE]])
+
+
+class SQLitePragmaTests(TestCase):
+    """新建的 SQLite 连接按 SQLITE_PRAGMAS 设置"""
+
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['cache_size'])
+
+    def test_connections_not_persisted_by_default(self):
+        # ASGI 下每个请求在新线程中访问数据库，持久连接无法复用
+        self.assertEqual(settings.DATABASES['default']['CONN_MAX_AGE'], 0)
+
+
+class TieredCacheTests(TempDirMixin, TestCase):
+    """两级缓存：L1 按条目数/字节数淘汰，快照和版本号经共享缓存 (L2) 在进程间传递"""
+
+    def setUp(self):
+        self.use_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.temp_dir(),
+        }})
+        category = Category.objects.create(name='工具', slug='tools')
+        Application.objects.create(name='编辑器', category=category, logo='logos/我的 logo #1.png')
+
+    def test_local_cache_eviction(self):
+        local = LocalCache(max_entries=2, max_bytes=100)
+        local.set('a', b'x' * 40, 60)
+        local.set('b', b'x' * 40, 60)
+        local.get('a')
+        local.set('c', b'x' * 10, 60)  # 条目数超限，淘汰最久未使用的 b
+        self.assertIsNone(local.get('b'))
+        local.set('d', b'x' * 60, 60)  # 字节数超限，继续淘汰
+        self.assertEqual(local.size, sum(entry[2] for entry in local.entries.values()))
+        self.assertLessEqual(local.size, 100)
+        local.set('huge', b'x' * 200, 60)
+        self.assertIsNone(local.get('huge'))
+        local.set('expired', 1, 0)
+        self.assertIsNone(local.get('expired'))
+
+    def test_snapshot_shared_through_l2(self):
+        self.assertTrue(tiered.local_enabled)
+        first = self.client.get('/api/v1/applications/')
+        # 模拟另一个 worker 进程：L1 为空，快照从 L2 读取，不访问数据库
+        tiered.local.clear()
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/v1/applications/')
+        self.assertEqual(second.content, first.content)
+        # 之后由 L1 直接命中 (异步视图的快速路径只查 L1)
+        request = second.wsgi_request
+        self.assertIsNotNone(catalog.peek_snapshot(ApplicationViewSet.snapshot_name, request))
+
+    def test_revision_change_reaches_other_processes(self):
+        self.client.get('/api/v1/applications/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Application.objects.create(name='浏览器', category=Category.objects.get())
+        # 另一个进程中的 L1 旧版本号过期后，从 L2 读到新版本号
+        tiered.local.clear()
+        self.assertEqual(catalog.get_revision(), CatalogRevision.objects.get().value)
+        names = [app['name'] for app in self.client.get('/api/v1/applications/').json()]
+        self.assertIn('浏览器', names)
+
+    def test_media_urls_match_build_absolute_uri(self):
+        app = Application.objects.get()
+        request = RequestFactory().get('/api/v1/applications/')
+        data = ApplicationSerializer(app, context={'request': request}).data
+        self.assertEqual(data['logo_url'], request.build_absolute_uri(app.logo.url))
+        # 文件名中的 # 和空格必须转义，否则 # 之后会被当作 URL 片段
+        expected = request.build_absolute_uri(settings.MEDIA_URL + filepath_to_uri(f'thumbs/64/{app.logo.name}.webp'))
+        self.assertIn('%20logo%20%231.png.webp', expected)
+        self.assertEqual(data['logo_variants']['64']['webp'], expected)
+        row = ApplicationRowSerializer(request).to_representation(
+            Application.objects.values(*ApplicationRowSerializer.values_fields).get()
+        )
+        self.assertEqual(row['logo_variants'], data['logo_variants'])
+
+        # 导航图标使用相同格式的原图和缩略图 URL
+        navigation = WebsiteNavigation.objects.create(name='示例', url='https://example.com/', favicon=app.logo.name)
+        data = WebsiteNavigationSerializer(navigation, context={'request': request}).data
+        self.assertEqual(data['favicon_url'], request.build_absolute_uri(navigation.favicon.url))
+        self.assertEqual(data['favicon_variants']['64']['webp'], expected)
+
+
+class ImportCatalogCommandTests(StubServerMixin, TempMediaRootMixin, TestCase):
+    """批量导入/导出：按分类 slug 和应用名称新建或更新，每批记录一次目录版本"""
+
+    def setUp(self):
+        super().setUp()
+        self.work_dir = self.temp_dir()
+        Category.objects.create(name='工具', slug='tools')
+
+    def write(self, name, content):
+        path = os.path.join(self.work_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out = StringIO()
+        call_command('import_catalog', path, *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def revision(self):
+        return CatalogRevision.objects.values_list('value', flat=True).first() or 0
+
+    def test_import_update_and_round_trip(self):
+        path = self.write('apps.csv', (
+            'name,category_slug,category_name,version,download_type,is_recommended,order\n'
+            '编辑器,tools,工具箱,1.0,EXTERNAL_LINK,true,2\n'
+            '浏览器,net,网络,,手动选择服务器文件,否,1\n'
+            '解压,tools,,3.1,UPLOADED_FILE,0,\n'
+        ))
+        start = self.revision()
+        with self.captureOnCommitCallbacks(execute=True):
+            output = self.run_import(path, '--batch-size', '2')
+        self.assertIn('新建 3，更新 0', output)
+        # 两批各递增一次版本号；变更记录: 3 个应用 + 新分类 + 分类改名
+        self.assertEqual(self.revision(), start + 2)
+        self.assertEqual(CatalogChange.objects.filter(revision__gt=start).count(), 5)
+        browser = Application.objects.get(name='浏览器')
+        self.assertEqual((browser.category.name, browser.version), ('网络', None))
+        self.assertEqual(browser.download_type, AppChoices.SERVER_PATH)
+        self.assertEqual(Category.objects.get(slug='tools').name, '工具箱')
+        # 批量写入后缓存中的版本号也已更新
+        self.assertEqual(catalog.get_revision(), start + 2)
+
+        # 导出的数据再导入时没有变化，不产生新版本
+        export_path = os.path.join(self.work_dir, 'export.jsonl')
+        call_command('export_catalog_data', export_path, stderr=StringIO())
+        self.assertIn('新建 0，更新 0，未变化 3', self.run_import(export_path))
+        self.assertEqual(self.revision(), start + 2)
+
+        Application.objects.filter(pk=browser.pk).update(file_size=10, file_sha256='a' * 64)
+        path = self.write('update.json', json.dumps([
+            {'name': '浏览器', 'category_slug': 'net', 'server_file_path': 'browser/setup.exe'},
+        ]))
+        self.assertIn('更新 1', self.run_import(path))
+        browser.refresh_from_db()
+        self.assertEqual((browser.server_file_path, browser.version), ('browser/setup.exe', None))
+        # 下载来源变化，旧的安装包清单被清空
+        self.assertEqual((browser.file_size, browser.file_sha256), (None, ''))
+
+    def test_fetch_logos(self):
+        path = self.write('apps.jsonl', '\n'.join(json.dumps({
+            'name': f'应用 {i}', 'category_slug': 'tools', 'logo_url': f'{self.base_url}/icon.png',
+        }) for i in range(3)) + '\n')
+        output = self.run_import(path, '--fetch-logos')
+        self.assertIn('Logo: 下载 1，失败 0', output)
+        logos = set(Application.objects.values_list('logo', flat=True))
+        self.assertEqual(len(logos), 1)
+        self.assertTrue(logos.pop().startswith('blobs/'))
+
+    def test_invalid_record_stops_import(self):
+        path = self.write('apps.csv', 'name,category_slug,download_type\n正常,tools,EXTERNAL_LINK\n错误,tools,FTP\n')
+        with self.assertRaisesMessage(CommandError, '第 3 条'):
+            self.run_import(path, '--batch-size', '1')
+        # 之前的批次已经提交
+        self.assertTrue(Application.objects.filter(name='正常').exists())
@@ -0,0 +1,105 @@
+# 文件: core/thumbnails.py
+# Logo / Favicon 的缩略图派生：按固定尺寸生成 WebP 和 PNG 版本，首次请求时生成并缓存在磁盘上。
+
+import os
+import tempfile
+
+from django.conf import settings
+from django.utils._os import safe_join
+from django.utils.encoding import filepath_to_uri
+from PIL import Image
+
+from .storage import is_blob
+
+# 缩略图在 MEDIA_ROOT 下的目录: thumbs/<尺寸>/<原图路径>.<格式>
+THUMBNAIL_PREFIX = 'thumbs'
+
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 85, 'method': 4}),
+    'png': ('PNG', {'optimize': True}),
+}
+
+
+class ThumbnailError(Exception):
+    """原图不存在、尺寸不受支持或无法解码。"""
+
+
+def variant_name(source_name, size, fmt):
+    return f'{THUMBNAIL_PREFIX}/{size}/{source_name}.{fmt}'
+
+
+def variant_url(source_name, size, fmt):
+    # 与 FileSystemStorage.url() 相同，文件名中的 #、? 和空格等需要转义
+    return f'{settings.MEDIA_URL}{filepath_to_uri(variant_name(source_name, size, fmt))}'
+
+
+def variant_urls(source_name):
+    """返回 {'32': {'webp': url, 'png': url}, ...} (相对 URL)。"""
+    if not source_name:
+        return None
+    return {
+        str(size): {fmt: variant_url(source_name, size, fmt) for fmt in THUMBNAIL_FORMATS}
+        for size in settings.THUMBNAIL_SIZES
+    }
+
+
+def is_immutable(source_name):
+    """内容寻址的原图永不改变，其缩略图也可以长期缓存。"""
+    return is_blob(source_name)
+
+
+def delete_variants(source_name):
+    """删除某个原图的所有缩略图 (原图被回收时调用)。"""
+    for size in settings.THUMBNAIL_SIZES:
+        for fmt in THUMBNAIL_FORMATS:
+            try:
+                os.remove(safe_join(settings.MEDIA_ROOT, variant_name(source_name, size, fmt)))
+            except (OSError, ValueError):
+                pass
+
+
+def get_variant_path(source_name, size, fmt):
+    """
+    返回缩略图的绝对路径，不存在 (或比原图旧) 时先生成。
+    写入临时文件后再原子替换，多个进程同时生成同一缩略图也不会读到半个文件。
+    """
+    if size not in settings.THUMBNAIL_SIZES or fmt not in THUMBNAIL_FORMATS:
+        raise ThumbnailError(f'不支持的缩略图规格: {size} {fmt}')
+    if source_name.startswith(THUMBNAIL_PREFIX + '/'):
+        raise ThumbnailError('不能对缩略图再生成缩略图')
+
+    try:
+        source_path = safe_join(settings.MEDIA_ROOT, source_name)
+        target_path = safe_join(settings.MEDIA_ROOT, variant_name(source_name, size, fmt))
+    except Exception:
+        raise ThumbnailError('非法的文件路径')
+
+    try:
+        source_mtime = os.stat(source_path).st_mtime
+    except OSError:
+        raise ThumbnailError(f'原图不存在: {source_name}')
+
+    try:
+        if os.stat(target_path).st_mtime >= source_mtime:
+            return target_path
+    except OSError:
+        pass
+
+    pil_format, save_options = THUMBNAIL_FORMATS[fmt]
+    try:
+        with Image.open(source_path) as image:
+            image.load()
+            image = image.convert('RGBA')
+            image.thumbnail((size, size), Image.LANCZOS)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    image.save(f, pil_format, **save_options)
+                os.replace(temp_path, target_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ThumbnailError(f'无法生成缩略图: {e}')
+    return target_path
@@ -4,6 +4,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views 
 from . import files 
+from . import metrics
 
 # 创建一个路由器来自动处理 ViewSet 的 URL
 router = DefaultRouter()
@@ -15,12 +16,34 @@ urlpatterns = [
     # 首页路由
     path('', views.index_view, name='index'), 
     
-    # Admin 文件选择器 API
-    path('admin/uploaded-files/', files.get_uploaded_files, name='uploaded_files_api'),
-    
+    # 增量同步接口 (返回某个版本号之后的变化)
+    path('api/v1/changes/', views.CatalogChangesView.as_view(), name='catalog_changes'),
+
+    # 应用 / 导航列表的异步视图 (快照命中时不占用线程)，其余接口由视图集处理
+    path('api/v1/applications/', views.application_list),
+    path('api/v1/navigation/', views.navigation_list),
+
     # API V1 路由
     path('api/v1/', include(router.urls)),
     
     # 【新增】服务器文件下载路由
     path('download/server-file/', files.download_server_file, name='download_server_file'),
-]
\ No newline at end of file
+
+    # Prometheus 运行指标
+    path('metrics', metrics.metrics_view, name='metrics'),
+
+    # 外部链接下载 (记录统计后跳转)
+    path('download/external/<int:application_id>/', files.download_external_link, name='download_external_link'),
+]
+
+
+# Admin 使用的文件 API，挂载在 /admin/core/ 下 (见 AppManager/urls.py)。
+# 必须放在 admin.site.urls 之前，否则会被 Admin 的 catch-all 路由拦截返回 404。
+admin_urlpatterns = [
+    # Admin 文件选择器 API
+    path('uploaded-files/', files.get_uploaded_files, name='uploaded_files_api'),
+
+    # 分片上传 API
+    path('uploads/', files.chunked_upload_create, name='chunked_upload_create'),
+    path('uploads/<uuid:upload_id>/', files.chunked_upload_detail, name='chunked_upload_detail'),
+]
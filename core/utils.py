@@ -1,69 +1,207 @@
+import hashlib
+import logging
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from django.core.files.base import ContentFile
 from urllib.parse import urljoin, urlparse
 import os
 import io
+import threading
+from collections import namedtuple
 from django.conf import settings 
 from django.conf.urls.static import static
 
-def fetch_favicon(url):
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# 计算文件哈希时每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 模拟浏览器的 User-Agent (部分网站会拒绝默认的 requests UA)
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class FaviconError(Exception):
+    """Favicon 抓取失败 (内容类型不是图片等)。"""
+
+
+def get_http_session():
     """
-    访问给定 URL，尝试查找并下载 Favicon。
-    返回一个 ContentFile 对象或 None。
+    返回进程内共享的 requests.Session。
+    连接池按主机复用 TCP/TLS 连接，多个线程可以同时使用。
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = getattr(settings, 'FAVICON_HTTP_POOL_SIZE', 16)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update(HEADERS)
+                _session = session
+    return _session
+
+
+# 抓取结果: content 为 ContentFile (未变化时为 None)；etag/last_modified 用于下次的条件请求
+FaviconResult = namedtuple('FaviconResult', 'content icon_url etag last_modified not_modified')
+
+
+def discover_icon_url(url, session, timeout):
+    """访问网页，从 <link rel="icon"> 中找出图标地址，找不到时使用 /favicon.ico。"""
+    # 1. 尝试获取网站 HTML (允许重定向)
+    response = session.get(url, timeout=timeout, allow_redirects=True)
+    response.raise_for_status()  # 检查 HTTP 错误
+
+    soup = BeautifulSoup(response.text, 'html.parser')
+    icon_url = None
+
+    # 2. 查找 HTML 中的 favicon 链接
+    # 查找 rel 包含 'icon' 或 'shortcut icon' 的 link 标签
+    link_tags = soup.find_all('link', rel=lambda rel: rel and any(keyword in rel.lower() for keyword in ['icon', 'shortcut icon']))
+
+    if link_tags:
+        # 找到第一个有效的链接
+        icon_url = link_tags[0].get('href')
+
+    # 3. 如果未找到链接，尝试默认路径
+    if not icon_url:
+        icon_url = '/favicon.ico'
+
+    # 4. 确保 icon_url 是绝对 URL
+    return urljoin(response.url, icon_url)
+
+
+def download_icon(icon_url, session, timeout, name, etag='', last_modified=''):
+    """
+    下载图标文件。传入上次的 ETag / Last-Modified 时发送条件请求，
+    服务器返回 304 时 not_modified=True 且不下载内容。
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    icon_response = session.get(icon_url, timeout=timeout, headers=headers)
+    if icon_response.status_code == 304:
+        return FaviconResult(None, icon_url, etag, last_modified, True)
+    icon_response.raise_for_status()
+
+    # 验证内容类型
+    content_type = icon_response.headers.get('Content-Type', '').lower()
+    if not any(keyword in content_type for keyword in ('image', 'icon', 'octet-stream')):
+        raise FaviconError(f"Favicon content type check failed for {icon_url}: {content_type}")
+
+    return FaviconResult(
+        ContentFile(icon_response.content, name=name),
+        icon_url,
+        icon_response.headers.get('ETag', ''),
+        icon_response.headers.get('Last-Modified', ''),
+        False,
+    )
+
+
+def download_favicon(url, session=None, icon_url='', etag='', last_modified=''):
     """
+    访问给定 URL，查找并下载 Favicon，返回 FaviconResult。
+    已知上次的图标地址时直接对其发送条件请求，省去抓取网页；
+    该地址失效时再重新从网页中查找。
+    失败时抛出 requests.RequestException 或 FaviconError。
+    抓取耗时和失败次数记录到 /metrics。
+    """
+    started = time.perf_counter()
+    try:
+        return _download_favicon(url, session, icon_url, etag, last_modified)
+    except Exception as e:
+        metrics.inc('appmanager_favicon_fetch_failures_total', reason=type(e).__name__)
+        raise
+    finally:
+        metrics.observe('appmanager_favicon_fetch_duration_seconds', time.perf_counter() - started)
+
+
+def _download_favicon(url, session, icon_url, etag, last_modified):
+    session = session or get_http_session()
+    timeout = getattr(settings, 'FAVICON_FETCH_TIMEOUT', 10)
+
     # 确保 URL 有 Scheme
     if not urlparse(url).scheme:
         url = "http://" + url
-        
-    try:
-        # 1. 尝试获取网站 HTML
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        # 允许重定向
-        response = requests.get(url, headers=headers, timeout=10, allow_redirects=True)
-        response.raise_for_status()  # 检查 HTTP 错误
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        icon_url = None
-
-        # 2. 查找 HTML 中的 favicon 链接
-        # 查找 rel 包含 'icon' 或 'shortcut icon' 的 link 标签
-        link_tags = soup.find_all('link', rel=lambda rel: rel and any(keyword in rel.lower() for keyword in ['icon', 'shortcut icon']))
-
-        if link_tags:
-            # 找到第一个有效的链接
-            icon_url = link_tags[0].get('href')
-
-        # 3. 如果未找到链接，尝试默认路径
-        if not icon_url:
-            icon_url = '/favicon.ico'
-
-        # 4. 确保 icon_url 是绝对 URL，并下载图标文件
-        icon_url = urljoin(url, icon_url)
-        
-        icon_response = requests.get(icon_url, timeout=10)
-        icon_response.raise_for_status()
-
-        # 5. 验证内容类型
-        content_type = icon_response.headers.get('Content-Type', '').lower()
-        if 'image' not in content_type and 'octet-stream' not in content_type:
-            # 如果内容类型不对，则下载失败
-            print(f"Favicon content type check failed for {icon_url}: {content_type}")
-            return None
-
-        # 6. 返回 Django ContentFile
-        # 确定文件名，使用域名部分来确保唯一性
-        domain = urlparse(url).netloc.replace('.', '_')
-        filename = f"{domain}.ico"
-        
-        # 使用 ContentFile 将二进制内容包装起来
-        return ContentFile(icon_response.content, name=filename)
 
+    # 使用域名部分来确保文件名唯一性
+    name = f"{urlparse(url).netloc.replace('.', '_')}.ico"
+
+    if icon_url:
+        try:
+            return download_icon(icon_url, session, timeout, name, etag, last_modified)
+        except (requests.exceptions.HTTPError, FaviconError):
+            pass
+
+    icon_url = discover_icon_url(url, session, timeout)
+    return download_icon(icon_url, session, timeout, name)
+
+
+def fetch_favicon(url, session=None):
+    """
+    访问给定 URL，尝试查找并下载 Favicon。
+    返回一个 ContentFile 对象或 None。
+    """
+    try:
+        return download_favicon(url, session=session).content
+    except FaviconError as e:
+        logger.warning('%s', e)
+        return None
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching favicon for {url}: {e}")
+        logger.warning('Error fetching favicon for %s: %s', url, e)
         return None
-    except Exception as e:
-        print(f"An unexpected error occurred during favicon processing: {e}")
-        return None
\ No newline at end of file
+    except Exception:
+        logger.exception('An unexpected error occurred during favicon processing: %s', url)
+        return None
+
+
+def hash_file(fileobj):
+    """
+    流式计算文件的 SHA-256，返回 (十六进制摘要, 字节数)。
+    fileobj 可以是文件路径、Django File 对象或普通的二进制文件对象。
+    """
+    digest = hashlib.sha256()
+    size = 0
+    if isinstance(fileobj, (str, os.PathLike)):
+        with open(fileobj, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                size += len(chunk)
+    elif hasattr(fileobj, 'chunks'):
+        for chunk in fileobj.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    else:
+        for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def locate_server_file(file_path):
+    """
+    把 SERVER_PATH 应用登记的路径解析为存在的绝对路径，不存在时返回 None。
+    相对路径 (如文件选择器填入的 uploads/xxx) 优先相对于 MEDIA_ROOT 解析。
+    """
+    if not file_path:
+        return None
+    candidates = [file_path]
+    if not os.path.isabs(file_path):
+        candidates.insert(0, os.path.join(settings.MEDIA_ROOT, file_path))
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return os.path.abspath(candidate)
+    return None
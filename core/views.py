@@ -1,76 +1,315 @@
 # 文件路径: core/views.py (完整代码)
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject
 from rest_framework import viewsets
-from .models import Application, Category, WebsiteNavigation # 确保导入了所有模型
-from .serializers import ApplicationSerializer, WebsiteNavigationSerializer 
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotAcceptable, ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from . import catalog, search
+from .compression import snapshot_response
+from .models import AppChoices, Application, Category, WebsiteNavigation # 确保导入了所有模型
+from .pagination import CatalogCursorPagination
+from .serializers import (
+    ApplicationRowSerializer, ApplicationSerializer, WebsiteNavigationSerializer,
+    ApplicationSyncSerializer, CategorySyncSerializer, WebsiteNavigationSyncSerializer,
+)
 # from .files import download_server_file # 如果您需要在这里直接调用，但通常在 urls.py 中引入即可
 
 
 # =========================================================
 # 网页视图 (现在使用 Server-Side Rendering / SSR)
 # =========================================================
-def index_view(request):
+def build_grouped_apps():
     """
-    渲染应用列表的主页，并进行服务器端渲染。
-    数据获取、分组和排序都在这里完成。
-    """
-    # 1. 获取所有应用，并预取其分类 (避免 N+1 查询)
-    # 按照分类的 order 和应用的 order 进行排序
-    applications = Application.objects.all().select_related('category').order_by('category__order', 'order')
-
-    # 2. Python 逻辑：按分类名称分组
-    grouped_apps = {}
-    
-    # 遍历所有应用进行分组
-    for app in applications:
-        # 🌟 关键：安全地获取分类名称，处理 category 为 None 的情况
-        category_name = app.category.name if app.category else '未分类'
-        
-        if category_name not in grouped_apps:
-            grouped_apps[category_name] = []
-            
-        grouped_apps[category_name].append(app)
-    
-    # 3. 将字典转换为有序的列表 [(category_name, app_list)]，
-    # 确保分类的显示顺序是正确的。
-    final_data_list = []
-    
-    # A. 先按数据库中的 Category order 排序 (只处理有定义的分类)
-    for category in Category.objects.all().order_by('order'):
-        if category.name in grouped_apps:
-            # 将该分类添加到最终列表，并从 grouped_apps 中移除
-            final_data_list.append((category.name, grouped_apps.pop(category.name)))
-            
-    # B. 最后添加剩余的 "未分类" 组（如果存在）
-    if '未分类' in grouped_apps:
-        final_data_list.append(('未分类', grouped_apps['未分类']))
-
-    context = {
-        # 'grouped_apps' 是模板中要使用的变量
-        'grouped_apps': final_data_list, 
-    }
+    按分类分组应用，返回有序列表 [(category_name, app_list)]。
+    """
+    return [(category.name, apps) for category, apps in catalog.build_grouped_catalog()]
+
 
-    return render(request, 'core/index.html', context)
+def build_index_snapshot(request):
+    def build():
+        context = {
+            # 'grouped_apps' 是模板中要使用的变量 (惰性求值，仅在片段缓存未命中时才查询和分组)
+            'grouped_apps': SimpleLazyObject(build_grouped_apps),
+            'catalog_revision': catalog.get_revision(),
+        }
+        return render_to_string('core/index.html', context, request=request).encode('utf-8')
+
+    return catalog.get_snapshot('index', request, build)
+
+
+async def index_view(request):
+    """
+    渲染应用列表的主页，并进行服务器端渲染。
+    整页 HTML 按目录版本号缓存 (模型信号递增版本号即令缓存失效)，
+    缓存命中时既不访问 ORM 也不渲染模板；应用列表片段另有模板片段缓存。
+    gzip / brotli 压缩版本随快照一起缓存，按 Accept-Encoding 返回。
+    异步视图：缓存命中时在事件循环中直接返回，只有重新渲染时才进入线程。
+    """
+    snapshot = catalog.peek_snapshot('index', request)
+    if snapshot is None:
+        snapshot = await sync_to_async(build_index_snapshot)(request)
+    response = snapshot_response(request, snapshot, 'text/html; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 
 # =========================================================
-# API 视图 (Django REST Framework, 保持不变)
+# API 视图 (Django REST Framework)
 # =========================================================
 
-class ApplicationViewSet(viewsets.ReadOnlyModelViewSet):
+class CatalogSnapshotMixin:
+    """
+    列表接口使用按目录版本号预计算的 JSON 快照：
+    - 返回强 ETag，客户端带 If-None-Match 且未变化时直接返回 304；
+    - 同一版本只序列化 (和压缩) 一次，之后的请求不访问 ORM 也不经过序列化器。
+    只对无查询参数的 JSON 请求生效，其余情况 (如可浏览 API) 走 DRF 默认流程。
+    """
+    snapshot_name = None
+
+    @staticmethod
+    def uses_snapshot(request, renderer, media_type):
+        return renderer.format == 'json' and ';' not in media_type and not (set(request.GET) - {'format'})
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if not self.uses_snapshot(request, renderer, request.accepted_media_type):
+            return super().list(request, *args, **kwargs)
+
+        def build():
+            data = super(CatalogSnapshotMixin, self).list(request, *args, **kwargs).data
+            return renderer.render(data, request.accepted_media_type, self.get_renderer_context())
+
+        snapshot = catalog.get_snapshot(self.snapshot_name, request, build)
+        response = snapshot_response(request, snapshot, renderer.media_type)
+        # 要求客户端每次都带 If-None-Match 重新校验
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class RowSerializerListMixin:
+    """
+    列表接口用 row_serializer_class 直接序列化 .values() 行，不构造模型实例，也不经过 DRF 的逐字段序列化；
+    详情等其他接口仍使用 serializer_class。
+    """
+    row_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        row_serializer = self.row_serializer_class(request, fields=self.get_serializer_context().get('fields'))
+        rows = self.filter_queryset(self.get_queryset()).values(*row_serializer.values_fields)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.many(page))
+        return Response(row_serializer.many(rows))
+
+
+class ApplicationViewSet(CatalogSnapshotMixin, RowSerializerListMixin, viewsets.ReadOnlyModelViewSet):
     """
     提供 Application 模型的只读 API 接口。
+    可选参数 (不带参数时返回完整列表快照):
+    - 过滤: category (ID 或 slug)、is_recommended (true/false)、install_method、download_type
+    - 字段: fields=id,name,logo_url 只返回指定字段
+    - 分页: page_size=N 开始游标分页，之后按响应中的 next / cursor 翻页
     """
-    queryset = Application.objects.all().order_by('category', 'order')
+    queryset = catalog.application_queryset().order_by(*catalog.APPLICATION_ORDERING)
     serializer_class = ApplicationSerializer
+    row_serializer_class = ApplicationRowSerializer
+    snapshot_name = 'applications'
+    pagination_class = CatalogCursorPagination
+
+    CHOICE_FILTERS = {
+        'install_method': (AppChoices.SILENT.value, AppChoices.MANUAL.value),
+        'download_type': (AppChoices.EXTERNAL_LINK.value, AppChoices.UPLOADED_FILE.value, AppChoices.SERVER_PATH.value),
+    }
+    BOOLEAN_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+
+        category = params.get('category')
+        if category:
+            queryset = queryset.filter(category_id=int(category)) if category.isdigit() \
+                else queryset.filter(category__slug=category)
+
+        is_recommended = params.get('is_recommended')
+        if is_recommended is not None:
+            if is_recommended.lower() not in self.BOOLEAN_VALUES:
+                raise ValidationError({'is_recommended': '必须是 true 或 false。'})
+            queryset = queryset.filter(is_recommended=self.BOOLEAN_VALUES[is_recommended.lower()])
+
+        for field, choices in self.CHOICE_FILTERS.items():
+            value = params.get(field)
+            if value:
+                if value not in choices:
+                    raise ValidationError({field: f"可选值: {', '.join(choices)}。"})
+                queryset = queryset.filter(**{field: value})
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields = self.request.query_params.get('fields') if self.request else None
+        if fields:
+            requested = [name.strip() for name in fields.split(',') if name.strip()]
+            unknown = set(requested) - set(ApplicationSerializer.Meta.fields)
+            if unknown:
+                raise ValidationError({'fields': f"未知字段: {', '.join(sorted(unknown))}。"})
+            context['fields'] = requested
+        return context
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        全文搜索应用: /api/v1/applications/search/?q=关键词&limit=20
+        支持英文前缀、中文片段以及拼音全拼和首字母，结果按相关度排序。
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'detail': "参数缺失: 需要 'q' 参数。"}, status=400)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'detail': "参数错误: 'limit' 必须是整数。"}, status=400)
+
+        ids = search.search_ids(query)
+        apps = self.get_queryset().in_bulk(ids[:limit])
+        results = [apps[pk] for pk in ids[:limit] if pk in apps]
+        return Response({
+            'query': query,
+            'count': len(ids),
+            'results': self.get_serializer(results, many=True).data,
+        })
 
 
 # 网站导航 API 接口
-class WebsiteNavigationViewSet(viewsets.ReadOnlyModelViewSet):
+class WebsiteNavigationViewSet(CatalogSnapshotMixin, viewsets.ReadOnlyModelViewSet):
     """
     提供 WebsiteNavigation 模型的只读 API 接口。
     """
     # 确保缩进正确，解决了上次的 IndentationError
     queryset = WebsiteNavigation.objects.all().order_by('order')
-    serializer_class = WebsiteNavigationSerializer
\ No newline at end of file
+    serializer_class = WebsiteNavigationSerializer
+    snapshot_name = 'navigation'
+
+
+def async_snapshot_list(viewset_class):
+    """
+    把视图集的列表接口包装为异步视图 (路由在 core/urls.py 中位于 router 之前)。
+    快照已缓存时 (绝大多数请求) 在事件循环中完成内容协商并直接返回快照，不占用线程；
+    其余情况 (快照未生成、带过滤/分页参数、可浏览 API 等) 在线程中交给视图集处理。
+    """
+    sync_view = viewset_class.as_view({'get': 'list'})
+    negotiator = viewset_class.content_negotiation_class()
+    renderers = [renderer() for renderer in viewset_class.renderer_classes]
+    allow = ', '.join(method.upper() for method in viewset_class.http_method_names if method in ('get', 'head', 'options'))
+
+    def cached_response(request):
+        try:
+            renderer, media_type = negotiator.select_renderer(Request(request), renderers)
+        except NotAcceptable:
+            return None
+        if not CatalogSnapshotMixin.uses_snapshot(request, renderer, media_type):
+            return None
+        snapshot = catalog.peek_snapshot(viewset_class.snapshot_name, request)
+        if snapshot is None:
+            return None
+        response = snapshot_response(request, snapshot, renderer.media_type)
+        response['Cache-Control'] = 'no-cache'
+        # 与视图集返回的响应头保持一致
+        response['Allow'] = allow
+        if len(renderers) > 1:
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+    async def view(request, *args, **kwargs):
+        response = cached_response(request) if request.method in ('GET', 'HEAD') else None
+        if response is None:
+            response = await sync_to_async(sync_view)(request, *args, **kwargs)
+        return response
+
+    view.cls = viewset_class
+    view.csrf_exempt = True
+    return view
+
+
+application_list = async_snapshot_list(ApplicationViewSet)
+navigation_list = async_snapshot_list(WebsiteNavigationViewSet)
+
+
+# 增量同步 API 接口
+class CatalogChangesView(APIView):
+    """
+    返回某个目录版本号 (?since=N) 或时间点 (?since_time=ISO8601) 之后
+    新增、修改的应用/分类/导航，以及被删除对象的 ID (墓碑)。
+    客户端保存响应中的 revision，下次以它作为 since 即可只拉取差异。
+    since 早于变更日志的保留范围时返回 full_resync=true (不含数据)，客户端应重新拉取完整目录。
+    """
+
+    def get(self, request):
+        revision = catalog.get_revision()
+        since = request.query_params.get('since')
+        since_time = request.query_params.get('since_time')
+
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response({'detail': "参数错误: 'since' 必须是整数版本号。"}, status=400)
+            if since < 0:
+                return Response({'detail': "参数错误: 'since' 不能为负数。"}, status=400)
+        elif since_time is not None:
+            try:
+                since_time = parse_datetime(since_time)
+            except ValueError:
+                since_time = None
+            if since_time is None:
+                return Response({'detail': "参数错误: 'since_time' 必须是 ISO 8601 时间。"}, status=400)
+            if timezone.is_naive(since_time):
+                # 未带时区的时间按服务器时区 (TIME_ZONE) 解释，避免与数据库中的 aware 时间比较出错
+                since_time = timezone.make_aware(since_time)
+        else:
+            return Response({'detail': "参数缺失: 需要 'since' 或 'since_time' 参数。"}, status=400)
+
+        data = {
+            'revision': revision,
+            'full_resync': False,
+            'applications': [],
+            'categories': [],
+            'navigation': [],
+            'deleted': {'applications': [], 'categories': [], 'navigation': []},
+        }
+        # 客户端已是最新版本，无需访问数据库
+        if since is not None and since >= revision:
+            return Response(data)
+
+        # 同步位置早于变更日志的保留范围 (prune_catalog_changes)，无法得到完整的删除列表
+        if catalog.requires_full_resync(since_revision=since, since_time=since_time):
+            data['full_resync'] = True
+            return Response(data)
+
+        changes = catalog.get_changes(since_revision=since, since_time=since_time)
+        context = self.get_serializer_context()
+        sections = (
+            ('applications', 'application', Application.objects.select_related('category'), ApplicationSyncSerializer),
+            ('categories', 'category', Category.objects.all(), CategorySyncSerializer),
+            ('navigation', 'navigation', WebsiteNavigation.objects.all(), WebsiteNavigationSyncSerializer),
+        )
+        for key, model_name, queryset, serializer_class in sections:
+            changed_ids, deleted_ids = changes[model_name]
+            objects = list(queryset.filter(pk__in=changed_ids)) if changed_ids else []
+            # 变更日志中记录为修改、但已不存在的对象也作为删除返回
+            deleted_ids = deleted_ids | (changed_ids - {obj.pk for obj in objects})
+            data[key] = serializer_class(objects, many=True, context=context).data
+            data['deleted'][key] = sorted(deleted_ids)
+        return Response(data)
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'view': self}
@@ -0,0 +1,41 @@
+# 文件: gunicorn.conf.py
+# 生产环境的 ASGI 部署配置: gunicorn 负责管理多个 uvicorn worker 进程。
+#
+#   gunicorn -c gunicorn.conf.py AppManager.asgi:application
+#
+# 每个 worker 是一个事件循环：目录接口的快照命中和文件下载的传输都在事件循环中完成，
+# 下载期间不占用线程，少量进程即可同时服务成千上万个慢速下载。
+# 缓存未命中时的数据库查询和页面渲染等同步代码由 Django 放到线程池中执行，
+# 每个请求在自己的线程中运行 (ThreadSensitiveContext)，同一请求内的同步调用共用该线程；
+# 这些代码受 GIL 限制，因此 worker 数量按 CPU 核数设置。
+# Admin 的 CSS/JS 等静态文件默认由 Django 提供 (见 AppManager/asgi.py 和 SERVE_STATIC)。
+
+import multiprocessing
+import os
+import shutil
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.environ.get('APPMANAGER_BIND', '0.0.0.0:8000')
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = int(os.environ.get('APPMANAGER_WORKERS', multiprocessing.cpu_count()))
+
+# uvicorn worker 在事件循环中定期向 gunicorn 报告心跳，长时间的下载不会触发超时；
+# 只有事件循环被阻塞超过这么多秒时 worker 才会被重启
+timeout = int(os.environ.get('APPMANAGER_WORKER_TIMEOUT', 60))
+# 重启 / 重新加载时，正在进行的下载最多再传输这么多秒
+graceful_timeout = int(os.environ.get('APPMANAGER_GRACEFUL_TIMEOUT', 60))
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+# 多个 worker 的运行指标通过该目录汇总 (见 core/metrics.py)；worker 进程继承这里设置的环境变量
+os.environ.setdefault('APPMANAGER_METRICS_DIR', os.path.join(BASE_DIR, 'metrics'))
+
+
+def on_starting(server):
+    """启动时清空运行指标目录 (见 core/metrics.py)，上次运行遗留的进程文件不再计入。"""
+    metrics_dir = os.environ['APPMANAGER_METRICS_DIR']
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)